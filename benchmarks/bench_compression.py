@@ -0,0 +1,61 @@
+"""
+Measures the file size and the write and read throughput of a large level written with each available codec, and without compression.
+Run it directly: `python benchmarks/bench_compression.py [object count]`.
+"""
+
+
+import os
+import sys
+import json
+import time
+import importlib
+import tempfile
+
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The file browser path is only defined on Windows
+os.environ.setdefault("WINDIR", tempfile.gettempdir())
+
+sys.path.insert(0, os.path.dirname(REPO_PATH))
+pa = importlib.import_module(os.path.basename(REPO_PATH))
+m_disk_utils = pa.l_library.m_disk_utils
+
+from bench_intern_strings import make_level_string
+
+
+def measure_codec(folder_path: str, json_data, codec_name: str | None, repeats: int = 3):
+    """Returns the size in bytes of the file written with the codec, and the best writing and reading times in seconds."""
+    write_times: list[float] = []
+    read_times: list[float] = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        m_disk_utils.write_json_file(folder_path, "level.lsb", json_data, compression = codec_name)
+        write_times.append(time.perf_counter() - start_time)
+
+        start_time = time.perf_counter()
+        m_disk_utils.read_json_file(os.path.join(folder_path, "level.lsb"))
+        read_times.append(time.perf_counter() - start_time)
+
+    return os.path.getsize(os.path.join(folder_path, "level.lsb")), min(write_times), min(read_times)
+
+
+def main():
+    object_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    json_string = make_level_string(object_count)
+    json_data = json.loads(json_string)
+    json_size = len(json_string.encode(m_disk_utils.ENCODING))
+    print(f"{object_count} beatmap objects, {json_size / 1e6:.1f} MB of JSON")
+
+    # Throughput is in megabytes of JSON per second, so that the codecs compare with each other
+    with tempfile.TemporaryDirectory() as folder_path:
+        for codec_name in [None] + [codec.name for codec in pa.get_available_codecs()]:
+            file_size, write_time, read_time = measure_codec(folder_path, json_data, codec_name)
+            print(
+                f"{codec_name or 'uncompressed'}: {file_size / 1e6:.2f} MB ({file_size / json_size:.1%}), "
+                f"write {json_size / 1e6 / write_time:.1f} MB/s, read {json_size / 1e6 / read_time:.1f} MB/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Measures the decoding time and the memory of a large level decoded with and without `intern_strings`.
+Run it directly: `python benchmarks/bench_intern_strings.py [object count]`.
+"""
+
+
+import os
+import sys
+import gc
+import json
+import time
+import random
+import importlib
+import tempfile
+import tracemalloc
+
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The file browser path is only defined on Windows
+os.environ.setdefault("WINDIR", tempfile.gettempdir())
+
+sys.path.insert(0, os.path.dirname(REPO_PATH))
+pa = importlib.import_module(os.path.basename(REPO_PATH))
+m_disk_utils = pa.l_library.m_disk_utils
+
+
+def make_level_string(object_count: int):
+    """Returns the JSON of a level with beatmap objects shaped like the ones made in the editor."""
+    rng = random.Random(0)
+    beatmap_objects = [
+        {
+            "id": f"{index:016x}",
+            "p": "",
+            "name": "obj",
+            "st": str(round(rng.random() * 100, 2)),
+            "ak": "True",
+            "ot": "0",
+            "events": {
+                event_name: [
+                    {"t": str(kf_index), "x": str(rng.choice([0, 1, 2, 0.5])), "y": "0", "ct": rng.choice(["Linear", "InSine"])}
+                    for kf_index in range(8)
+                ]
+                for event_name in ("pos", "sca", "rot", "col")
+            }
+        }
+        for index in range(object_count)
+    ]
+    return json.dumps({"beatmap_objects": beatmap_objects})
+
+def measure_decode(json_string: str, intern_strings: bool, repeats: int = 3):
+    """Returns the best decoding time in seconds and the number of bytes that the decoded data keeps in memory."""
+    times: list[float] = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        json_data = m_disk_utils.decode_json(json_string, intern_strings)
+        times.append(time.perf_counter() - start_time)
+        del json_data
+        gc.collect()
+
+    tracemalloc.start()
+    json_data = m_disk_utils.decode_json(json_string, intern_strings)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del json_data
+
+    return min(times), memory
+
+
+def main():
+    object_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    json_string = make_level_string(object_count)
+    print(f"{object_count} beatmap objects, {len(json_string) / 1e6:.1f} MB of JSON")
+
+    for intern_strings in (False, True):
+        decode_time, memory = measure_decode(json_string, intern_strings)
+        print(f"intern_strings = {intern_strings}: {decode_time:.2f}s, {memory / 1e6:.1f} MB kept")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,31 @@
 
 from .m_base import PAMeta, PAObject, PAException
 
+from .m_instrumentation import \
+    StageEvent, StageAggregate, \
+    Subscriber, \
+        LoggingSubscriber, AggregateSubscriber, StatsDSubscriber, \
+    add_subscriber, remove_subscriber
+
+from .m_compression import \
+    Codec, \
+        GzipCodec, XZCodec, ZstdCodec, \
+    get_available_codecs, get_codec
+
 from .m_disk_utils import \
-    override_file, read_file, make_folder_path, \
+    override_file, read_file, copy_file, make_folder_path, \
     path_exists, \
     get_all_file_paths_in_folder, \
     FILE_BROWSER_PATH, open_file_in_explorer, open_folder_in_explorer, \
+    encode_json, decode_json, \
+    write_json_file, read_json_file, get_file_codec, \
+    StreamedBase64, streaming_json, bytes_to_base64_json, \
     bytes_to_base64, base64_to_bytes
 
+from .m_parse_cache import \
+    ParseCacheStats, ParseCacheEntry, ParseCache, \
+    PARSE_CACHE
+
 from .m_handlers import \
     Handler, \
     JSONClassHandler, \
@@ -18,13 +36,29 @@ from .m_handlers import \
         RawFileHandler, \
     JSONFileHandler
 
+from .m_ogg import \
+    OggPage, AudioProbe, \
+    probe_file
+
 from .m_level_data import \
+    SourceFile, \
     LevelData, \
         Level, Metadata, Audio, Theme, \
         LevelFolder
 
+from .m_level_diff import \
+    LevelPatch, LevelHistory
+
+from .m_watch import \
+    FileWatcher, \
+        PollingWatcher, NotifyWatcher, \
+    create_watcher, \
+    LevelFolderWatch
+
 from .m_level_excs import \
     LevelException, \
-        AudioImportException
+        AudioImportException, InvalidAudio, \
+        CompressionNotSupported, \
+        LevelPatchMismatch
 
 from .l_versions import *
@@ -9,14 +9,22 @@ from .m_versions import PAVersion
 
 from .m_combine_settings import CombineSettings
 
+from .m_combine_report import CombineReport
+
+from .m_combine_plan import CombinePlan
+
 from .m_version_excs import \
     VersionException, \
         ImportException, \
             IncompatibleVersionImport, \
-            LevelFileNotFound, AudioNotPresent, \
+            LevelFileNotFound, AudioNotPresent, AudioTooShort, \
             FolderNotFound, \
             ThemeImportException, \
                 ThemeNotFound, MissingThemes, NoThemesInFolder, \
+            LevelSchemaException, \
+                LevelSectionProblem, \
+                    MissingLevelSection, InvalidLevelSection, \
+                InvalidLevel, InvalidLevels, \
         VersionNotFound
 
 from .l_pa_versions import *
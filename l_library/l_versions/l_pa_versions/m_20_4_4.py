@@ -8,9 +8,13 @@ import typing as typ
 import os
 import json
 import copy
+import math
+import hashlib
+import multiprocessing
+import multiprocessing.connection
 
-from ... import m_disk_utils, m_level_data, m_level_excs
-from .. import m_branches, m_combine_settings, m_version_excs, m_versions
+from ... import m_base, m_disk_utils, m_level_data, m_level_excs, m_instrumentation, m_parse_cache, m_cow
+from .. import m_branches, m_combine_settings, m_combine_report, m_combine_plan, m_version_excs, m_versions
 
 
 class v20_4_4(m_versions.PAVersion):
@@ -22,7 +26,7 @@ class v20_4_4(m_versions.PAVersion):
     @classmethod
     def get_version_number(cls, level: m_level_data.Level):
         try:
-            return level.data["level_data"]["level_version"]
+            return level.view["level_data"]["level_version"]
         except KeyError:
             return None
 
@@ -32,24 +36,18 @@ class v20_4_4(m_versions.PAVersion):
 
 
     @classmethod
-    def import_level_folder(cls, level_folder_path: str, load_audio: bool = True) -> m_level_data.LevelFolder:
+    def import_level_folder(cls, level_folder_path: str, load_audio: bool = True, validate: bool = True, intern_strings: bool = False) -> m_level_data.LevelFolder:
         def get_path_from_folder(filename: str):
             """Gets the path of the filename from the level folder."""
             return os.path.join(level_folder_path, filename)
 
-        def get_data_in_level_folder(filename: str):
-            """Returns the contents of the file inside of the level folder."""
-            path = get_path_from_folder(filename)
-            file = m_disk_utils.read_file(path)
-            return json.loads(file)
-
         if not m_disk_utils.path_exists(level_folder_path):
             raise m_version_excs.FolderNotFound(level_folder_path)
 
 
         try:
-            metadata = m_level_data.Metadata(get_data_in_level_folder("metadata.lsb"))
-            level = m_level_data.Level(get_data_in_level_folder("level.lsb"))
+            metadata = m_level_data.Metadata.from_file_raw(get_path_from_folder("metadata.lsb"))
+            level = m_level_data.Level.from_file_raw(get_path_from_folder("level.lsb"), intern_strings)
 
             if load_audio:
                 try:
@@ -73,6 +71,9 @@ class v20_4_4(m_versions.PAVersion):
                 level_version_num = "cannot detect"
             raise m_version_excs.IncompatibleVersionImport(level_folder_path, level_version_num, cls.version_number)
 
+        if validate:
+            cls.validate_level(level, level_folder_path)
+
 
         return m_level_data.LevelFolder(
             version = cls,
@@ -83,17 +84,22 @@ class v20_4_4(m_versions.PAVersion):
 
 
     @classmethod
-    def export_level_folder(cls, level_folder: m_level_data.LevelFolder, folder_path: str):
+    def export_level_folder(cls, level_folder: m_level_data.LevelFolder, folder_path: str, hardlink: bool = False, validate: bool = False):
         if not m_disk_utils.path_exists(folder_path):
             raise m_version_excs.FolderNotFound(folder_path)
 
+        if validate:
+            cls.validate_level(level_folder.level, cls.get_level_name(level_folder.level, folder_path))
+
         element_infos: list[tuple[m_level_data.LevelData, str]] = [
             (level_folder.level, "level"),
             (level_folder.metadata, "metadata"),
             (level_folder.audio, "level"),
         ]
+        # Only the modified elements are serialized again, the others are copied from the files they were imported from
         for element, filename in element_infos:
-            element.to_file_raw(folder_path, filename)
+            if element is not None:
+                element.to_file_raw_passthrough(folder_path, filename, hardlink)
 
 
     @classmethod
@@ -104,11 +110,14 @@ class v20_4_4(m_versions.PAVersion):
         level_themes: list[m_level_data.Theme] = []
         level_theme_ids_buffer = copy.deepcopy(level_theme_ids)
 
-        for theme in themes:
-            theme_id = int(theme.data["id"])
-            if theme_id in level_theme_ids:
-                level_themes.append(theme)
-                level_theme_ids_buffer.remove(theme_id)
+        with m_instrumentation.measure("themes.lookup") as measurement:
+            for theme in themes:
+                theme_id = int(theme.view["id"])
+                if theme_id in level_theme_ids:
+                    level_themes.append(theme)
+                    level_theme_ids_buffer.remove(theme_id)
+
+            measurement.add_objects(len(themes))
 
         if len(level_theme_ids_buffer) > 0:
             raise m_version_excs.MissingThemes(level_theme_ids_buffer)
@@ -118,8 +127,11 @@ class v20_4_4(m_versions.PAVersion):
 
     @classmethod
     def get_theme_ids_from_level(cls, level: m_level_data.Level):
-        theme_keyframes: list[dict[typ.Literal["x", "ct"], str]] = level.data["events"]["theme"]
+        return cls._get_theme_ids_from_keyframes(m_cow.unwrap(level.view)["events"]["theme"])
 
+    @classmethod
+    def _get_theme_ids_from_keyframes(cls, theme_keyframes: typ.Iterable[dict[typ.Literal["x", "ct"], str]]):
+        """Returns the custom theme IDs used in the theme keyframes."""
         theme_ids: list[int] = []
 
         for theme_keyframe in theme_keyframes:
@@ -130,12 +142,23 @@ class v20_4_4(m_versions.PAVersion):
         return theme_ids
 
 
+    @classmethod
+    def get_level_end_time(cls, level: m_level_data.Level):
+        events: dict[str, list[dict[str, str]]] = m_cow.unwrap(level.view)["events"]
+        return max(
+            (float(keyframe[cls.keyframe_time_key]) for keyframes in events.values() for keyframe in keyframes),
+            default = 0.0
+        )
+
+
     @classmethod
     def get_theme_from_id(cls, themes_folder_path: str, theme_id: int) -> m_level_data.Theme:
         themes = cls.get_all_themes_in_folder(themes_folder_path)
-        for theme in themes:
-            if int(theme.data["id"]) == theme_id:
-                return theme
+        with m_instrumentation.measure("themes.lookup") as measurement:
+            measurement.add_objects(len(themes))
+            for theme in themes:
+                if int(theme.view["id"]) == theme_id:
+                    return theme
 
         raise m_version_excs.ThemeNotFound(theme_id)
 
@@ -145,23 +168,24 @@ class v20_4_4(m_versions.PAVersion):
         if not m_disk_utils.path_exists(themes_folder_path):
             raise m_version_excs.FolderNotFound(themes_folder_path)
 
-        theme_paths = m_disk_utils.get_all_file_paths_in_folder(themes_folder_path)
-        theme_paths = [
-            theme_path
-            for theme_path in theme_paths
-            if os.path.splitext(theme_path)[1] == ".lst"
-        ]
+        with m_instrumentation.measure("themes.scan") as measurement:
+            theme_paths = m_disk_utils.get_all_file_paths_in_folder(themes_folder_path)
+            theme_paths = [
+                theme_path
+                for theme_path in theme_paths
+                if os.path.splitext(theme_path)[1] == ".lst"
+            ]
 
-        themes: list[m_level_data.Theme] = []
-        for theme_path in theme_paths:
-            try:
-                theme_data: dict[str, str] = json.loads(
-                    m_disk_utils.read_file(theme_path)
-                )
-                int(theme_data["id"])
-                themes.append(m_level_data.Theme(theme_data))
-            except (KeyError, json.JSONDecodeError):
-                continue
+            themes: list[m_level_data.Theme] = []
+            for theme_path in theme_paths:
+                try:
+                    theme_data: dict[str, str] = m_parse_cache.PARSE_CACHE.get_json(theme_path)
+                    int(theme_data["id"])
+                    themes.append(m_level_data.Theme.from_shared_data(theme_data))
+                except (KeyError, json.JSONDecodeError):
+                    continue
+
+            measurement.add_objects(len(themes))
 
         if len(themes) == 0:
             raise m_version_excs.NoThemesInFolder()
@@ -183,35 +207,526 @@ class v20_4_4(m_versions.PAVersion):
         "grain": [{"t":"0","x":"0","y":"0","z":"0"}]
     }
 
-    @classmethod
-    def combine_levels(cls, levels: list[m_level_data.Level], primary_level: m_level_data.Level = None, combine_settings: m_combine_settings.CombineSettings = m_combine_settings.CombineSettings()):
-        # Initialize level elements
-        combined_beatmap_objects: list[dict] = []
+    id_references: dict[str, dict[str, str]] = {
+        "beatmap_objects": {"p": "beatmap_objects", "pid": "prefabs", "piid": "prefab_objects"},
+        "prefab_objects": {"pid": "prefabs"}
+    }
+    """The keys of level elements that refer to the IDs of other level elements, with the level elements they refer to."""
+
+    diff_id_sections: list[str] = ["beatmap_objects", "prefabs", "prefab_objects", "bg_objects", "themes"]
+    """The level elements whose objects are matched by ID when diffing levels."""
+    diff_keyframe_sections: list[str] = ["events"]
+    """The level elements whose keyframe channels are matched by time when diffing levels."""
+    keyframe_time_key: str = "t"
+    """The key of keyframes that contains their time."""
+
+    level_schema: dict = {
+        "ed": {"markers": list},
+        "level_data": {"level_version": str},
+        "prefabs": list,
+        "prefab_objects": list,
+        "checkpoints": list,
+        "beatmap_objects": list,
+        "bg_objects": list,
+        "events": {
+            kf_name: [{"x": m_versions.INT_STRING}] if kf_name == "theme" else list
+            for kf_name in default_event_kfs
+        }
+    }
 
-        combined_imported_prefabs: list[dict] = []
-        combined_prefab_objects: list[dict] = []
+    @classmethod
+    def combine_levels(
+            cls,
+            levels: list[m_level_data.Level],
+            primary_level: m_level_data.Level = None,
+            combine_settings: m_combine_settings.CombineSettings = m_combine_settings.CombineSettings(),
+            combine_report: m_combine_report.CombineReport | None = None
+        ):
+        # Share the data of the levels instead of copying it, nothing below modifies it
+        with m_instrumentation.measure("combine_levels.share") as measurement:
+            level_datas = [level.share_data() for level in levels]
+
+            # Get the source level
+            if primary_level is not None:
+                source_level_data = primary_level.share_data()
+            else:
+                source_level_data = level_datas[0]
 
-        combined_markers: list[dict] = []
+            measurement.add_objects(len(level_datas))
 
-        combined_checkpoints: list[dict] = []
+        # Reject invalid levels before doing any work
+        with m_instrumentation.measure("combine_levels.validate"):
+            level_names = [cls.get_level_name(level, f"level #{index + 1}") for index, level in enumerate(levels)]
+            if primary_level is not None:
+                level_names.append(cls.get_level_name(primary_level, "primary level"))
+            cls.validate_levels(level_datas + ([source_level_data] if primary_level is not None else []), level_names)
 
-        event_kf_names = list(cls.default_event_kfs)
-        combined_event_keyframes: dict[str, list] = {kf_name: [] for kf_name in event_kf_names}
+        # Combine!
+        with m_instrumentation.measure("combine_levels.merge") as measurement:
+            combined_sections = cls._create_combined_sections()
+            if primary_level is not None:
+                # The primary level goes first in the combined level, so the other levels are rewritten against it.
+                # It is only reported on when it is combined again below
+                combine_index = _CombineIndex(cls, combine_settings, None)
+                source_level_data = combine_index.rewrite_level(source_level_data)
+                combine_index.combine_report = combine_report if combine_report is not None else m_combine_report.CombineReport()
+            else:
+                combine_index = _CombineIndex(cls, combine_settings, combine_report)
 
-        combined_bg_objects: list[dict] = []
+            for level_data in level_datas:
+                cls._add_level_to_combined_sections(combined_sections, level_data, combine_settings, combine_index)
 
+            measurement.add_objects(cls._count_combined_objects(combined_sections))
 
-        # Make copies of stuff to not modify objects
-        copied_levels = [copy.deepcopy(level) for level in levels]
+        with m_instrumentation.measure("combine_levels.finalize"):
+            combined_level = cls._build_combined_level(combined_sections, source_level_data, combine_settings)
 
-        # Get primary and source levels
         if primary_level is not None:
-            copied_primary_level = copy.deepcopy(primary_level)
-            source_level = copy.deepcopy(copied_primary_level)
-        else:
-            copied_primary_level = None
-            source_level = copy.deepcopy(copied_levels[0])
+            combined_level: m_level_data.Level = cls.combine_levels(
+                [primary_level, combined_level],
+                combine_settings = combine_settings.get_primary_level_settings(),
+                combine_report = combine_report
+            )
+
+        return combined_level
+
+
+    @classmethod
+    def combine_levels_to_file(
+            cls,
+            levels: list[m_level_data.Level | str],
+            folder_path: str,
+            filename: str = "level",
+            primary_level: m_level_data.Level = None,
+            combine_settings: m_combine_settings.CombineSettings = m_combine_settings.CombineSettings(),
+            combine_report: m_combine_report.CombineReport | None = None
+        ):
+        # Every level element is written to its own spool as the levels come, then the spools are joined in the output
+        combined_sections, spools = cls._create_combined_spools()
+
+        try:
+            combine_index = _CombineIndex(cls, combine_settings, combine_report)
+            invalid_levels: list[m_version_excs.InvalidLevel] = []
+            source_header = cls._add_primary_level_to_combined_spools(combined_sections, primary_level, combine_settings, combine_index)
+
+            with m_instrumentation.measure("combine_levels.merge") as measurement:
+                for index, level in enumerate(levels):
+                    # Only one level is loaded at a time
+                    level_name = cls.get_level_name(level, f"level #{index + 1}")
+                    if isinstance(level, str):
+                        level_data = m_disk_utils.read_json_file(level)
+                    else:
+                        level_data = level.share_data()
+
+                    problems = cls.get_level_problems(level_data, level_name)
+                    if len(problems) > 0:
+                        invalid_levels.append(m_version_excs.InvalidLevel(level_name, problems))
+                    if len(invalid_levels) > 0:
+                        continue
+
+                    if source_header is None:
+                        cls._add_combined_section_prefixes(combined_sections, cls._get_combined_section_prefixes(level_data, combine_settings))
+                        source_header = cls._get_combined_level_header(level_data)
+
+                    cls._add_level_to_combined_sections(combined_sections, level_data, combine_settings, combine_index)
+                    measurement.add_objects(1)
+
+            if len(invalid_levels) > 0:
+                raise m_version_excs.InvalidLevels(invalid_levels)
+
+            full_path = cls._finish_combined_level_file(folder_path, filename, source_header, combined_sections, combine_settings)
+        finally:
+            for spool in spools:
+                spool.close()
+
+        return full_path
 
+    @classmethod
+    def combine_levels_parallel(
+            cls,
+            levels: list[m_level_data.Level | str],
+            folder_path: str,
+            filename: str = "level",
+            primary_level: m_level_data.Level = None,
+            combine_settings: m_combine_settings.CombineSettings = m_combine_settings.CombineSettings(),
+            max_workers: int | None = None,
+            combine_report: m_combine_report.CombineReport | None = None
+        ):
+        # Give every worker one group, keeping the order of the levels
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        group_count = max(1, min(max_workers, len(levels)))
+
+        # Not worth starting workers for
+        if group_count == 1:
+            return cls.combine_levels_to_file(levels, folder_path, filename, primary_level, combine_settings, combine_report)
+
+        level_names = [cls.get_level_name(level, f"level #{index + 1}") for index, level in enumerate(levels)]
+        group_size = math.ceil(len(levels) / group_count)
+        group_starts = range(0, len(levels), group_size)
+
+        combined_sections, spools = cls._create_combined_spools()
+        context = multiprocessing.get_context()
+        processes: list[multiprocessing.process.BaseProcess] = []
+        connections: list[multiprocessing.connection.Connection] = []
+
+        try:
+            combine_index = _CombineIndex(cls, combine_settings, combine_report)
+            source_header = cls._add_primary_level_to_combined_spools(combined_sections, primary_level, combine_settings, combine_index)
+
+            # Levels in memory are handed to the workers as they are, which costs nothing where workers are forked
+            for group_start in group_starts:
+                group_end = group_start + group_size
+                group_levels = [level if isinstance(level, str) else level.share_data() for level in levels[group_start:group_end]]
+
+                connection, worker_connection = context.Pipe()
+                process = context.Process(
+                    target = _combine_level_group,
+                    args = (cls, worker_connection, group_levels, level_names[group_start:group_end], combine_settings, source_header is None and group_start == 0),
+                    daemon = True
+                )
+                process.start()
+                worker_connection.close()
+                processes.append(process)
+                connections.append(connection)
+
+            # The workers read and summarize their levels, then the main process plans the rewrites in the order of the levels
+            with m_instrumentation.measure("combine_levels.plan") as measurement:
+                group_summaries = [_receive_from_worker(connection) for connection in connections]
+
+                invalid_levels = [
+                    m_version_excs.InvalidLevel(level_name, problems)
+                    for group_start, (_, group_problems, _) in zip(group_starts, group_summaries)
+                    for level_name, problems in zip(level_names[group_start:], group_problems)
+                    if len(problems) > 0
+                ]
+                if len(invalid_levels) > 0:
+                    raise m_version_excs.InvalidLevels(invalid_levels)
+
+                source = group_summaries[0][0]
+                if source is not None:
+                    source_header, prefixes = source
+                    cls._add_combined_section_prefixes(combined_sections, prefixes)
+
+                for connection, (_, _, level_summaries) in zip(connections, group_summaries):
+                    connection.send([combine_index.plan_rewrite(level_summary) for level_summary in level_summaries])
+
+                measurement.add_objects(len(levels))
+
+            # The workers send their level elements as JSON text, which is joined in order without being decoded
+            with m_instrumentation.measure("combine_levels.merge") as measurement:
+                for connection in connections:
+                    encoded_sections = _receive_from_worker(connection)
+                    for section_name, encoded_items in encoded_sections.items():
+                        if section_name == "events":
+                            for kf_name, encoded_kfs in encoded_items.items():
+                                combined_sections["events"][kf_name].extend_encoded(encoded_kfs)
+                        else:
+                            combined_sections[section_name].extend_encoded(encoded_items)
+
+                measurement.add_objects(cls._count_combined_objects(combined_sections))
+
+            for process in processes:
+                process.join()
+
+            full_path = cls._finish_combined_level_file(folder_path, filename, source_header, combined_sections, combine_settings)
+        finally:
+            # Workers are only still running if the combine failed
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+            for connection in connections:
+                connection.close()
+            for spool in spools:
+                spool.close()
+
+        return full_path
+
+
+    @classmethod
+    def plan_combine(
+            cls,
+            levels: list[m_level_data.Level | str],
+            primary_level: m_level_data.Level = None,
+            combine_settings: m_combine_settings.CombineSettings = m_combine_settings.CombineSettings()
+        ):
+        with m_instrumentation.measure("combine_levels.plan") as measurement:
+            level_names: list[str] = []
+            level_datas: list[dict] = []
+            for index, level in enumerate(levels):
+                level_names.append(cls.get_level_name(level, f"level #{index + 1}"))
+                if isinstance(level, str):
+                    level_datas.append(m_parse_cache.PARSE_CACHE.get_json(level))
+                else:
+                    level_datas.append(level.share_data())
+
+            if primary_level is not None:
+                level_names.append(cls.get_level_name(primary_level, "primary level"))
+                level_datas.append(primary_level.share_data())
+
+            cls.validate_levels(level_datas, level_names)
+
+            primary_level_data = level_datas[-1] if primary_level is not None else None
+            planned_level_data, first_pass_count = cls._plan_combine_passes(level_datas[:len(levels)], primary_level_data, combine_settings)
+
+            combine_plan = m_combine_plan.CombinePlan()
+            combine_plan.level_count = len(levels)
+
+            combine_plan.section_counts = {
+                "beatmap_objects": len(planned_level_data["beatmap_objects"]),
+                "prefabs": len(planned_level_data["prefabs"]),
+                "prefab_objects": len(planned_level_data["prefab_objects"]),
+                "markers": len(planned_level_data["ed"]["markers"]),
+                "checkpoints": len(planned_level_data["checkpoints"]),
+                "bg_objects": len(planned_level_data["bg_objects"])
+            }
+            combine_plan.event_keyframe_counts = {kf_name: len(kfs) for kf_name, kfs in planned_level_data["events"].items()}
+
+            # The same level can be given more than once, so the first objects are told apart by the index of their level instead of by identity:
+            # the passes are planned again with the checkpoints and event keyframes of every level replaced by their level and item indexes, without the other level elements
+            tagged_level_datas = [
+                dict(
+                    level_data,
+                    ed = dict(level_data["ed"], markers = []),
+                    beatmap_objects = [],
+                    prefabs = [],
+                    prefab_objects = [],
+                    bg_objects = [],
+                    checkpoints = [(level_index, item_index) for item_index in range(len(level_data["checkpoints"]))],
+                    events = {
+                        kf_name: [(level_index, item_index) for item_index in range(len(level_data["events"][kf_name]))]
+                        for kf_name in cls.default_event_kfs
+                    }
+                )
+                for level_index, level_data in enumerate(level_datas)
+            ]
+            tagged_level_data, _ = cls._plan_combine_passes(
+                tagged_level_datas[:len(levels)],
+                tagged_level_datas[-1] if primary_level is not None else None,
+                combine_settings
+            )
+            kept_checkpoint_tags = set(item for item in tagged_level_data["checkpoints"] if isinstance(item, tuple))
+            kept_kf_tags = {kf_name: set(kf for kf in kfs if isinstance(kf, tuple)) for kf_name, kfs in tagged_level_data["events"].items()}
+
+            for level_index, (level_name, level_data) in enumerate(zip(level_names, level_datas)):
+                checkpoints: list[dict] = level_data["checkpoints"]
+                if combine_settings.include_checkpoints and len(checkpoints) > 0 and (level_index, 0) not in kept_checkpoint_tags:
+                    combine_plan.dropped_checkpoints.append((level_name, checkpoints[0]))
+
+                for kf_name in cls.default_event_kfs:
+                    kfs: list[dict] = level_data["events"][kf_name]
+                    if combine_settings.include_event_keyframes and len(kfs) > 0 and (level_index, 0) not in kept_kf_tags[kf_name]:
+                        combine_plan.dropped_event_keyframes.append((level_name, kf_name, kfs[0]))
+
+            combine_plan.theme_ids = cls._get_theme_ids_from_keyframes(planned_level_data["events"]["theme"])
+
+            # At the peak, the levels, the lists of the combined level (and of the first pass with a primary level) and its encoded JSON are all in memory
+            combine_plan.estimated_size = m_combine_plan.get_planned_json_size(planned_level_data)
+            combine_plan.estimated_input_memory = round(sum(m_disk_utils.estimate_json_memory(level_data) for level_data in level_datas))
+            combine_plan.estimated_peak_memory = (
+                combine_plan.estimated_input_memory
+                + 8 * (cls._count_planned_objects(planned_level_data) + first_pass_count)
+                + combine_plan.estimated_size
+            )
+
+            measurement.add_objects(len(level_datas))
+
+        return combine_plan
+
+    @classmethod
+    def _plan_combine_passes(cls, level_datas: list[dict], primary_level_data: dict | None, combine_settings: m_combine_settings.CombineSettings):
+        """
+        Returns the data of the planned combined level, planned with the same passes as `combine_levels`,
+        and the number of objects of the first pass if there is a primary level.
+        """
+        if primary_level_data is None:
+            return cls._plan_combined_level_data(level_datas, level_datas[0], combine_settings), 0
+
+        planned_level_data = cls._plan_combined_level_data(level_datas, primary_level_data, combine_settings)
+        first_pass_count = cls._count_planned_objects(planned_level_data)
+        planned_level_data = cls._plan_combined_level_data(
+            [primary_level_data, planned_level_data],
+            primary_level_data,
+            combine_settings.get_primary_level_settings()
+        )
+        return planned_level_data, first_pass_count
+
+    @classmethod
+    def _plan_combined_level_data(cls, level_datas: list[dict], source_level_data: dict, combine_settings: m_combine_settings.CombineSettings):
+        """Returns the data of the combined level with planned sections in place of the combined level elements. Nothing is rewritten against a combine index."""
+        # Only the checkpoints and event keyframes are reported on one by one, so only they keep their objects
+        combined_sections = cls._create_combined_sections(m_combine_plan.PlannedSection)
+        combined_sections["checkpoints"] = m_combine_plan.PlannedSection(keep_items = True)
+        combined_sections["events"] = {kf_name: m_combine_plan.PlannedSection(keep_items = True) for kf_name in cls.default_event_kfs}
+
+        for level_data in level_datas:
+            cls._add_level_to_combined_sections(combined_sections, level_data, combine_settings, None)
+
+        return cls._build_combined_level_data(combined_sections, source_level_data, combine_settings)
+
+    @classmethod
+    def _count_planned_objects(cls, planned_level_data: dict):
+        """Returns the number of objects in the level elements of the planned combined level."""
+        return sum(
+            len(planned_level_data[section_name])
+            for section_name in ["beatmap_objects", "prefabs", "prefab_objects", "checkpoints", "bg_objects"]
+        ) + len(planned_level_data["ed"]["markers"]) + sum(len(kfs) for kfs in planned_level_data["events"].values())
+
+
+    @classmethod
+    def _create_combined_spools(cls):
+        """Returns the empty level elements to combine levels into, each in its own spool, and the list of the spools to close after."""
+        combined_sections = cls._create_combined_sections(m_disk_utils.JSONListSpool)
+        spools: list[m_disk_utils.JSONListSpool] = [
+            section for section in combined_sections.values() if isinstance(section, m_disk_utils.JSONListSpool)
+        ] + list(combined_sections["events"].values())
+
+        return combined_sections, spools
+
+    @classmethod
+    def _add_combined_section_prefixes(cls, combined_sections: dict[str, typ.Any], prefixes: dict[str, typ.Any]):
+        """Adds the first objects of the source level that go before the combined level elements, as returned by `_get_combined_section_prefixes`."""
+        combined_sections["checkpoints"] += prefixes["checkpoints"]
+        for kf_name, kfs in prefixes["events"].items():
+            combined_sections["events"][kf_name] += kfs
+
+    @classmethod
+    def _get_combined_level_header(cls, source_level_data: dict):
+        """
+        Returns the source level with placeholders for the level elements, in the order that they will be written.
+        Keeps only what is needed from the source level so that the rest of it can be freed.
+        """
+        header = dict(source_level_data)
+        header["ed"] = dict(source_level_data["ed"])
+        header["ed"]["markers"] = None
+        for section_name in cls._combined_top_level_sections:
+            header[section_name] = None
+
+        return header
+
+    @classmethod
+    def _add_primary_level_to_combined_spools(
+            cls,
+            combined_sections: dict[str, typ.Any],
+            primary_level: m_level_data.Level | None,
+            combine_settings: m_combine_settings.CombineSettings,
+            combine_index: _CombineIndex
+        ):
+        """Adds the primary level to the spooled level elements if there is one. Returns the header of the combined level, or `None` if it comes from the first level."""
+        if primary_level is None:
+            return None
+
+        # Same as combining the primary level with the combined level using the default combine settings
+        primary_level_data = primary_level.share_data()
+        cls.validate_level(primary_level_data, cls.get_level_name(primary_level, "primary level"))
+
+        primary_level_settings = combine_settings.get_primary_level_settings()
+        cls._add_combined_section_prefixes(combined_sections, cls._get_combined_section_prefixes(primary_level_data, primary_level_settings))
+        cls._add_level_to_combined_sections(combined_sections, primary_level_data, primary_level_settings, combine_index)
+        for spool in [combined_sections["checkpoints"], *combined_sections["events"].values()]:
+            spool.skip_next()
+
+        cls._add_combined_section_prefixes(combined_sections, cls._get_combined_section_prefixes(primary_level_data, combine_settings))
+        return cls._get_combined_level_header(primary_level_data)
+
+    @classmethod
+    def _finish_combined_level_file(
+            cls,
+            folder_path: str,
+            filename: str,
+            source_header: dict,
+            combined_sections: dict[str, typ.Any],
+            combine_settings: m_combine_settings.CombineSettings
+        ):
+        """Adds the fallbacks to the spooled level elements and writes the combined level file. Returns the path of the file."""
+        # Make sure that the initial stuff required for the level are there!
+        fallbacks = cls._get_combined_section_fallbacks(combine_settings)
+        if fallbacks["checkpoints"] is not None:
+            combined_sections["checkpoints"] += fallbacks["checkpoints"]
+        if fallbacks["events"] is not None:
+            for kf_name, kfs in fallbacks["events"].items():
+                combined_sections["events"][kf_name] += kfs
+
+        with m_instrumentation.measure("combine_levels.write"):
+            return cls._write_combined_level_file(folder_path, filename, source_header, combined_sections)
+
+    @classmethod
+    def _write_combined_level_file(cls, folder_path: str, filename: str, source_header: dict, combined_sections: dict[str, typ.Any]):
+        """Writes the source level header with the spooled level elements in their places, the same way `Level.to_file_raw` would. Returns the path of the file."""
+        def write_dict(text_file: typ.TextIO, items: dict, write_value: typ.Callable[[str, typ.Any], None]):
+            """Writes a JSON dict, writing each value with `write_value`."""
+            text_file.write("{")
+            for index, (key, value) in enumerate(items.items()):
+                if index > 0:
+                    text_file.write(", ")
+                text_file.write(json.dumps(key, ensure_ascii = False))
+                text_file.write(": ")
+                write_value(key, value)
+            text_file.write("}")
+
+        if not m_disk_utils.path_exists(folder_path):
+            m_disk_utils.make_folder_path(folder_path)
+
+        full_path = os.path.join(folder_path, m_level_data.Level.append_file_ext_raw(filename))
+        with open(full_path, "wt", encoding = m_disk_utils.ENCODING) as text_file:
+            def write_value(key: str, value: typ.Any):
+                """Writes a value of the level."""
+                if key == "ed":
+                    write_dict(text_file, value, write_ed_value)
+                elif key == "events":
+                    write_dict(text_file, combined_sections["events"], lambda _, spool: spool.write_to(text_file))
+                elif key in cls._combined_top_level_sections:
+                    combined_sections[key].write_to(text_file)
+                else:
+                    text_file.write(json.dumps(value, ensure_ascii = False))
+
+            def write_ed_value(key: str, value: typ.Any):
+                """Writes a value of the `ed` of the level."""
+                if key == "markers":
+                    combined_sections["markers"].write_to(text_file)
+                else:
+                    text_file.write(json.dumps(value, ensure_ascii = False))
+
+            write_dict(text_file, source_header, write_value)
+
+        return full_path
+
+
+    _combined_top_level_sections = ["beatmap_objects", "prefabs", "prefab_objects", "checkpoints", "events", "bg_objects"]
+
+    @classmethod
+    def _create_combined_sections(cls, create_section: typ.Callable[[], list | m_disk_utils.JSONListSpool] = list) -> dict[str, typ.Any]:
+        """Returns the empty level elements to combine levels into. Each level element is made with `create_section`."""
+        return {
+            "beatmap_objects": create_section(),
+            "prefabs": create_section(),
+            "prefab_objects": create_section(),
+            "markers": create_section(),
+            "checkpoints": create_section(),
+            "events": {kf_name: create_section() for kf_name in cls.default_event_kfs},
+            "bg_objects": create_section()
+        }
+
+    @classmethod
+    def _count_combined_objects(cls, combined_sections: dict[str, typ.Any]):
+        """Returns the number of objects in the combined level elements."""
+        return sum(
+            len(combined_sections[section_name])
+            for section_name in ["beatmap_objects", "prefabs", "prefab_objects", "bg_objects"]
+        )
+
+    @classmethod
+    def _add_level_to_combined_sections(
+            cls,
+            combined_sections: dict[str, typ.Any],
+            level_data: dict,
+            combine_settings: m_combine_settings.CombineSettings,
+            combine_index: _CombineIndex | None
+        ):
+        """Adds the level elements of the level data to the combined level elements, rewriting them against the combine index first if there is one."""
+        if combine_index is not None:
+            level_data = combine_index.rewrite_level(level_data)
 
         def delete_first_alg(level_element_list: list, delete_first: bool):
             """Deletes the first object from the list if `delete_first` is True. Returns the list after."""
@@ -220,85 +735,339 @@ class v20_4_4(m_versions.PAVersion):
 
             return level_element_list
 
-        # Combine!
-        for level in copied_levels:
-            if combine_settings.include_beatmap_objects:
-                combined_beatmap_objects += level.data["beatmap_objects"]
+        if combine_settings.include_beatmap_objects:
+            combined_sections["beatmap_objects"] += level_data["beatmap_objects"]
 
-            if combine_settings.include_prefabs:
-                combined_imported_prefabs += level.data["prefabs"]
-                combined_prefab_objects += level.data["prefab_objects"]
+        if combine_settings.include_prefabs:
+            combined_sections["prefabs"] += level_data["prefabs"]
+            combined_sections["prefab_objects"] += level_data["prefab_objects"]
 
-            if combine_settings.include_markers:
-                combined_markers += level.data["ed"]["markers"]
+        if combine_settings.include_markers:
+            combined_sections["markers"] += level_data["ed"]["markers"]
 
-            if combine_settings.include_checkpoints:
-                combined_checkpoints += delete_first_alg(
-                    level.data["checkpoints"],
-                    combine_settings.delete_first_checkpoint
+        if combine_settings.include_checkpoints:
+            combined_sections["checkpoints"] += delete_first_alg(
+                level_data["checkpoints"],
+                combine_settings.delete_first_checkpoint
+            )
+
+        if combine_settings.include_event_keyframes:
+            for kf_name, combined_kfs in combined_sections["events"].items():
+                combined_kfs += delete_first_alg(
+                    level_data["events"][kf_name],
+                    combine_settings.delete_first_event_keyframes
                 )
 
-            if combine_settings.include_event_keyframes:
-                for kf_name in event_kf_names:
-                    combined_event_keyframes[kf_name] += delete_first_alg(
-                        level.data["events"][kf_name],
-                        combine_settings.delete_first_event_keyframes
-                    )
+        if combine_settings.include_bg_objects:
+            combined_sections["bg_objects"] += level_data["bg_objects"]
 
-            if combine_settings.include_bg_objects:
-                combined_bg_objects += level.data["bg_objects"]
+    @classmethod
+    def _get_combined_section_prefixes(cls, source_level_data: dict, combine_settings: m_combine_settings.CombineSettings) -> dict[str, typ.Any]:
+        """Returns the first objects of the source level that go before the combined level elements since they were deleted from every level."""
+        def get_first_object_if_deleted(level_element: list, is_deleted: bool):
+            """Returns the first object of the source level element list in a list if it was deleted earlier."""
+            if is_deleted:
+                return [level_element[0]]
 
+            return []
 
+        return {
+            "checkpoints": get_first_object_if_deleted(source_level_data["checkpoints"], combine_settings.delete_first_checkpoint),
+            "events": {
+                kf_name: get_first_object_if_deleted(source_level_data["events"][kf_name], combine_settings.delete_first_event_keyframes)
+                for kf_name in cls.default_event_kfs
+            }
+        }
+
+    @classmethod
+    def _get_combined_section_fallbacks(cls, combine_settings: m_combine_settings.CombineSettings) -> dict[str, typ.Any]:
+        """Returns the initial stuff required for the level in place of the level elements that aren't included, or `None` for those that are."""
+        return {
+            "checkpoints": [cls.default_checkpoint] if not combine_settings.include_checkpoints else None,
+            "events": {kf_name: list(kfs) for kf_name, kfs in cls.default_event_kfs.items()} if not combine_settings.include_event_keyframes else None
+        }
+
+    @classmethod
+    def _build_combined_level(cls, combined_sections: dict[str, typ.Any], source_level_data: dict, combine_settings: m_combine_settings.CombineSettings):
+        """Builds the combined level from the combined level elements and the source level."""
+        return m_level_data.Level.from_shared_data(cls._build_combined_level_data(combined_sections, source_level_data, combine_settings))
+
+    @classmethod
+    def _build_combined_level_data(cls, combined_sections: dict[str, typ.Any], source_level_data: dict, combine_settings: m_combine_settings.CombineSettings):
+        """Returns the data of the combined level from the combined level elements and the source level."""
         # Make sure that the initial stuff required for the level are there!
-        if not combine_settings.include_checkpoints:
-            combined_checkpoints = [cls.default_checkpoint]
-        if not combine_settings.include_event_keyframes:
-            combined_event_keyframes = cls.default_event_kfs
+        fallbacks = cls._get_combined_section_fallbacks(combine_settings)
+        combined_checkpoints: list[dict] = fallbacks["checkpoints"] or combined_sections["checkpoints"]
+        combined_event_keyframes: dict[str, list] = fallbacks["events"] or combined_sections["events"]
 
+        prefixes = cls._get_combined_section_prefixes(source_level_data, combine_settings)
 
 
-        def insert_first_object_if_deleted(level_element: list, is_deleted: bool, to_insert: list[dict]):
-            """Reinserts the first object of the source level to the level element list if it was deleted earlier."""
-            if is_deleted:
-                level_element.insert(0, to_insert[0])
+        # Copy the top of the source level then add the combined level elements
+        combined_level_data = dict(source_level_data)
+        combined_level_data["ed"] = dict(source_level_data["ed"])
 
 
-        # Copy source level then add the combined level elements
-        combined_level_data = copy.deepcopy(source_level.data)
+        combined_level_data["beatmap_objects"] = combined_sections["beatmap_objects"]
 
+        combined_level_data["prefabs"] = combined_sections["prefabs"]
+        combined_level_data["prefab_objects"] = combined_sections["prefab_objects"]
 
-        combined_level_data["beatmap_objects"] = combined_beatmap_objects
+        combined_level_data["ed"]["markers"] = combined_sections["markers"]
 
-        combined_level_data["prefabs"] = combined_imported_prefabs
-        combined_level_data["prefab_objects"] = combined_prefab_objects
+        combined_level_data["checkpoints"] = prefixes["checkpoints"] + combined_checkpoints
 
-        combined_level_data["ed"]["markers"] = combined_markers
+        combined_level_data["events"] = {
+            kf_name: prefixes["events"][kf_name] + kfs
+            for kf_name, kfs in combined_event_keyframes.items()
+        }
 
-        combined_level_data["checkpoints"] = combined_checkpoints
-        insert_first_object_if_deleted(
-            combined_level_data["checkpoints"],
-            combine_settings.delete_first_checkpoint,
-            source_level.data["checkpoints"]
-        )
+        combined_level_data["bg_objects"] = combined_sections["bg_objects"]
 
-        combined_level_data["events"] = combined_event_keyframes
-        if combine_settings.delete_first_event_keyframes:
-            for kf_name in event_kf_names:
-                insert_first_object_if_deleted(
-                    combined_level_data["events"][kf_name],
-                    True,
-                    source_level.data["events"][kf_name]
-                )
+        return combined_level_data
 
-        combined_level_data["bg_objects"] = combined_bg_objects
 
+class _CombineIndex(m_base.PAObject):
+    """Keeps indexes of what was already combined, so that each level can be rewritten against them in the same pass as it is combined."""
+    def __init__(self, version: type[v20_4_4], combine_settings: m_combine_settings.CombineSettings, combine_report: m_combine_report.CombineReport | None):
+        if combine_report is None:
+            combine_report = m_combine_report.CombineReport()
 
-        combined_level = m_level_data.Level(combined_level_data)
+        self.version = version
+        self.combine_settings = combine_settings
+        self.combine_report = combine_report
 
-        if copied_primary_level is not None:
-            combined_level: m_level_data.Level = cls.combine_levels([copied_primary_level, combined_level])
+        self.prefab_ids_by_hash: dict[bytes, str] = {}
+        self.combined_ids: dict[str, set[str]] = {section_name: set() for section_name in ["prefabs", "prefab_objects", "beatmap_objects"]}
 
-        return combined_level
+
+    def rewrite_level(self, level_data: dict) -> dict:
+        """Returns the level with its level elements rewritten against the index. The level itself isn't modified."""
+        return self.apply_rewrite(level_data, self.plan_rewrite(self.summarize_level(level_data)))
+
+
+    def summarize_level(self, level_data: dict) -> dict | None:
+        """
+        Returns what `plan_rewrite` needs to know about the level, or `None` if levels aren't rewritten.
+        Doesn't use the index, so worker processes can summarize their levels for the index of the main process.
+        """
+        deduplicate_prefabs = self._is_deduplicating_prefabs()
+        if not (deduplicate_prefabs or self.combine_settings.remap_colliding_ids):
+            return None
+
+        level_summary = {"prefabs": None, "ids": {}}
+        if deduplicate_prefabs:
+            level_summary["prefabs"] = [(prefab.get("id"), *self._get_prefab_hash_and_size(prefab)) for prefab in level_data["prefabs"]]
+
+        if self.combine_settings.remap_colliding_ids:
+            for section_name in self._get_included_id_sections():
+                # The IDs of the prefabs left after deduplication are only known once the level is planned
+                if not (section_name == "prefabs" and deduplicate_prefabs):
+                    level_summary["ids"][section_name] = list(dict.fromkeys(level_element.get("id") for level_element in level_data[section_name]))
+
+        return level_summary
+
+    def plan_rewrite(self, level_summary: dict | None) -> dict | None:
+        """Returns how to rewrite the summarized level against the index, then adds the level to the index and the combine report."""
+        if level_summary is None:
+            return None
+
+        level_rewrite = {
+            "removed_prefab_indexes": [],
+            "remapped_ids": {},
+            "id_maps": {section_name: {} for section_name in self.combined_ids}
+        }
+
+        level_ids: dict[str, list[str]] = dict(level_summary["ids"])
+        if level_summary["prefabs"] is not None:
+            kept_prefab_ids = self._deduplicate_prefabs(level_summary["prefabs"], level_rewrite)
+            if self.combine_settings.remap_colliding_ids:
+                level_ids["prefabs"] = list(dict.fromkeys(kept_prefab_ids))
+
+        for section_name, section_ids in level_ids.items():
+            id_map = self._remap_colliding_ids(section_ids, section_name)
+            level_rewrite["remapped_ids"][section_name] = id_map
+            level_rewrite["id_maps"][section_name].update(id_map)
+
+        return level_rewrite
+
+    def apply_rewrite(self, level_data: dict, level_rewrite: dict | None) -> dict:
+        """Returns the level rewritten as planned by `plan_rewrite`. The level itself isn't modified. Doesn't use the index."""
+        if level_rewrite is None:
+            return level_data
+
+        level_data = dict(level_data)
+        if self._is_deduplicating_prefabs():
+            removed_prefab_indexes = set(level_rewrite["removed_prefab_indexes"])
+            level_data["prefabs"] = [prefab for index, prefab in enumerate(level_data["prefabs"]) if index not in removed_prefab_indexes]
+
+        for section_name, id_map in level_rewrite["remapped_ids"].items():
+            if len(id_map) > 0:
+                level_data[section_name] = [
+                    level_element | {"id": id_map[level_element["id"]]}
+                    if level_element.get("id") in id_map else level_element
+                    for level_element in level_data[section_name]
+                ]
+
+        self._rewrite_references(level_data, level_rewrite["id_maps"])
+        return level_data
+
+
+    def _is_deduplicating_prefabs(self):
+        """Returns `True` if the prefabs of the levels are deduplicated."""
+        return self.combine_settings.deduplicate_prefabs and self.combine_settings.include_prefabs
+
+    def _get_included_id_sections(self):
+        """Returns the names of the level elements with IDs that are combined."""
+        section_names: list[str] = []
+        if self.combine_settings.include_prefabs:
+            section_names += ["prefabs", "prefab_objects"]
+        if self.combine_settings.include_beatmap_objects:
+            section_names += ["beatmap_objects"]
+
+        return section_names
+
+    @staticmethod
+    def _get_prefab_hash_and_size(prefab: dict):
+        """Returns the hash of the content of the prefab without its ID, and the number of bytes it takes in the combined level."""
+        prefab_content = json.dumps(
+            {key: value for key, value in prefab.items() if key != "id"},
+            sort_keys = True, ensure_ascii = False, separators = (",", ":")
+        )
+        prefab_hash = hashlib.blake2b(prefab_content.encode(m_disk_utils.ENCODING), digest_size = 16).digest()
+        return prefab_hash, len(json.dumps(prefab, ensure_ascii = False).encode(m_disk_utils.ENCODING)) + len(", ")
+
+    def _deduplicate_prefabs(self, prefab_summaries: list[tuple[str, bytes, int]], level_rewrite: dict):
+        """Plans the removal of the prefabs that have the same content as an already combined prefab. Returns the IDs of the kept prefabs."""
+        kept_prefab_ids: list[str] = []
+
+        for index, (prefab_id, prefab_hash, prefab_size) in enumerate(prefab_summaries):
+            kept_prefab_id = self.prefab_ids_by_hash.get(prefab_hash)
+            if kept_prefab_id is None:
+                self.prefab_ids_by_hash[prefab_hash] = prefab_id
+                kept_prefab_ids.append(prefab_id)
+                continue
+
+            level_rewrite["removed_prefab_indexes"].append(index)
+            level_rewrite["id_maps"]["prefabs"][prefab_id] = kept_prefab_id
+            self.combine_report.removed_prefab_count += 1
+            self.combine_report.removed_prefab_bytes += prefab_size
+
+        return kept_prefab_ids
+
+    def _remap_colliding_ids(self, level_ids: list[str], section_name: str):
+        """
+        Gives new IDs to the level elements whose IDs were already combined, then adds the IDs to the index. Returns the map of old IDs to new IDs.
+        IDs repeated within the level aren't told apart, since references to them are ambiguous: every element with the ID gets the same new ID.
+        """
+        combined_ids = self.combined_ids[section_name]
+        level_id_set = set(level_ids)
+
+        id_map: dict[str, str] = {}
+        new_ids: set[str] = set()
+        for level_id in level_ids:
+            if level_id is None or level_id not in combined_ids:
+                continue
+
+            new_id = self._generate_id(level_id, lambda new_id: new_id in combined_ids or new_id in level_id_set or new_id in new_ids)
+            id_map[level_id] = new_id
+            new_ids.add(new_id)
+            self.combine_report.remapped_ids.setdefault(section_name, []).append((level_id, new_id))
+
+        combined_ids.update(level_id_set)
+        combined_ids.update(new_ids)
+        return id_map
+
+    @staticmethod
+    def _generate_id(old_id: str, is_taken: typ.Callable[[str], bool]):
+        """Returns a new ID derived from the old ID that isn't taken, with the same length as the old ID where possible."""
+        id_length = len(old_id) if 8 <= len(old_id) <= 32 else 16
+        attempt = 0
+        while True:
+            new_id = hashlib.blake2b(f"{old_id}#{attempt}".encode(m_disk_utils.ENCODING), digest_size = 16).hexdigest()[:id_length]
+            if not is_taken(new_id):
+                return new_id
+            attempt += 1
+
+    def _rewrite_references(self, level_data: dict, id_maps: dict[str, dict[str, str]]):
+        """Maps the references of the level elements through the ID maps of the level elements they refer to. Only rewritten elements are copied."""
+        for section_name, references in self.version.id_references.items():
+            references = {
+                reference_key: id_maps[referenced_section_name]
+                for reference_key, referenced_section_name in references.items()
+                if len(id_maps[referenced_section_name]) > 0
+            }
+            if len(references) == 0 or section_name not in level_data:
+                continue
+
+            rewritten_level_elements: list[dict] = []
+            for level_element in level_data[section_name]:
+                rewritten_references = {
+                    reference_key: id_map[level_element[reference_key]]
+                    for reference_key, id_map in references.items()
+                    if level_element.get(reference_key) in id_map
+                }
+                if len(rewritten_references) > 0:
+                    level_element = level_element | rewritten_references
+                rewritten_level_elements.append(level_element)
+
+            level_data[section_name] = rewritten_level_elements
+
+
+def _receive_from_worker(connection: multiprocessing.connection.Connection):
+    """Returns the next message of a worker of `combine_levels_parallel`, raising the exception the worker sent instead if there is one."""
+    message = connection.recv()
+    if isinstance(message, BaseException):
+        raise message
+
+    return message
+
+def _combine_level_group(
+        version: type[v20_4_4],
+        connection: multiprocessing.connection.Connection,
+        levels: list[dict | str],
+        level_names: list[str],
+        combine_settings: m_combine_settings.CombineSettings,
+        send_source: bool
+    ):
+    """
+    Combines a group of levels in a worker process of `combine_levels_parallel`. Each level is given as its data or the path to its `level.lsb`.
+    First sends the problems and summaries of the levels, and the header and prefixes of the first level if `send_source` is `True`.
+    Then receives the planned rewrites of the levels and sends their combined level elements, with every object encoded as JSON text.
+    """
+    try:
+        combine_index = _CombineIndex(version, combine_settings, None)
+        level_datas = [m_disk_utils.read_json_file(level) if isinstance(level, str) else level for level in levels]
+        level_problems = [version.get_level_problems(level_data, level_name) for level_data, level_name in zip(level_datas, level_names)]
+
+        source = None
+        if send_source and len(level_problems[0]) == 0:
+            source = (version._get_combined_level_header(level_datas[0]), version._get_combined_section_prefixes(level_datas[0], combine_settings))
+
+        if any(len(problems) > 0 for problems in level_problems):
+            # Nothing is combined, the main process raises `InvalidLevels` instead
+            connection.send((source, level_problems, None))
+            return
+
+        connection.send((source, level_problems, [combine_index.summarize_level(level_data) for level_data in level_datas]))
+        level_rewrites = connection.recv()
+
+        combined_sections = version._create_combined_sections()
+        for level_data, level_rewrite in zip(level_datas, level_rewrites):
+            version._add_level_to_combined_sections(combined_sections, combine_index.apply_rewrite(level_data, level_rewrite), combine_settings, None)
+
+        def encode_items(items: list):
+            """Returns the items encoded the same way as in `JSONListSpool`."""
+            return [json.dumps(item, ensure_ascii = False) for item in items]
+
+        connection.send({
+            section_name: {kf_name: encode_items(kfs) for kf_name, kfs in section.items()} if section_name == "events" else encode_items(section)
+            for section_name, section in combined_sections.items()
+        })
+    except Exception as exc:
+        connection.send(exc)
+    finally:
+        connection.close()
 
 
 DEFAULT_VERSION = v20_4_4
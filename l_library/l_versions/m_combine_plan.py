@@ -0,0 +1,124 @@
+"""Contains combine plans, which estimate what a combine would produce without combining."""
+
+
+from __future__ import annotations
+
+import typing as typ
+
+import json
+
+from .. import m_base, m_disk_utils
+
+
+class CombinePlan(m_base.PAObject):
+    """Represents what a combine would produce, estimated without combining."""
+    def __init__(self):
+        self.level_count = 0
+
+        self.section_counts: dict[str, int] = {}
+        """The number of objects of each level element in the combined level."""
+        self.event_keyframe_counts: dict[str, int] = {}
+        """The number of keyframes of each event channel in the combined level."""
+
+        self.dropped_checkpoints: list[tuple[str, dict]] = []
+        """The first checkpoints that don't end up in the combined level, with the name of their level."""
+        self.dropped_event_keyframes: list[tuple[str, str, dict]] = []
+        """The first event keyframes that don't end up in the combined level, with the name of their level and their channel."""
+
+        self.theme_ids: list[int] = []
+        """The IDs of the custom themes that the combined level needs."""
+
+        self.estimated_size = 0
+        """The estimated number of bytes of the combined `level.lsb`, from samples of the objects. It tends to be low when a few objects are much larger than the others."""
+        self.estimated_input_memory = 0
+        """The estimated number of bytes that the levels take in memory."""
+        self.estimated_peak_memory = 0
+        """The estimated peak number of bytes in memory while combining the levels with `combine_levels` then writing the combined level, including the levels."""
+
+
+class PlannedSection(m_base.PAObject):
+    """
+    Stands in for a combined level element in a combine plan. Counts the objects added to it and estimates their encoded size from some of them instead of keeping them.
+    The objects themselves are only kept if `keep_items` is `True`, for the level elements that the plan reports objects of.
+    """
+    sample_count = 64
+    """The least number of objects that the encoded size of the objects added at once is estimated from."""
+
+    def __init__(self, keep_items: bool = False):
+        self.count = 0
+        self.size = 0.0
+        """The estimated number of bytes of the encoded objects, with the separators between them."""
+        self.items: list | None = [] if keep_items else None
+
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        if self.items is None:
+            raise TypeError("The objects of the planned section weren't kept")
+
+        return iter(self.items)
+
+    def __getitem__(self, index: slice):
+        if self.items is None:
+            raise TypeError("The objects of the planned section weren't kept")
+
+        planned_section = PlannedSection(keep_items = True)
+        planned_section += self.items[index]
+        return planned_section
+
+    def __iadd__(self, items: list | PlannedSection):
+        if isinstance(items, PlannedSection):
+            self.count += items.count
+            self.size += items.size
+            if self.items is not None:
+                self.items.extend(items.items)
+        else:
+            self.count += len(items)
+            self.size += len(items) * (estimate_item_size(items, self.sample_count) + len(", "))
+            if self.items is not None:
+                self.items.extend(items)
+
+        return self
+
+    def __radd__(self, items: list):
+        planned_section = PlannedSection(keep_items = self.items is not None)
+        planned_section += items
+        planned_section += self
+        return planned_section
+
+
+    def get_encoded_size(self):
+        """Returns the estimated number of bytes of the section encoded as a JSON list."""
+        return round(len("[]") + self.size - (len(", ") if self.count > 0 else 0))
+
+
+SIZE_SAMPLE_FRACTION = 1 / 32
+"""The fraction of the items of long lists that their encoded size is estimated from."""
+
+def estimate_item_size(items: list, sample_count: int = PlannedSection.sample_count):
+    """
+    Returns the average number of bytes of the encoded items of the list, estimated from `sample_count` of them or `SIZE_SAMPLE_FRACTION` of them if that is more.
+    The estimate tends to be low for lists where a few items are much larger than the others, such as a few objects with most of the keyframes.
+    """
+    if len(items) == 0:
+        return 0.0
+
+    sampled_items = m_disk_utils.sample_items(items, sample_count, SIZE_SAMPLE_FRACTION)
+    return sum(get_json_size(item) for item in sampled_items) / len(sampled_items)
+
+def get_json_size(json_data: typ.Any):
+    """Returns the number of bytes of the JSON data, encoded the same way as levels."""
+    return len(json.dumps(json_data, ensure_ascii = False).encode(m_disk_utils.ENCODING))
+
+def get_planned_json_size(json_data: typ.Any) -> int:
+    """Returns the estimated number of bytes of the JSON data encoded the same way as levels, where planned sections count as the lists they stand in for."""
+    if isinstance(json_data, PlannedSection):
+        return json_data.get_encoded_size()
+    if isinstance(json_data, dict):
+        return len("{}") + sum(
+            get_json_size(key) + len(": ") + get_planned_json_size(value) for key, value in json_data.items()
+        ) + len(", ") * max(0, len(json_data) - 1)
+
+    return get_json_size(json_data)
@@ -0,0 +1,25 @@
+"""Contains combine reports."""
+
+
+from __future__ import annotations
+
+from .. import m_base
+
+
+class CombineReport(m_base.PAObject):
+    """Represents what was changed while combining. Pass one to a combine to have it filled in."""
+    def __init__(self):
+        self.removed_prefab_count = 0
+        self.removed_prefab_bytes = 0
+
+        self.remapped_ids: dict[str, list[tuple[str, str]]] = {}
+        """The old and new IDs of the level elements that were given new IDs because their IDs were already used, by level element."""
+
+
+    def merge(self, other: CombineReport):
+        """Adds the other report to this report."""
+        self.removed_prefab_count += other.removed_prefab_count
+        self.removed_prefab_bytes += other.removed_prefab_bytes
+
+        for section_name, remapped_ids in other.remapped_ids.items():
+            self.remapped_ids.setdefault(section_name, []).extend(remapped_ids)
@@ -16,7 +16,10 @@ class CombineSettings(m_base.PAObject):
             include_bg_objects: bool = True,
 
             delete_first_checkpoint: bool = True,
-            delete_first_event_keyframes: bool = True
+            delete_first_event_keyframes: bool = True,
+
+            deduplicate_prefabs: bool = False,
+            remap_colliding_ids: bool = True
         ):
         self.include_beatmap_objects = include_beatmap_objects
         self.include_prefabs = include_prefabs
@@ -27,3 +30,14 @@ class CombineSettings(m_base.PAObject):
 
         self.delete_first_checkpoint = delete_first_checkpoint
         self.delete_first_event_keyframes = delete_first_event_keyframes
+
+        self.deduplicate_prefabs = deduplicate_prefabs
+        self.remap_colliding_ids = remap_colliding_ids
+
+
+    def get_primary_level_settings(self):
+        """Returns the settings used when combining the primary level with the other levels, which include everything but keep the other options."""
+        return CombineSettings(
+            deduplicate_prefabs = self.deduplicate_prefabs,
+            remap_colliding_ids = self.remap_colliding_ids
+        )
@@ -47,6 +47,15 @@ class AudioNotPresent(ImportException):
         super().__init__("The audio is not present.")
 
 
+class AudioTooShort(ImportException):
+    """The audio ends before the last event of the level."""
+    def __init__(self, audio_path: str, audio_duration: float, level_end_time: float):
+        super().__init__(f"The audio {audio_path} is {audio_duration:.3f} seconds long but the level ends at {level_end_time:.3f} seconds.")
+        self.audio_path = audio_path
+        self.audio_duration = audio_duration
+        self.level_end_time = level_end_time
+
+
 class ThemeImportException(ImportException):
     """A theme import exception has occurred."""
 
@@ -66,3 +75,48 @@ class NoThemesInFolder(ThemeImportException):
     """There's no themes in the theme folder."""
     def __init__(self):
         super().__init__("There are no detectable themes in the themes folder. Make sure there are valid themes in the folder.")
+
+
+class LevelSchemaException(ImportException):
+    """The level doesn't have the structure required by the version."""
+
+class LevelSectionProblem(LevelSchemaException):
+    """A section of the level has a problem."""
+    def __init__(self, message: str, level_name: str, section_path: str):
+        super().__init__(message)
+        self.level_name = level_name
+        self.section_path = section_path
+
+class MissingLevelSection(LevelSectionProblem):
+    """A required section of the level is missing."""
+    def __init__(self, level_name: str, section_path: str):
+        super().__init__(f"Missing section in {level_name}: {section_path}", level_name, section_path)
+
+    def __reduce__(self):
+        return (type(self), (self.level_name, self.section_path))
+
+class InvalidLevelSection(LevelSectionProblem):
+    """A section of the level has the wrong type."""
+    def __init__(self, level_name: str, section_path: str, expected_type: str):
+        super().__init__(f"Section {section_path} in {level_name} should be of type {expected_type}.", level_name, section_path)
+        self.expected_type = expected_type
+
+    def __reduce__(self):
+        return (type(self), (self.level_name, self.section_path, self.expected_type))
+
+class InvalidLevel(LevelSchemaException):
+    """The level has one or more section problems."""
+    def __init__(self, level_name: str, problems: list[LevelSectionProblem]):
+        problem_list = "\n".join([f"- {problem}" for problem in problems])
+        super().__init__(f"The level {level_name} has {len(problems)} problem(s):\n{problem_list}")
+        self.level_name = level_name
+        self.problems = problems
+
+    def __reduce__(self):
+        return (type(self), (self.level_name, self.problems))
+
+class InvalidLevels(LevelSchemaException):
+    """One or more levels have section problems."""
+    def __init__(self, invalid_levels: list[InvalidLevel]):
+        super().__init__("\n".join([str(invalid_level) for invalid_level in invalid_levels]))
+        self.invalid_levels = invalid_levels
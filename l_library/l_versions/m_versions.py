@@ -3,8 +3,35 @@
 
 from __future__ import annotations
 
-from .. import m_handlers, m_level_data
-from . import m_combine_settings, m_branches
+import typing as typ
+
+from .. import m_handlers, m_level_data, m_cow
+from . import m_combine_settings, m_combine_report, m_combine_plan, m_branches, m_version_excs
+
+
+CompiledSchema = tuple[type, "ValueSchema | None", tuple[tuple[str, "CompiledSchema"], ...], "CompiledSchema | None"]
+
+
+class ValueSchema:
+    """Stands in a level schema for values of a type that must also pass a check, such as strings that have to hold integers."""
+    def __init__(self, value_type: type, is_valid: typ.Callable[[typ.Any], bool], description: str):
+        self.value_type = value_type
+        self.is_valid = is_valid
+        self.description = description
+        """What the values must be, for problems."""
+
+
+def is_int_string(value: str):
+    """Returns `True` if the string can be converted with `int`, otherwise `False`."""
+    try:
+        int(value)
+    except ValueError:
+        return False
+
+    return True
+
+INT_STRING = ValueSchema(str, is_int_string, "str holding an integer")
+"""The schema of strings that have to hold integers, such as theme IDs."""
 
 
 class PAVersion(m_handlers.JSONClassHandler):
@@ -69,12 +96,19 @@ class PAVersion(m_handlers.JSONClassHandler):
 
 
     @classmethod
-    def import_level_folder(cls, level_folder_path: str, load_audio: bool = True) -> m_level_data.LevelFolder:
-        """Gets the level data from a folder."""
+    def import_level_folder(cls, level_folder_path: str, load_audio: bool = True, validate: bool = True, intern_strings: bool = False) -> m_level_data.LevelFolder:
+        """
+        Gets the level data from a folder. If `validate` is `True`, raises `InvalidLevel` with every problem of the level if its structure isn't valid.
+        If `intern_strings` is `True`, the level is decoded with its short string values interned, which trades decoding time for memory (see `m_disk_utils.decode_json`).
+        """
 
     @classmethod
-    def export_level_folder(cls, level_folder: m_level_data.LevelFolder, folder_path: str):
-        """Exports the level folder."""
+    def export_level_folder(cls, level_folder: m_level_data.LevelFolder, folder_path: str, hardlink: bool = False, validate: bool = False):
+        """
+        Exports the level folder. Elements that weren't modified since they were imported are copied, or hard linked if `hardlink` is `True`.
+        The audio is left out if the level folder has none.
+        If `validate` is `True`, raises `InvalidLevel` with every problem of the level before writing anything if its structure isn't valid.
+        """
 
 
     @classmethod
@@ -94,18 +128,196 @@ class PAVersion(m_handlers.JSONClassHandler):
         """Returns all themes in a folder."""
 
 
+    @classmethod
+    def get_level_end_time(cls, level: m_level_data.Level) -> float:
+        """Returns the time in seconds of the last event of the level."""
+
+    @classmethod
+    def validate_level_audio(cls, level: m_level_data.Level, audio_path: str):
+        """
+        Probes the audio without loading it and returns the probe. Raises `InvalidAudio` if it isn't a valid Ogg/Vorbis stream,
+        and `AudioTooShort` if it ends before the last event of the level.
+        """
+        audio_probe = m_level_data.Audio.probe(audio_path)
+        level_end_time = cls.get_level_end_time(level)
+        if audio_probe.duration < level_end_time:
+            raise m_version_excs.AudioTooShort(audio_path, audio_probe.duration, level_end_time)
+
+        return audio_probe
+
+
     default_checkpoint: dict
     default_event_kfs: dict[str, list]
 
+    diff_id_sections: list[str]
+    """The level elements whose objects are matched by ID when diffing levels."""
+    diff_keyframe_sections: list[str]
+    """The level elements whose keyframe channels are matched by time when diffing levels."""
+    keyframe_time_key: str
+
+    level_schema: dict
+    """
+    The structure required for levels of this version.
+    Dicts map keys to the schema of their values, a list containing one schema is the schema of every item of a list, and types are the required types of values.
+    A `ValueSchema` is a required type with a check that the values must also pass.
+    """
+
+
+    @classmethod
+    def get_level_name(cls, level: m_level_data.Level | dict | str, default_name: str) -> str:
+        """Returns the name that problems of the level are reported with: its path if it is given as one or was imported from a file, otherwise `default_name`."""
+        if isinstance(level, str):
+            return level
+        if isinstance(level, m_level_data.Level) and level.source is not None:
+            return level.source.path
+
+        return default_name
+
+    @classmethod
+    def get_level_problems(cls, level: m_level_data.Level | dict, level_name: str = "level") -> list[m_version_excs.LevelSectionProblem]:
+        """Returns every problem with the structure of the level in one pass."""
+        level_data = m_cow.unwrap(level.view) if isinstance(level, m_level_data.Level) else level
+        problems: list[m_version_excs.LevelSectionProblem] = []
+
+        def check(value: typ.Any, compiled_schema: CompiledSchema, section_path: str | None):
+            """Checks the value against the compiled schema, adding problems to the list. A `section_path` of `None` is the whole level."""
+            expected_type, value_schema, compiled_children, compiled_item_schema = compiled_schema
+            if not isinstance(value, expected_type):
+                expected_description = value_schema.description if value_schema is not None else expected_type.__name__
+                problems.append(m_version_excs.InvalidLevelSection(level_name, section_path or "level", expected_description))
+                return
+            if value_schema is not None and not value_schema.is_valid(value):
+                problems.append(m_version_excs.InvalidLevelSection(level_name, section_path or "level", value_schema.description))
+                return
+
+            for key, compiled_child_schema in compiled_children:
+                child_path = f"{section_path}.{key}" if section_path is not None else key
+                if key not in value:
+                    problems.append(m_version_excs.MissingLevelSection(level_name, child_path))
+                    continue
+
+                check(value[key], compiled_child_schema, child_path)
+
+            if compiled_item_schema is not None:
+                for index, item in enumerate(value):
+                    check(item, compiled_item_schema, f"{section_path}[{index}]")
+
+        check(level_data, cls._get_compiled_level_schema(), None)
+        return problems
+
+    @classmethod
+    def validate_level(cls, level: m_level_data.Level | dict, level_name: str = "level"):
+        """Raises `InvalidLevel` with every problem of the level if its structure isn't valid for this version."""
+        problems = cls.get_level_problems(level, level_name)
+        if len(problems) > 0:
+            raise m_version_excs.InvalidLevel(level_name, problems)
+
+    @classmethod
+    def validate_levels(cls, levels: list[m_level_data.Level | dict], level_names: list[str] | None = None):
+        """
+        Raises `InvalidLevels` with the problems of every invalid level if any of the levels aren't valid for this version.
+        Without `level_names`, the levels are named by `get_level_name`.
+        """
+        if level_names is None:
+            level_names = [cls.get_level_name(level, f"level #{index + 1}") for index, level in enumerate(levels)]
+
+        invalid_levels: list[m_version_excs.InvalidLevel] = []
+        for level, level_name in zip(levels, level_names):
+            problems = cls.get_level_problems(level, level_name)
+            if len(problems) > 0:
+                invalid_levels.append(m_version_excs.InvalidLevel(level_name, problems))
+
+        if len(invalid_levels) > 0:
+            raise m_version_excs.InvalidLevels(invalid_levels)
+
+
+    @classmethod
+    def _get_compiled_level_schema(cls) -> CompiledSchema:
+        """Returns the level schema compiled to nested tuples, compiling it only once per version."""
+        compiled_schema = cls.__dict__.get("_compiled_level_schema")
+        if compiled_schema is None:
+            compiled_schema = cls._compile_schema(cls.level_schema)
+            cls._compiled_level_schema = compiled_schema
+
+        return compiled_schema
+
+    @classmethod
+    def _compile_schema(cls, schema: dict | list | type | ValueSchema) -> CompiledSchema:
+        """Compiles the schema to a tuple of the required type, its value schema if any, the compiled schemas of required keys and the compiled schema of items."""
+        if isinstance(schema, dict):
+            compiled_children = tuple(
+                (key, cls._compile_schema(child_schema))
+                for key, child_schema in schema.items()
+            )
+            return (dict, None, compiled_children, None)
+
+        if isinstance(schema, list):
+            compiled_item_schema = cls._compile_schema(schema[0]) if len(schema) > 0 else None
+            return (list, None, (), compiled_item_schema)
+
+        if isinstance(schema, ValueSchema):
+            return (schema.value_type, schema, (), None)
+
+        return (schema, None, (), None)
 
     @classmethod
     def combine_levels(
             cls,
             levels: list[m_level_data.Level],
             primary_level: m_level_data.Level = None,
-            combine_settings: m_combine_settings.CombineSettings = m_combine_settings.CombineSettings()
-        ):
+            combine_settings: m_combine_settings.CombineSettings = m_combine_settings.CombineSettings(),
+            combine_report: m_combine_report.CombineReport | None = None
+        ) -> m_level_data.Level:
         """
         Combines levels to one file with the provided combine settings.
         If provided, the primary level will be combined to the other levels and will keep all properties regardless of the combine settings.
+        If `combine_report` is provided, it is filled in with what was changed while combining.
+        """
+
+    @classmethod
+    def combine_levels_to_file(
+            cls,
+            levels: list[m_level_data.Level | str],
+            folder_path: str,
+            filename: str = "level",
+            primary_level: m_level_data.Level = None,
+            combine_settings: m_combine_settings.CombineSettings = m_combine_settings.CombineSettings(),
+            combine_report: m_combine_report.CombineReport | None = None
+        ) -> str:
+        """
+        Combines levels the same way as `combine_levels`, but writes the combined level straight to a raw level file in the folder without building it in memory.
+        Levels given as paths to their `level.lsb` are loaded one at a time, so memory is bounded by the largest level. Returns the path of the written file.
+        """
+
+    @classmethod
+    def combine_levels_parallel(
+            cls,
+            levels: list[m_level_data.Level | str],
+            folder_path: str,
+            filename: str = "level",
+            primary_level: m_level_data.Level = None,
+            combine_settings: m_combine_settings.CombineSettings = m_combine_settings.CombineSettings(),
+            max_workers: int | None = None,
+            combine_report: m_combine_report.CombineReport | None = None
+        ) -> str:
+        """
+        Combines levels to a raw level file the same way as `combine_levels_to_file`, but reads, rewrites and encodes groups of levels in worker processes.
+        Levels can be given as paths to their `level.lsb` so that the workers read and parse them. Returns the path of the file.
+        Scripts using this must be guarded by `if __name__ == "__main__":` on platforms that spawn worker processes.
+        """
+
+    @classmethod
+    def plan_combine(
+            cls,
+            levels: list[m_level_data.Level | str],
+            primary_level: m_level_data.Level = None,
+            combine_settings: m_combine_settings.CombineSettings = m_combine_settings.CombineSettings()
+        ) -> m_combine_plan.CombinePlan:
+        """
+        Estimates what `combine_levels` would produce with the same arguments, without copying the levels or building the combined level.
+        Levels given as paths to their `level.lsb` are parsed in full, so for them the plan takes about as long as parsing them.
+        They go through the parse cache, so a combine after the plan doesn't parse them again. For levels already in memory, the plan is much faster than the combine.
+        The counts and the dropped first objects are exact, but the counts of prefabs don't take `deduplicate_prefabs` into account.
+        The sizes and memory are estimated from samples of the objects (see `m_combine_plan.estimate_item_size`), without the IDs that `remap_colliding_ids` would change.
+        Raises `InvalidLevels` like `combine_levels`.
         """
@@ -13,7 +13,7 @@ class PAMeta(type):
 class PAObject(metaclass = PAMeta):
     """The base class for all PA classes."""
     def __repr__(self):
-        variables = vars(self)
+        variables = self._get_repr_variables()
 
         inside_string = [
             f"{var_name} = {repr(var_value)}"
@@ -28,5 +28,10 @@ class PAObject(metaclass = PAMeta):
         return repr(self) == repr(other)
 
 
+    def _get_repr_variables(self) -> dict:
+        """Returns the variables shown by `repr`, which are also the ones compared by `==`."""
+        return vars(self)
+
+
 class PAException(Exception):
     """The base PA exception class."""
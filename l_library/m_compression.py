@@ -0,0 +1,112 @@
+"""Contains the compression codecs for transport files."""
+
+
+from __future__ import annotations
+
+import typing as typ
+
+import gzip
+import lzma
+
+from . import m_base, m_level_excs
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class Codec(m_base.PAObject):
+    """Represents a streaming compression codec."""
+    name: str
+    magic: bytes
+
+    @classmethod
+    def is_available(cls):
+        """Returns `True` if the codec can be used, `False` otherwise."""
+        return True
+
+    @classmethod
+    def open_write(cls, raw_file: typ.BinaryIO) -> typ.BinaryIO:
+        """Returns a binary stream that compresses everything written to it into the raw file."""
+
+    @classmethod
+    def open_read(cls, raw_file: typ.BinaryIO) -> typ.BinaryIO:
+        """Returns a binary stream that decompresses the raw file while reading it."""
+
+
+class GzipCodec(Codec):
+    """The gzip codec."""
+    name = "gzip"
+    magic = b"\x1f\x8b"
+
+    @classmethod
+    def open_write(cls, raw_file: typ.BinaryIO):
+        return gzip.GzipFile(fileobj = raw_file, mode = "wb", compresslevel = 6)
+
+    @classmethod
+    def open_read(cls, raw_file: typ.BinaryIO):
+        return gzip.GzipFile(fileobj = raw_file, mode = "rb")
+
+
+class XZCodec(Codec):
+    """The xz codec. Slower than gzip but compresses better."""
+    name = "xz"
+    magic = b"\xfd7zXZ\x00"
+
+    @classmethod
+    def open_write(cls, raw_file: typ.BinaryIO):
+        return lzma.LZMAFile(raw_file, mode = "wb", format = lzma.FORMAT_XZ)
+
+    @classmethod
+    def open_read(cls, raw_file: typ.BinaryIO):
+        return lzma.LZMAFile(raw_file, mode = "rb", format = lzma.FORMAT_XZ)
+
+
+class ZstdCodec(Codec):
+    """The zstd codec. Needs the optional `zstandard` package."""
+    name = "zstd"
+    magic = b"\x28\xb5\x2f\xfd"
+
+    @classmethod
+    def is_available(cls):
+        return zstandard is not None
+
+    @classmethod
+    def open_write(cls, raw_file: typ.BinaryIO):
+        return zstandard.ZstdCompressor(level = 3).stream_writer(raw_file, closefd = False)
+
+    @classmethod
+    def open_read(cls, raw_file: typ.BinaryIO):
+        return zstandard.ZstdDecompressor().stream_reader(raw_file, closefd = False)
+
+
+ALL_CODECS: list[type[Codec]] = [ZstdCodec, GzipCodec, XZCodec]
+MAGIC_LENGTH = max(len(codec.magic) for codec in ALL_CODECS)
+
+
+def get_available_codecs():
+    """Returns all codecs that can be used."""
+    return [codec for codec in ALL_CODECS if codec.is_available()]
+
+def get_default_codec():
+    """Returns the default codec, which is zstd if available, otherwise gzip."""
+    return get_available_codecs()[0]
+
+def get_codec(name: str):
+    """Returns the codec with the name. Raises `CompressionNotSupported` if it doesn't exist or isn't available."""
+    for codec in ALL_CODECS:
+        if codec.name == name and codec.is_available():
+            return codec
+
+    raise m_level_excs.CompressionNotSupported(name)
+
+def detect_codec(header: bytes):
+    """Returns the codec whose magic bytes start the header, or `None` if the header isn't compressed by a known codec."""
+    for codec in ALL_CODECS:
+        if header.startswith(codec.magic):
+            if not codec.is_available():
+                raise m_level_excs.CompressionNotSupported(codec.name)
+            return codec
+
+    return None
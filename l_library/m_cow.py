@@ -0,0 +1,475 @@
+"""Contains copy-on-write views of JSON data."""
+
+
+from __future__ import annotations
+
+import typing as typ
+
+import copy
+import marshal
+import collections.abc
+
+
+_attach_count = 0
+"""The number of times that a child view was kept after being written to, in any view. Until it changes, no view made by a read can have gone stale."""
+
+
+class CowNode:
+    """
+    Parent class for copy-on-write views of a JSON `dict` or `list`.
+    Reads share the underlying structure. The first write to a node copies only that node and the nodes on the path to it.
+    The structure behind a view never contains views, so `unwrap` gives plain JSON data. Views can also be encoded by passing `json_default` to `json.dumps`.
+    """
+    __slots__ = ("_base", "_copy", "_origin", "_children", "_origins", "_parent", "_key", "_resolved_at")
+
+    def __init__(self, base: dict | list, parent: CowNode | None = None, key: typ.Any = None):
+        self._base = base
+        self._copy: dict | list | None = None
+        self._origin = base
+        """The structure this view was first made from. Views made from the same structure write to the same copy."""
+        self._children: dict[typ.Any, CowNode] | None = None
+        """The child views that were written to by their keys, which have to follow this node when it is shared. Child views that were only read aren't kept."""
+        self._origins: dict[int, CowNode] | None = None
+        """The same child views by the identity of their origins."""
+        self._parent = parent
+        self._key = key
+        self._resolved_at = _attach_count
+        """The value of `_attach_count` when this view was last found to resolve to itself."""
+
+
+    def _current(self) -> dict | list:
+        """Returns the structure that this view itself reads from, which is only right if it is the view returned by `_resolve`."""
+        return self._copy if self._copy is not None else self._base
+
+    def _target(self) -> dict | list:
+        """Returns the structure that reads should come from."""
+        return self._resolve()._current()
+
+    def _resolve(self) -> CowNode:
+        """
+        Returns the view that reads and writes of this view should go through.
+        That is another view of the same structure if it was written to after this view was made by a read, otherwise this view.
+        """
+        if self._copy is not None or self._parent is None or self._resolved_at == _attach_count:
+            return self
+
+        parent = self._parent._resolve()
+        if parent._children is not None:
+            # The same structure can be in a list more than once, so the view at the same key is preferred
+            child = parent._children.get(self._key)
+            if child is None or child._origin is not self._origin:
+                child = parent._origins.get(id(self._origin))
+            if child is not None and child._origin is self._origin:
+                return child
+
+        self._resolved_at = _attach_count
+        return self
+
+    def _get_child(self, key: typ.Any, value: typ.Any):
+        """Returns `value` wrapped as a child view if it is a `dict` or `list`, otherwise `value` itself. Must be called on a view returned by `_resolve`."""
+        if isinstance(value, dict):
+            view_type = CowDict
+        elif isinstance(value, list):
+            view_type = CowList
+        else:
+            return value
+
+        if self._children is not None:
+            child = self._children.get(key)
+            if child is not None and child._current() is value:
+                return child
+
+        # Views made by reads aren't kept, so reading only costs the view itself
+        return view_type(value, self, key)
+
+    def _add_child(self, child: CowNode, key: typ.Any):
+        """Keeps the child view at the key after it was written to, in place of any other child view there."""
+        global _attach_count
+        _attach_count += 1
+
+        if self._children is None:
+            self._children = {}
+            self._origins = {}
+        elif self._origins.get(id(child._origin)) is child:
+            del self._children[child._key]
+
+        self._detach_child(key)
+        child._key = key
+        child._parent = self
+        self._children[key] = child
+        self._origins[id(child._origin)] = child
+
+    def _detach_child(self, key: typ.Any):
+        """Detaches the child view at `key` so that its future writes don't reach this node."""
+        if self._children is None:
+            return
+
+        child = self._children.pop(key, None)
+        if child is not None:
+            if self._origins.get(id(child._origin)) is child:
+                del self._origins[id(child._origin)]
+            child._parent = None
+
+    def _reindex_children(self):
+        """Finds the new positions of the child views after the items of the list moved, and detaches the child views of the items that were removed."""
+        if self._children is None:
+            return
+
+        children_by_target = {id(child._current()): child for child in self._children.values()}
+        self._children = None
+        self._origins = None
+        for index, value in enumerate(self._copy):
+            child = children_by_target.pop(id(value), None)
+            if child is not None:
+                self._add_child(child, index)
+
+        for child in children_by_target.values():
+            child._parent = None
+
+
+    def _materialize(self) -> CowNode:
+        """Copies this node and every parent node that hasn't been copied yet. Returns the view that was copied, which writes must go to."""
+        node = self._resolve()
+        if node._copy is not None:
+            return node
+
+        node._copy = node._base.copy()
+        if node._parent is not None:
+            node._parent._attach_child(node)
+        return node
+
+    def _attach_child(self, child: CowNode):
+        """Replaces the base of `child` with its copy in this node."""
+        node = self._materialize()
+        target = node._copy
+
+        key = child._key
+        if not (_contains_key(target, key) and target[key] is child._base):
+            # The item may have moved since the child view was made
+            key = next((index for index, value in enumerate(target) if value is child._base), None) if isinstance(target, list) else None
+            if key is None:
+                child._parent = None
+                return
+
+        node._add_child(child, key)
+        target[key] = child._copy
+
+
+    def share(self) -> dict | list:
+        """
+        Returns the underlying structure so it can be shared, for example when building another level from this one.
+        Later writes through this view will copy again instead of changing the returned structure.
+        """
+        node = self._resolve()
+        target = node._current()
+        node._freeze()
+        return target
+
+    def _freeze(self):
+        """Turns the copies of this node and its children into bases. The children stay attached, so views of them keep reading and writing through them."""
+        if self._copy is None:
+            return
+
+        self._base = self._copy
+        self._copy = None
+        if self._children is not None:
+            for child in self._children.values():
+                child._freeze()
+
+
+    def is_modified(self):
+        """Returns `True` if this view was written to since it was created or last shared."""
+        return self._resolve()._copy is not None
+
+
+    def __len__(self):
+        return len(self._target())
+
+    def __contains__(self, value: typ.Any):
+        return unwrap(value) in self._target()
+
+    def __eq__(self, other: typ.Any):
+        return self._target() == unwrap(other)
+
+    def __repr__(self):
+        return repr(self._target())
+
+    def copy(self):
+        """Returns a new view that shares the structure of this one, like `dict.copy` and `list.copy` do."""
+        return wrap(self.share())
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo: dict):
+        return self.copy()
+
+    def __reduce__(self):
+        return (wrap, (self._target(),))
+
+
+def _contains_key(target: dict | list, key: typ.Any):
+    """Returns `True` if `key` can index `target`."""
+    if isinstance(target, list):
+        return isinstance(key, int) and 0 <= key < len(target)
+
+    return key in target
+
+
+class CowDict(CowNode, collections.abc.MutableMapping):
+    """A copy-on-write view of a JSON `dict`."""
+    __slots__ = ()
+
+    def __getitem__(self, key: str):
+        node = self._resolve()
+        return node._get_child(key, node._current()[key])
+
+    def __setitem__(self, key: str, value: typ.Any):
+        value = share_nested(value)
+        node = self._materialize()
+        node._detach_child(key)
+        node._copy[key] = value
+
+    def __delitem__(self, key: str):
+        node = self._materialize()
+        node._detach_child(key)
+        del node._copy[key]
+
+    def __iter__(self):
+        return iter(self._target())
+
+    def __reversed__(self):
+        return reversed(self._target())
+
+    def keys(self):
+        return self._target().keys()
+
+    def clear(self):
+        node = self._materialize()
+        for key in list(node._copy):
+            node._detach_child(key)
+        node._copy.clear()
+
+
+    def __or__(self, other: typ.Any):
+        if not isinstance(other, (dict, CowDict)):
+            return NotImplemented
+
+        return wrap(self.share() | share_nested(other))
+
+    def __ror__(self, other: typ.Any):
+        if not isinstance(other, (dict, CowDict)):
+            return NotImplemented
+
+        return wrap(share_nested(other) | self.share())
+
+    def __ior__(self, other: typ.Any):
+        self.update(other)
+        return self
+
+
+class CowList(CowNode, collections.abc.MutableSequence):
+    """A copy-on-write view of a JSON `list`."""
+    __slots__ = ()
+
+    def __getitem__(self, index: int | slice):
+        node = self._resolve()
+        target = node._current()
+        if isinstance(index, slice):
+            return wrap(target[index])
+
+        if index < 0:
+            index += len(target)
+        return node._get_child(index, target[index])
+
+    def __setitem__(self, index: int | slice, value: typ.Any):
+        if isinstance(index, slice):
+            value = [share_nested(item) for item in value]
+            node = self._materialize()
+            node._copy[index] = value
+            node._reindex_children()
+            return
+
+        value = share_nested(value)
+        node = self._materialize()
+        if index < 0:
+            index += len(node._copy)
+        node._detach_child(index)
+        node._copy[index] = value
+
+    def __delitem__(self, index: int | slice):
+        node = self._materialize()
+        del node._copy[index]
+        node._reindex_children()
+
+    def __iter__(self):
+        node = self._resolve()
+        for index, value in enumerate(node._current()):
+            yield node._get_child(index, value)
+
+    def __reversed__(self):
+        node = self._resolve()
+        target = node._current()
+        for index in range(len(target) - 1, -1, -1):
+            yield node._get_child(index, target[index])
+
+
+    def insert(self, index: int, value: typ.Any):
+        value = share_nested(value)
+        node = self._materialize()
+        node._copy.insert(index, value)
+        node._reindex_children()
+
+    def append(self, value: typ.Any):
+        value = share_nested(value)
+        self._materialize()._copy.append(value)
+
+    def extend(self, values: typ.Iterable):
+        values = [share_nested(value) for value in values]
+        self._materialize()._copy.extend(values)
+
+    def pop(self, index: int = -1):
+        """Removes the item at the index and returns it, as a view of its own if it is a `dict` or `list`."""
+        node = self._materialize()
+        if index < 0:
+            index += len(node._copy)
+
+        if index == len(node._copy) - 1:
+            # Nothing moves when the last item is removed
+            node._detach_child(index)
+            return wrap(node._copy.pop())
+
+        value = node._copy.pop(index)
+        node._reindex_children()
+        return wrap(value)
+
+    def clear(self):
+        node = self._materialize()
+        node._copy.clear()
+        node._reindex_children()
+
+    def reverse(self):
+        node = self._materialize()
+        node._copy.reverse()
+        node._reindex_children()
+
+    def sort(self, key: typ.Callable[[typ.Any], typ.Any] | None = None, reverse: bool = False):
+        """Sorts the list in place like `list.sort`. `key` is given views of the items, so it can't change them."""
+        node = self._materialize()
+        node._copy.sort(key = (lambda item: key(wrap(item))) if key is not None else None, reverse = reverse)
+        node._reindex_children()
+
+    def index(self, value: typ.Any, start: int = 0, stop: int | None = None):
+        target = self._target()
+        return target.index(unwrap(value), start, len(target) if stop is None else stop)
+
+    def count(self, value: typ.Any):
+        return self._target().count(unwrap(value))
+
+
+    def __add__(self, other: typ.Any):
+        if not isinstance(other, (list, CowList)):
+            return NotImplemented
+
+        return wrap(self.share() + share_nested(other))
+
+    def __radd__(self, other: typ.Any):
+        if not isinstance(other, (list, CowList)):
+            return NotImplemented
+
+        return wrap(share_nested(other) + self.share())
+
+    def __iadd__(self, values: typ.Iterable):
+        self.extend(values)
+        return self
+
+    def __mul__(self, count: int):
+        return wrap(self.share() * count)
+
+    __rmul__ = __mul__
+
+    def __imul__(self, count: int):
+        node = self._materialize()
+        node._copy *= count
+        node._reindex_children()
+        return self
+
+    def __lt__(self, other: typ.Any):
+        return self._target() < unwrap(other)
+
+    def __le__(self, other: typ.Any):
+        return self._target() <= unwrap(other)
+
+    def __gt__(self, other: typ.Any):
+        return self._target() > unwrap(other)
+
+    def __ge__(self, other: typ.Any):
+        return self._target() >= unwrap(other)
+
+
+def wrap(value: typ.Any):
+    """
+    Returns a new copy-on-write view of `value` if it is a `dict` or `list`, otherwise `value` itself.
+    Views directly inside of `value`, such as the values of `dict(view)`, are shared in its place. Deeper views aren't looked for.
+    """
+    if isinstance(value, CowNode):
+        return wrap(value.share())
+    if isinstance(value, dict):
+        if any(isinstance(child, CowNode) for child in value.values()):
+            value = {key: share(child) for key, child in value.items()}
+        return CowDict(value)
+    if isinstance(value, list):
+        if any(isinstance(child, CowNode) for child in value):
+            value = [share(child) for child in value]
+        return CowList(value)
+
+    return value
+
+def unwrap(value: typ.Any):
+    """
+    Returns the structure behind a view without sharing it, for immediate read-only use such as serializing.
+    Returns `value` itself if it isn't a view.
+    """
+    if isinstance(value, CowNode):
+        return value._target()
+
+    return value
+
+def share(value: typ.Any):
+    """Returns the structure behind a view so it can be shared. Returns `value` itself if it isn't a view."""
+    if isinstance(value, CowNode):
+        return value.share()
+
+    return value
+
+def share_nested(value: typ.Any):
+    """
+    Returns `value` with every view inside of it shared in its place, so that it can be put in the structure behind a view.
+    Plain `dict`s and `list`s are only copied if they contain views.
+    """
+    if isinstance(value, CowNode):
+        return value.share()
+
+    # Sharing is idempotent, so the children are shared again when building the copy
+    if isinstance(value, dict):
+        if any(share_nested(child) is not child for child in value.values()):
+            return {key: share_nested(child) for key, child in value.items()}
+    elif isinstance(value, list):
+        if any(share_nested(child) is not child for child in value):
+            return [share_nested(child) for child in value]
+
+    return value
+
+def copy_json(value: typ.Any):
+    """Returns a deep copy of plain JSON data. Going through `marshal` is several times faster than `copy.deepcopy`, which is only used for data that `marshal` can't hold."""
+    try:
+        return marshal.loads(marshal.dumps(value))
+    except ValueError:
+        return copy.deepcopy(value)
+
+def json_default(value: typ.Any):
+    """Pass as `default` to `json.dumps` to encode views as the JSON they stand for."""
+    if isinstance(value, CowNode):
+        return value._target()
+
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
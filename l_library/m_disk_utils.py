@@ -1,11 +1,24 @@
 """Contains disk utilities."""
 
 
+import typing as typ
+
+import sys
 import os
+import io
+import re
 import subprocess
+import tempfile
+import shutil
+import threading
+import contextlib
+
+import json
 
 import base64
 
+from . import m_base, m_instrumentation, m_compression, m_cow
+
 
 ENCODING = "UTF-8"
 
@@ -16,13 +29,53 @@ def override_file(folder_path: str, filename: str, data: str | bytes, binary: bo
         os.mkdir(folder_path)
 
     full_path = os.path.join(folder_path, filename)
+    unlink_hardlinked_file(full_path)
+
+    with m_instrumentation.measure("override_file") as measurement:
+        if not binary:
+            with open(full_path, "wt", encoding = ENCODING) as file:
+                file.write(data)
+            measurement.add_text(data)
+        else:
+            with open(full_path, "wb") as file:
+                file.write(data)
+            measurement.add_bytes(len(data))
+
+
+def copy_file(source_path: str, folder_path: str, filename: str, hardlink: bool = False):
+    """
+    Creates or overwrites the file in the path with a byte-for-byte copy of the source file.
+    If `hardlink` is `True`, the file is hard linked to the source file instead where the file system allows it.
+    Does nothing if the file already is the source file.
+    """
+    if not os.path.exists(folder_path):
+        os.mkdir(folder_path)
+
+    full_path = os.path.join(folder_path, filename)
+    if os.path.exists(full_path) and os.path.samefile(source_path, full_path):
+        return
+
+    with m_instrumentation.measure("copy_file") as measurement:
+        linked = False
+        if hardlink:
+            try:
+                if os.path.exists(full_path):
+                    os.remove(full_path)
+                os.link(source_path, full_path)
+                linked = True
+            except OSError:
+                pass
+
+        if not linked:
+            unlink_hardlinked_file(full_path)
+            shutil.copyfile(source_path, full_path)
 
-    if not binary:
-        with open(full_path, "wt", encoding = ENCODING) as file:
-            file.write(data)
-    else:
-        with open(full_path, "wb") as file:
-            file.write(data)
+        measurement.add_bytes(os.path.getsize(full_path))
+
+def unlink_hardlinked_file(file_path: str):
+    """Removes the file if it is hard linked to other files, so that writing to the path doesn't change them too."""
+    if os.path.isfile(file_path) and os.stat(file_path).st_nlink > 1:
+        os.remove(file_path)
 
 
 def make_folder_path(path: str):
@@ -32,12 +85,17 @@ def make_folder_path(path: str):
 
 def read_file(file_path: str, binary: bool = False):
     """Returns the file contents."""
-    if not binary:
-        with open(file_path, "r", encoding = ENCODING) as file:
-            return file.read()
-    else:
-        with open(file_path, "rb") as file:
-            return file.read()
+    with m_instrumentation.measure("read_file") as measurement:
+        if not binary:
+            with open(file_path, "r", encoding = ENCODING) as file:
+                data = file.read()
+            measurement.add_text(data)
+        else:
+            with open(file_path, "rb") as file:
+                data = file.read()
+            measurement.add_bytes(len(data))
+
+    return data
 
 def path_exists(file_path: str):
     """Returns `True` if the file or folder exists, `False` otherwise."""
@@ -85,6 +143,406 @@ def open_file_in_explorer(file_path: str):
     subprocess.run([FILE_BROWSER_PATH, "/select", file_path], check = False)
 
 
+def encode_json(json_data, **kwargs) -> str:
+    """Returns the JSON string of the data. Keyword arguments are passed to `json.dumps`. Copy-on-write views are encoded as the JSON they stand for."""
+    kwargs.setdefault("default", m_cow.json_default)
+    with m_instrumentation.measure("json_encode") as measurement:
+        json_string = json.dumps(json_data, **kwargs)
+        measurement.add_text(json_string)
+
+    return json_string
+
+INTERN_MAX_LENGTH = 16
+"""The longest string value that is interned when decoding JSON with `intern_strings`."""
+
+def _intern_object_pairs(pairs: list[tuple[str, typ.Any]]):
+    """Returns a dict of the pairs with the short string values interned. The keys are already shared by the JSON decoder."""
+    json_object = dict(pairs)
+    for key, value in pairs:
+        if type(value) is str and len(value) <= INTERN_MAX_LENGTH:
+            json_object[key] = sys.intern(value)
+
+    return json_object
+
+def decode_json(json_string: str, intern_strings: bool = False, **kwargs):
+    """
+    Returns the data of the JSON string. Keyword arguments are passed to `json.loads`.
+    If `intern_strings` is `True`, short string values are interned so that equal values share one object.
+    On editor-made levels, that keeps about a quarter less memory but makes decoding about 1.8 times as slow (see `benchmarks/bench_intern_strings.py`),
+    so it is only worth it for large levels that are kept in memory.
+    """
+    if intern_strings:
+        kwargs["object_pairs_hook"] = _intern_object_pairs
+
+    with m_instrumentation.measure("json_decode") as measurement:
+        json_data = json.loads(json_string, **kwargs)
+        measurement.add_text(json_string)
+
+    return json_data
+
+
+MEMORY_SAMPLE_COUNT = 64
+"""The number of items of long lists that `estimate_json_memory` estimates the memory of the lists from."""
+
+def sample_items(items: list, sample_count: int, sample_fraction: float = 0.0):
+    """Returns `sample_count` items spread over the list, or `sample_fraction` of them if that is more."""
+    sample_count = max(sample_count, int(len(items) * sample_fraction))
+    if sample_count >= len(items):
+        return items
+
+    return [items[index * len(items) // sample_count] for index in range(sample_count)]
+
+def estimate_json_memory(json_data: typ.Any, sample_count: int = MEMORY_SAMPLE_COUNT) -> float:
+    """
+    Returns the estimated number of bytes that the JSON data takes in memory, counting shared strings every time they are used.
+    Lists longer than `sample_count` are estimated from `sample_count` of their items, so they can be off by more than encoded sizes.
+    """
+    if isinstance(json_data, dict):
+        return sys.getsizeof(json_data) + sum(
+            sys.getsizeof(key) + estimate_json_memory(value, sample_count) for key, value in json_data.items()
+        )
+    if isinstance(json_data, list):
+        sampled_items = sample_items(json_data, sample_count)
+        if len(sampled_items) == 0:
+            return sys.getsizeof(json_data)
+
+        sampled_memory = sum(estimate_json_memory(item, sample_count) for item in sampled_items)
+        return sys.getsizeof(json_data) + sampled_memory * len(json_data) / len(sampled_items)
+
+    return sys.getsizeof(json_data)
+
+
+class _MeasuredWriter:
+    """Forwards writes to a text stream while adding the written bytes to the measurement."""
+    def __init__(self, text_file: typ.TextIO, measurement: m_instrumentation.Measurement | m_instrumentation.NullMeasurement):
+        self.text_file = text_file
+        self.measurement = measurement
+
+    def write(self, text: str):
+        """Writes the text."""
+        self.measurement.add_text(text)
+        return self.text_file.write(text)
+
+
+BASE64_CHUNK_SIZE = 3 * 64 * 1024
+"""The number of bytes encoded to base64 at a time when streaming, a multiple of 3 so that the chunks join into the same base64 as the whole."""
+READ_CHUNK_SIZE = 1024 * 1024
+"""The number of characters read at a time when decoding base64 values while reading JSON files."""
+
+
+class StreamedBase64(m_base.PAObject):
+    """Bytes that are written to JSON files as a base64 string in chunks, without ever holding the whole string."""
+    def __init__(self, bytes_data: bytes):
+        self.bytes_data = bytes_data
+
+
+    def write_to(self, text_file: typ.TextIO):
+        """Writes the base64 of the bytes to the text file, without quotes."""
+        bytes_view = memoryview(self.bytes_data)
+        for start in range(0, len(bytes_view), BASE64_CHUNK_SIZE):
+            text_file.write(base64.b64encode(bytes_view[start:start + BASE64_CHUNK_SIZE]).decode("ascii"))
+
+
+_json_streaming = threading.local()
+
+@contextlib.contextmanager
+def streaming_json():
+    """Makes `bytes_to_base64_json` return values that `write_json_file` streams to the file in chunks while inside of this context."""
+    was_streaming = getattr(_json_streaming, "enabled", False)
+    _json_streaming.enabled = True
+    try:
+        yield
+    finally:
+        _json_streaming.enabled = was_streaming
+
+def bytes_to_base64_json(bytes_data: bytes) -> str | StreamedBase64:
+    """Returns the base64 representation of bytes for JSON data. Inside of `streaming_json`, it is only encoded in chunks when written by `write_json_file`."""
+    if getattr(_json_streaming, "enabled", False):
+        return StreamedBase64(bytes_data)
+
+    return bytes_to_base64(bytes_data)
+
+
+def write_json_file(folder_path: str, filename: str, json_data, compression: str | None = None, **kwargs):
+    """
+    Creates or overwrites the file in the path with the JSON of the data, streaming it to the disk.
+    If `compression` is the name of a codec, the file is compressed with it while writing. Keyword arguments are passed to `json.JSONEncoder`.
+    `StreamedBase64` values are written as base64 strings in chunks.
+    """
+    if not os.path.exists(folder_path):
+        os.mkdir(folder_path)
+
+    full_path = os.path.join(folder_path, filename)
+    unlink_hardlinked_file(full_path)
+    codec = m_compression.get_codec(compression) if compression is not None else None
+
+    stage = f"write_json_file.{codec.name}" if codec is not None else "write_json_file"
+    with m_instrumentation.measure(stage) as measurement:
+        with open(full_path, "wb") as raw_file:
+            stream = codec.open_write(raw_file) if codec is not None else raw_file
+            with io.TextIOWrapper(stream, encoding = ENCODING) as text_file:
+                with m_instrumentation.measure("json_encode") as encode_measurement:
+                    _dump_json(json_data, _MeasuredWriter(text_file, encode_measurement), **kwargs)
+
+        measurement.add_bytes(os.path.getsize(full_path))
+
+
+def _dump_json(json_data, text_file: typ.TextIO, **kwargs):
+    """
+    Writes the JSON of the data to the text file like `json.dump`, writing `StreamedBase64` values in chunks in place of placeholder strings.
+    Copy-on-write views are encoded as the JSON they stand for.
+    """
+    streamed_values: list[StreamedBase64] = []
+    placeholder_prefix = f"\x00{os.urandom(8).hex()}:"
+
+    def default(value):
+        if isinstance(value, StreamedBase64):
+            streamed_values.append(value)
+            return f"{placeholder_prefix}{len(streamed_values) - 1}"
+
+        return m_cow.json_default(value)
+
+    encoded_prefix = json.dumps(placeholder_prefix)[:-1]
+    placeholder_pattern = re.compile(re.escape(encoded_prefix) + r"(\d+)\"")
+
+    for chunk in json.JSONEncoder(default = default, **kwargs).iterencode(json_data):
+        if len(streamed_values) == 0 or encoded_prefix not in chunk:
+            text_file.write(chunk)
+            continue
+
+        chunk_start = 0
+        for match in placeholder_pattern.finditer(chunk):
+            text_file.write(chunk[chunk_start:match.start()])
+            text_file.write("\"")
+            streamed_values[int(match.group(1))].write_to(text_file)
+            text_file.write("\"")
+            chunk_start = match.end()
+        text_file.write(chunk[chunk_start:])
+
+
+def read_json_file(file_path: str, intern_strings: bool = False, base64_paths: tuple[tuple[str, ...], ...] = (), **kwargs):
+    """
+    Returns the data of the JSON file.
+    If the file starts with the magic bytes of a codec, it is decompressed while reading. Keyword arguments are passed to `json.loads`.
+    See `decode_json` for `intern_strings`.
+    The base64 string values at `base64_paths`, each a path of keys from the top of the data, are decoded to `bytes` in chunks while reading,
+    so the whole base64 string is never held. Values with the same keys elsewhere stay strings.
+    """
+    with open(file_path, "rb") as raw_file:
+        codec = _detect_file_codec(raw_file)
+
+        stage = f"read_json_file.{codec.name}" if codec is not None else "read_file"
+        with m_instrumentation.measure(stage) as measurement:
+            stream = codec.open_read(raw_file) if codec is not None else raw_file
+            with io.TextIOWrapper(stream, encoding = ENCODING) as text_file:
+                if len(base64_paths) > 0:
+                    json_string, base64_values = _read_json_text_with_base64(text_file, {path[-1] for path in base64_paths})
+                else:
+                    json_string, base64_values = text_file.read(), {}
+
+            measurement.add_bytes(os.path.getsize(file_path))
+
+    json_data = decode_json(json_string, intern_strings, **kwargs)
+    if len(base64_values) == 0:
+        return json_data
+
+    for base64_path in base64_paths:
+        parent = json_data
+        for key in base64_path[:-1]:
+            parent = parent.get(key) if isinstance(parent, dict) else None
+        if isinstance(parent, dict) and isinstance(parent.get(base64_path[-1]), str) and parent[base64_path[-1]] in base64_values:
+            parent[base64_path[-1]] = base64_values.pop(parent[base64_path[-1]])
+
+    # The values were decoded because their key matched, but they aren't at any of the paths
+    if len(base64_values) > 0:
+        json_data = _restore_base64_strings(json_data, base64_values)
+
+    return json_data
+
+def _read_json_text_with_base64(text_file: typ.TextIO, base64_keys: set[str]) -> tuple[str, dict[str, bytes]]:
+    """
+    Reads the JSON text in chunks, decoding the string values of the keys from base64 as they are read.
+    Returns the text with the decoded values replaced by placeholder strings, and the decoded bytes by placeholder.
+    Values that aren't valid base64, or that wouldn't be encoded back to the same string, are kept in the text as they are.
+    """
+    key_pattern = re.compile("\"(?:" + "|".join(re.escape(key) for key in base64_keys) + ")\"\\s*:\\s*\"")
+    placeholder_prefix = f"\x00{os.urandom(8).hex()}:"
+
+    text_parts: list[str] = []
+    base64_values: dict[str, bytes] = {}
+    decoded_value: bytearray | None = None
+    in_kept_value = False
+    buffer = ""
+
+    def decode_piece(piece: str):
+        """Returns the bytes of the piece of base64, or `None` if it isn't valid base64 that encodes back to the same piece."""
+        try:
+            piece_bytes = base64.b64decode(piece, validate = True)
+        except ValueError:
+            return None
+
+        return piece_bytes if base64.b64encode(piece_bytes) == piece.encode("ascii") else None
+
+    while True:
+        chunk = text_file.read(READ_CHUNK_SIZE)
+        buffer += chunk
+
+        while True:
+            if in_kept_value:
+                # The value is a plain JSON string that may have escaped quotes
+                value_end = buffer.find("\"")
+                while value_end != -1 and _is_escaped(buffer, value_end):
+                    value_end = buffer.find("\"", value_end + 1)
+                if value_end == -1:
+                    # Keep the backslashes at the end, which may escape the next character
+                    kept_length = len(buffer) - len(buffer.rstrip("\\"))
+                    text_parts.append(buffer[:len(buffer) - kept_length])
+                    buffer = buffer[len(buffer) - kept_length:]
+                    break
+
+                text_parts.append(buffer[:value_end + 1])
+                buffer = buffer[value_end + 1:]
+                in_kept_value = False
+                continue
+
+            if decoded_value is not None:
+                # Base64 has no quotes, so the value ends at the next one
+                value_end = buffer.find("\"")
+                piece_length = value_end
+                if value_end == -1:
+                    # Padding can only end the value, so the group with it waits for the end of the value
+                    padding_start = buffer.find("=")
+                    piece_length = len(buffer) if padding_start == -1 else padding_start
+                    piece_length -= piece_length % 4
+
+                piece_bytes = decode_piece(buffer[:piece_length])
+                if piece_bytes is None:
+                    # Everything decoded so far had no padding, so it encodes back to the text it came from
+                    text_parts.append("\"" + base64.b64encode(decoded_value).decode("ascii"))
+                    decoded_value = None
+                    in_kept_value = True
+                    continue
+
+                decoded_value += piece_bytes
+                buffer = buffer[piece_length:]
+                if value_end == -1:
+                    break
+
+                placeholder = f"{placeholder_prefix}{len(base64_values)}"
+                base64_values[placeholder] = bytes(decoded_value)
+                text_parts.append(json.dumps(placeholder))
+                buffer = buffer[1:]
+                decoded_value = None
+                continue
+
+            match = key_pattern.search(buffer)
+            while match is not None and _is_escaped(buffer, match.start()):
+                match = key_pattern.search(buffer, match.start() + 1)
+
+            if match is None:
+                # Keep the end in case a key starts there
+                kept_length = 0 if chunk == "" else min(len(buffer), 256)
+                text_parts.append(buffer[:len(buffer) - kept_length])
+                buffer = buffer[len(buffer) - kept_length:]
+                break
+
+            text_parts.append(buffer[:match.end() - 1])
+            buffer = buffer[match.end():]
+            decoded_value = bytearray()
+
+        if chunk == "":
+            if decoded_value is not None or in_kept_value:
+                raise ValueError("Unterminated string in JSON file")
+            return "".join(text_parts), base64_values
+
+def _restore_base64_strings(json_data, base64_values: dict[str, bytes]):
+    """Returns the JSON data with the placeholders of the decoded values replaced by their base64 strings again."""
+    if isinstance(json_data, str):
+        base64_value = base64_values.get(json_data)
+        return bytes_to_base64(base64_value) if base64_value is not None else json_data
+    if isinstance(json_data, dict):
+        return {key: _restore_base64_strings(value, base64_values) for key, value in json_data.items()}
+    if isinstance(json_data, list):
+        return [_restore_base64_strings(value, base64_values) for value in json_data]
+
+    return json_data
+
+def _is_escaped(text: str, index: int):
+    """Returns `True` if the character at the index is escaped by an odd number of backslashes, `False` otherwise."""
+    backslash_count = 0
+    while index - backslash_count - 1 >= 0 and text[index - backslash_count - 1] == "\\":
+        backslash_count += 1
+
+    return backslash_count % 2 == 1
+
+
+def get_file_codec(file_path: str):
+    """Returns the codec that the file is compressed with, or `None` if it isn't compressed."""
+    with open(file_path, "rb") as raw_file:
+        return _detect_file_codec(raw_file)
+
+def _detect_file_codec(raw_file: typ.BinaryIO):
+    """Returns the codec that the opened file is compressed with, or `None` if it isn't compressed. Leaves the file at its start."""
+    codec = m_compression.detect_codec(raw_file.read(m_compression.MAGIC_LENGTH))
+    raw_file.seek(0)
+    return codec
+
+
+class JSONListSpool:
+    """
+    A JSON list that is written to a temporary file as items are added, so that it never has to be in memory.
+    Items are written the same way `json.dumps` writes them with `ensure_ascii = False`.
+    """
+    def __init__(self):
+        self.file = tempfile.TemporaryFile("w+", encoding = ENCODING)
+        self.count = 0
+        self.skip_count = 0
+
+
+    def extend(self, items: typ.Iterable):
+        """Writes the items to the end of the list, skipping as many as `skip_count` first."""
+        self.extend_encoded(json.dumps(item, ensure_ascii = False) for item in items)
+
+    def extend_encoded(self, encoded_items: typ.Iterable[str]):
+        """Same as `extend`, but with items that were already encoded as JSON text, such as by another process."""
+        encoded_items = iter(encoded_items)
+        while self.skip_count > 0 and next(encoded_items, None) is not None:
+            self.skip_count -= 1
+
+        # Written at once, since every write to the file has a fixed cost
+        encoded_items = list(encoded_items)
+        if len(encoded_items) == 0:
+            return
+
+        if self.count > 0:
+            self.file.write(", ")
+        self.file.write(", ".join(encoded_items))
+        self.count += len(encoded_items)
+
+    def __iadd__(self, items: typ.Iterable):
+        self.extend(items)
+        return self
+
+    def __len__(self):
+        return self.count
+
+    def skip_next(self, skip_count: int = 1):
+        """Makes the next `skip_count` added items get skipped."""
+        self.skip_count += skip_count
+
+
+    def write_to(self, text_file: typ.TextIO):
+        """Writes the whole JSON list to the text file."""
+        text_file.write("[")
+        self.file.seek(0)
+        shutil.copyfileobj(self.file, text_file)
+        text_file.write("]")
+
+    def close(self):
+        """Deletes the temporary file."""
+        self.file.close()
+
+
 def bytes_to_base64(bytes_data: bytes):
     """Returns the base64 representation of bytes."""
     return base64.b64encode(bytes_data).decode(ENCODING)
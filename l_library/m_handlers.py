@@ -1,9 +1,7 @@
 """Contains the main manager class."""
 
 
-import json
-
-from . import m_disk_utils, m_base, m_level_excs
+from . import m_disk_utils, m_base, m_level_excs, m_parse_cache
 
 
 class Handler(m_base.PAObject):
@@ -61,8 +59,8 @@ class FileHandler(Handler):
         """Appends the file extension to the file name."""
         return f"{filename}.{cls.file_ext}"
 
-    def to_file(self, folder_path: str, filename: str):
-        """Outputs this object to a file."""
+    def to_file(self, folder_path: str, filename: str, compression: str | None = None):
+        """Outputs this object to a file. If `compression` is the name of a codec (`zstd`, `gzip` or `xz`), the file is compressed with it."""
 
     @classmethod
     def from_file(cls, file_path: str):
@@ -98,20 +96,30 @@ class FolderHandler(Handler):
 
 class JSONFileHandler(JSONHandler, FileHandler):
     """Contains both a JSON and file handler."""
-    def to_file(self, folder_path: str, filename: str):
-        json_data = self.to_json()
-        m_disk_utils.override_file(
+    base64_json_paths: tuple[tuple[str, ...], ...] = ()
+    """
+    The paths of keys to the values that are base64 strings, which are decoded to `bytes` in chunks while reading files (see `m_disk_utils.read_json_file`).
+    Files with such values are read without the parse cache, so the decoded bytes aren't kept after they are used.
+    """
+
+    def to_file(self, folder_path: str, filename: str, compression: str | None = None):
+        # Large base64 values are only encoded in chunks while writing
+        with m_disk_utils.streaming_json():
+            json_data = self.to_json()
+        m_disk_utils.write_json_file(
             folder_path,
             self.append_file_ext(filename),
-            json.dumps(
-                json_data,
-                indent = "\t",
-                ensure_ascii = False
-            )
+            json_data,
+            compression = compression,
+            indent = "\t",
+            ensure_ascii = False
         )
 
     @classmethod
     def from_file(cls, file_path: str):
-        json_data = m_disk_utils.read_file(file_path)
-        json_data = json.loads(json_data)
+        """Creates this object from a file. Compressed files are detected and decompressed while reading."""
+        if len(cls.base64_json_paths) > 0:
+            json_data = m_disk_utils.read_json_file(file_path, base64_paths = cls.base64_json_paths)
+        else:
+            json_data = m_parse_cache.PARSE_CACHE.get_json(file_path)
         return cls.from_json(json_data)
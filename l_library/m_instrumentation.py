@@ -0,0 +1,226 @@
+"""Contains opt-in instrumentation for the hot paths."""
+
+
+from __future__ import annotations
+
+import typing as typ
+
+import time
+import logging
+import socket
+
+from . import m_base
+
+
+class StageEvent(m_base.PAObject):
+    """Represents a finished measurement of a stage."""
+    def __init__(self, stage: str, duration: float, byte_count: int = 0, object_count: int = 0):
+        self.stage = stage
+        self.duration = duration
+        self.byte_count = byte_count
+        self.object_count = object_count
+
+
+class Subscriber(m_base.PAObject):
+    """Parent class for instrumentation subscribers."""
+    def on_event(self, event: StageEvent):
+        """Called every time a measured stage finishes."""
+
+
+class LoggingSubscriber(Subscriber):
+    """Logs every stage event."""
+    def __init__(self, logger: logging.Logger | None = None, level: int = logging.DEBUG):
+        if logger is None:
+            logger = logging.getLogger("pa_classes.instrumentation")
+
+        self.logger = logger
+        self.level = level
+
+
+    def on_event(self, event: StageEvent):
+        self.logger.log(
+            self.level,
+            "%s took %.3f ms (%d bytes, %d objects)",
+            event.stage, event.duration * 1000, event.byte_count, event.object_count
+        )
+
+
+class StageAggregate(m_base.PAObject):
+    """Represents the totals of all events of a stage."""
+    def __init__(self):
+        self.count = 0
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+        self.byte_count = 0
+        self.object_count = 0
+
+
+    def add_event(self, event: StageEvent):
+        """Adds the event to the totals."""
+        self.count += 1
+        self.total_duration += event.duration
+        self.max_duration = max(self.max_duration, event.duration)
+        self.byte_count += event.byte_count
+        self.object_count += event.object_count
+
+
+class AggregateSubscriber(Subscriber):
+    """Keeps in-memory totals for every stage."""
+    def __init__(self):
+        self.aggregates: dict[str, StageAggregate] = {}
+
+
+    def on_event(self, event: StageEvent):
+        aggregate = self.aggregates.get(event.stage)
+        if aggregate is None:
+            aggregate = self.aggregates[event.stage] = StageAggregate()
+
+        aggregate.add_event(event)
+
+    def reset(self):
+        """Clears all totals."""
+        self.aggregates.clear()
+
+
+    def to_prometheus_text(self, prefix: str = "pa") -> str:
+        """Returns the totals in the Prometheus text exposition format."""
+        metrics: list[tuple[str, str, str, typ.Callable[[StageAggregate], float]]] = [
+            ("stage_calls_total", "counter", "Number of times the stage ran.", lambda aggregate: aggregate.count),
+            ("stage_seconds_total", "counter", "Total time spent in the stage.", lambda aggregate: aggregate.total_duration),
+            ("stage_seconds_max", "gauge", "Longest single run of the stage.", lambda aggregate: aggregate.max_duration),
+            ("stage_bytes_total", "counter", "Bytes processed by the stage.", lambda aggregate: aggregate.byte_count),
+            ("stage_objects_total", "counter", "Objects processed by the stage.", lambda aggregate: aggregate.object_count),
+        ]
+
+        lines: list[str] = []
+        for metric_name, metric_type, metric_help, get_value in metrics:
+            full_name = f"{prefix}_{metric_name}"
+            lines.append(f"# HELP {full_name} {metric_help}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            for stage, aggregate in self.aggregates.items():
+                lines.append(f"{full_name}{{stage=\"{_escape_label_value(stage)}\"}} {get_value(aggregate)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label_value(label_value: str):
+    """Returns the label value escaped for the Prometheus text exposition format."""
+    return label_value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class StatsDSubscriber(Subscriber):
+    """Sends every stage event as StatsD lines through `send`. `close` is called by `close` if given."""
+    def __init__(self, send: typ.Callable[[str], None], prefix: str = "pa", close: typ.Callable[[], None] | None = None):
+        self.send = send
+        self.prefix = prefix
+        self._close = close
+
+
+    @classmethod
+    def from_udp(cls, host: str = "localhost", port: int = 8125, prefix: str = "pa"):
+        """Creates a subscriber that sends to a StatsD server through UDP. Its socket is closed by `close`."""
+        udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+        def send(line: str):
+            udp_socket.sendto(line.encode("UTF-8"), (host, port))
+
+        return cls(send, prefix, udp_socket.close)
+
+    def close(self):
+        """Releases what the subscriber sends through. Remove the subscriber first."""
+        if self._close is not None:
+            self._close()
+            self._close = None
+
+
+    def on_event(self, event: StageEvent):
+        metric_name = f"{self.prefix}.{event.stage}"
+        self.send(f"{metric_name}.time:{event.duration * 1000:.3f}|ms")
+        if event.byte_count != 0:
+            self.send(f"{metric_name}.bytes:{event.byte_count}|c")
+        if event.object_count != 0:
+            self.send(f"{metric_name}.objects:{event.object_count}|c")
+
+
+class Measurement:
+    """Measures a stage when used as a context manager."""
+    __slots__ = ("stage", "start", "byte_count", "object_count")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.start = 0.0
+        self.byte_count = 0
+        self.object_count = 0
+
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        event = StageEvent(self.stage, time.perf_counter() - self.start, self.byte_count, self.object_count)
+        for subscriber in _subscribers:
+            subscriber.on_event(event)
+
+
+    def add_bytes(self, byte_count: int):
+        """Adds to the number of bytes processed by the stage."""
+        self.byte_count += byte_count
+
+    def add_text(self, text: str):
+        """Adds the number of bytes of the text encoded in UTF-8 to the number of bytes processed by the stage."""
+        self.byte_count += len(text) if text.isascii() else len(text.encode("UTF-8"))
+
+    def add_objects(self, object_count: int):
+        """Adds to the number of objects processed by the stage."""
+        self.object_count += object_count
+
+
+class NullMeasurement:
+    """A measurement that does nothing. Used when instrumentation is disabled."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return None
+
+
+    def add_bytes(self, byte_count: int):
+        """Does nothing."""
+
+    def add_text(self, text: str):
+        """Does nothing."""
+
+    def add_objects(self, object_count: int):
+        """Does nothing."""
+
+
+NULL_MEASUREMENT = NullMeasurement()
+
+_subscribers: list[Subscriber] = []
+
+
+def add_subscriber(subscriber: Subscriber):
+    """Adds a subscriber. Instrumentation is enabled while there is at least one subscriber."""
+    _subscribers.append(subscriber)
+
+def remove_subscriber(subscriber: Subscriber):
+    """Removes a subscriber."""
+    _subscribers.remove(subscriber)
+
+def is_enabled():
+    """Returns `True` if there is at least one subscriber, `False` otherwise."""
+    return len(_subscribers) > 0
+
+
+def measure(stage: str) -> Measurement | NullMeasurement:
+    """
+    Returns a context manager that measures the stage. Returns a shared no-op measurement if instrumentation is disabled.
+    Disabled, a stage costs one call and one no-op `with`, and stages are per file or per phase, never per object.
+    """
+    if not _subscribers:
+        return NULL_MEASUREMENT
+
+    return Measurement(stage)
@@ -3,31 +3,163 @@
 
 from __future__ import annotations
 
-import json
+from . import m_base, m_handlers, m_disk_utils, m_parse_cache, m_cow, m_ogg, l_versions, m_level_excs
 
-from . import m_handlers, m_disk_utils, l_versions, m_level_excs
+
+class SourceFile(m_base.PAObject):
+    """Represents the file that level data was imported from, with the fingerprint of its contents at the time."""
+    def __init__(self, path: str, fingerprint: m_parse_cache.FileIdentity):
+        self.path = path
+        self.fingerprint = fingerprint
+
+
+    @classmethod
+    def from_path(cls, path: str):
+        """Gets the source file from a path, taking its fingerprint now. Raises `FileNotFoundError` if the file doesn't exist."""
+        return cls(path, m_parse_cache.ParseCache.get_file_identity(path))
+
+
+    def is_unchanged(self):
+        """Returns `True` if the file still exists and wasn't changed since its fingerprint was taken, `False` otherwise."""
+        try:
+            return m_parse_cache.ParseCache.get_file_identity(self.path) == self.fingerprint
+        except FileNotFoundError:
+            return False
 
 
 class LevelData(m_handlers.JSONFileHandler, m_handlers.RawFileHandler):
     """Represents a certain file in levels."""
+    source: SourceFile | None = None
+    """The file this was imported from, or `None` if it wasn't imported from a raw file."""
+
+    def is_modified(self):
+        """Returns `True` if this was modified since it was imported, or if it wasn't imported from a raw file."""
+        return True
+
+
+    def _get_repr_variables(self):
+        # Where the data came from doesn't change what it is, so the same data imported or built in memory compares equal
+        return {
+            var_name: var_value
+            for var_name, var_value in vars(self).items()
+            if var_name not in ("source", "_source_data")
+        }
+
+
+    def to_file_raw_passthrough(self, folder_path: str, filename: str, hardlink: bool = False):
+        """
+        Outputs this object to a raw file.
+        If it wasn't modified since it was imported and its source file is unchanged, the source file is copied byte-for-byte (or hard linked) instead of being serialized again.
+        Returns `True` if the source file was used, `False` otherwise.
+        """
+        if self.source is None or self.is_modified() or not self.source.is_unchanged() or m_disk_utils.get_file_codec(self.source.path) is not None:
+            self.to_file_raw(folder_path, filename)
+            return False
+
+        m_disk_utils.copy_file(self.source.path, folder_path, self.append_file_ext_raw(filename), hardlink)
+        return True
 
 
 class JSONData(LevelData):
-    """Level data that contains JSON."""
+    """
+    Level data that contains JSON. The data can be shared with other level data, such as copies and combined levels,
+    and is only copied when it is taken to be modified.
+    """
     def __init__(self, data: dict | list = None):
         if data is None:
             data = {}
         self.data = data
 
 
+    @classmethod
+    def from_shared_data(cls, data: dict | list):
+        """Creates this object from data that may be shared with other objects, such as the parse cache or other level data. The data is copied before it is first modified."""
+        json_data = cls(data)
+        json_data._shared = True
+        return json_data
+
+
+    @property
+    def data(self) -> dict | list:
+        """
+        The JSON data. If it is shared with other objects, it is copied the first time it is taken, so that writes to it only change this object.
+        Read it through `view` to skip that copy, or to change a few objects of a large level without copying the rest.
+        """
+        if self._view is not None:
+            self._data = self._view.share()
+            self._view = None
+        if self._shared:
+            self._data = m_cow.copy_json(self._data)
+            self._shared = False
+
+        return self._data
+
+    @data.setter
+    def data(self, data: dict | list | m_cow.CowNode):
+        self._shared = isinstance(data, m_cow.CowNode)
+        self._data = m_cow.share(data)
+        self._view = None
+        self.source = None
+
+    @property
+    def view(self) -> m_cow.CowDict | m_cow.CowList:
+        """
+        A copy-on-write view of the JSON data. Reads share the data, and the first write to an object copies only it and the objects on the path to it.
+        Writes through the view change this object until `data` is taken or set, after which the view is detached.
+        """
+        if self._view is None:
+            self._view = m_cow.wrap(self._data)
+
+        return self._view
+
+    def share_data(self) -> dict | list:
+        """Returns the JSON data so that it can be shared, for example to build other level data from it. It must then only be read."""
+        if self._view is not None:
+            self._data = self._view.share()
+        self._shared = True
+
+        return self._data
+
+    def _get_current_data(self) -> dict | list:
+        """Returns the JSON data without copying or sharing it, for immediate read-only use."""
+        return m_cow.unwrap(self._view) if self._view is not None else self._data
+
+
+    def _get_repr_variables(self):
+        # How the data is held doesn't change what it is
+        return {"data": self._get_current_data()}
+
+
+    def is_modified(self):
+        # Taking `data` copies shared data without changing it, so the data is compared when it isn't the imported data itself
+        if self.source is None:
+            return True
+
+        current_data = self._get_current_data()
+        return current_data is not self._source_data and current_data != self._source_data
+
+
+    def copy(self):
+        """Returns a copy of this object that shares its data until either of them is modified."""
+        data_copy = type(self).from_shared_data(self.share_data())
+        if not self.is_modified():
+            data_copy._set_source(self.source)
+        return data_copy
+
+    def _set_source(self, source: SourceFile):
+        """Sets the file that the current data was imported from."""
+        self.source = source
+        self._source_data = self._get_current_data()
+
+
     def to_json(self) -> dict | list:
         return {
-            "data": self.data
+            "data": self.share_data()
         }
 
     @classmethod
     def _from_json_unwrap(cls, json_data: dict | list):
-        return cls(
+        return cls.from_shared_data(
             data = json_data["data"]
         )
 
@@ -36,12 +168,17 @@ class JSONData(LevelData):
         m_disk_utils.override_file(
             folder_path,
             self.append_file_ext_raw(filename),
-            json.dumps(self.data, ensure_ascii = False)
+            m_disk_utils.encode_json(self._get_current_data(), ensure_ascii = False)
         )
 
     @classmethod
-    def from_file_raw(cls, file_path: str):
-        return cls(data = m_disk_utils.read_file(file_path, False))
+    def from_file_raw(cls, file_path: str, intern_strings: bool = False):
+        """Creates this object from a raw file. See `m_disk_utils.decode_json` for `intern_strings`."""
+        # The fingerprint is taken first, so a file changed while reading never looks unchanged
+        source = SourceFile.from_path(file_path)
+        json_data = cls.from_shared_data(m_parse_cache.PARSE_CACHE.get_json(file_path, intern_strings))
+        json_data._set_source(source)
+        return json_data
 
 
 class Level(JSONData):
@@ -57,32 +194,58 @@ class Metadata(JSONData):
 class Audio(LevelData):
     """Represents the audio (`level.ogg`) of a level."""
     raw_file_ext: str = "ogg"
+    base64_json_paths = (("audio_bytes",),)
 
     def __init__(self, audio_bytes: bytes):
         self.audio_bytes = audio_bytes
 
 
+    @property
+    def audio_bytes(self) -> bytes:
+        """The bytes of the audio. Setting them marks the audio as modified."""
+        return self._audio_bytes
+
+    @audio_bytes.setter
+    def audio_bytes(self, audio_bytes: bytes):
+        self._audio_bytes = audio_bytes
+        self.source = None
+
+
+    def is_modified(self):
+        return self.source is None
+
+
     @classmethod
     def from_path(cls, path: str):
         """Gets the audio from a path."""
         if not m_disk_utils.path_exists(path):
             raise m_level_excs.AudioImportException(path)
 
-        return cls(
-            audio_bytes = m_disk_utils.read_file(path, binary = True)
-        )
+        return cls.from_file_raw(path)
+
+    @classmethod
+    def probe(cls, path: str):
+        """
+        Returns the duration, sample rate, channel count and checksum of the audio in a path without loading it, reading only a few kilobytes.
+        Raises `AudioImportException` if the audio doesn't exist and `InvalidAudio` if it isn't a valid Ogg/Vorbis stream.
+        """
+        if not m_disk_utils.path_exists(path):
+            raise m_level_excs.AudioImportException(path)
+
+        return m_ogg.probe_file(path)
 
 
     def to_json(self) -> dict | list:
         return {
-            "audio_bytes": m_disk_utils.bytes_to_base64(self.audio_bytes)
+            "audio_bytes": m_disk_utils.bytes_to_base64_json(self.audio_bytes)
         }
 
 
     @classmethod
     def _from_json_unwrap(cls, json_data: dict | list):
         return cls(
-            audio_bytes = m_disk_utils.base64_to_bytes(json_data["audio_bytes"])
+            # Already decoded if it was read with `base64_json_paths`
+            audio_bytes = json_data["audio_bytes"] if isinstance(json_data["audio_bytes"], bytes) else m_disk_utils.base64_to_bytes(json_data["audio_bytes"])
         )
 
 
@@ -96,7 +259,10 @@ class Audio(LevelData):
 
     @classmethod
     def from_file_raw(cls, file_path: str):
-        return cls(audio_bytes = m_disk_utils.read_file(file_path, True))
+        source = SourceFile.from_path(file_path)
+        audio = cls(audio_bytes = m_disk_utils.read_file(file_path, True))
+        audio.source = source
+        return audio
 
 
 class Theme(JSONData):
@@ -109,10 +275,15 @@ class LevelFolder(m_handlers.JSONHandler):
     def __init__(
             self,
             version: type[l_versions.PAVersion] = l_versions.DEFAULT_VERSION,
-            level: Level = Level(),
-            metadata: Metadata = Metadata(),
+            level: Level | None = None,
+            metadata: Metadata | None = None,
             audio: Audio | None = None
         ):
+        if level is None:
+            level = Level()
+        if metadata is None:
+            metadata = Metadata()
+
         self.version = version
         self.level = level
         self.metadata = metadata
@@ -151,7 +322,7 @@ class LevelFolder(m_handlers.JSONHandler):
         return cls(
             version = source.version,
             level = level,
-            metadata = source.metadata,
+            metadata = source.metadata.copy(),
             audio = source.audio
         )
 
@@ -159,11 +330,15 @@ class LevelFolder(m_handlers.JSONHandler):
 
 class LevelFolderInfo(m_handlers.JSONFileHandler, m_handlers.FolderHandler):
     """Contains information about the level folder."""
+    base64_json_paths = tuple(("level_folder", "audio", *path) for path in Audio.base64_json_paths)
+
     def __init__(
             self,
-            level_folder: LevelFolder = LevelFolder(),
+            level_folder: LevelFolder | None = None,
             themes: list[Theme] = None
         ):
+        if level_folder is None:
+            level_folder = LevelFolder()
         if themes is None:
             themes = []
 
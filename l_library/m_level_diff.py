@@ -0,0 +1,410 @@
+"""Contains structural diffs between levels and revision histories built from them."""
+
+
+from __future__ import annotations
+
+import typing as typ
+
+import json
+import hashlib
+
+from . import m_handlers, m_disk_utils, m_level_data, m_cow, l_versions, m_level_excs
+
+
+_MISSING = object()
+
+ListKeys = tuple[str, bool]
+"""The key that matches the items of a list, and whether items with the same key are told apart by the order they come in."""
+
+
+def _get_digest(value: typ.Any) -> str:
+    """Returns a short digest of the JSON value. Patches keep the digests of the values they change to check that they are applied to the same values."""
+    return hashlib.blake2b(json.dumps(value, ensure_ascii = False).encode(m_disk_utils.ENCODING), digest_size = 8).hexdigest()
+
+def _get_old_digests(old_values: dict, keys: typ.Iterable[str]) -> dict[str, str | None]:
+    """Returns the digests of the old values at the keys, with `None` for the keys that had no value."""
+    return {
+        key: _get_digest(old_values[key]) if key in old_values else None
+        for key in keys
+    }
+
+def _check_old_digests(old_values: dict, old_digests: dict[str, str | None]):
+    """Raises `LevelPatchMismatch` if the old values at the keys aren't the ones that the digests were taken from."""
+    for key, old_digest in old_digests.items():
+        old_value = old_values.get(key, _MISSING)
+        if old_digest is None:
+            if old_value is not _MISSING:
+                raise m_level_excs.LevelPatchMismatch(f"value to add already exists: {key}")
+        elif old_value is _MISSING:
+            raise m_level_excs.LevelPatchMismatch(f"missing value to change: {key}")
+        elif _get_digest(old_value) != old_digest:
+            raise m_level_excs.LevelPatchMismatch(f"value to change is different: {key}")
+
+
+def _get_item_keys(items: list, list_keys: ListKeys) -> list[str] | None:
+    """Returns the key of every item in the list, or `None` if the items can't be told apart by their keys."""
+    key_name, number_repeats = list_keys
+
+    keys: list[str] = []
+    repeat_counts: dict[str, int] = {}
+    for item in items:
+        key = item.get(key_name) if isinstance(item, dict) else None
+        if not isinstance(key, str):
+            return None
+
+        repeat_count = repeat_counts.get(key, 0)
+        repeat_counts[key] = repeat_count + 1
+        if repeat_count > 0:
+            if not number_repeats:
+                return None
+            key = f"{key}#{repeat_count}"
+
+        keys.append(key)
+
+    if len(keys) != len(set(keys)):
+        return None
+
+    return keys
+
+
+def _diff_list(old_items: list, new_items: list, list_keys: ListKeys) -> dict | None:
+    """Returns the patch that turns the old list into the new list by matching their items by key, or `None` if they are the same."""
+    if old_items is new_items:
+        return None
+
+    old_keys = _get_item_keys(old_items, list_keys)
+    new_keys = _get_item_keys(new_items, list_keys)
+    if old_keys is None or new_keys is None:
+        return {"replace": new_items, "old": _get_digest(old_items)} if old_items != new_items else None
+
+    old_items_by_key = dict(zip(old_keys, old_items))
+    new_key_set = set(new_keys)
+
+    set_items: dict[str, typ.Any] = {}
+    for key, item in zip(new_keys, new_items):
+        old_item = old_items_by_key.get(key, _MISSING)
+        if old_item is not item and old_item != item:
+            set_items[key] = item
+
+    deleted_keys = [key for key in old_keys if key not in new_key_set]
+
+    list_patch: dict[str, typ.Any] = {}
+    if len(set_items) > 0:
+        list_patch["set"] = set_items
+    if len(deleted_keys) > 0:
+        list_patch["delete"] = deleted_keys
+    if len(set_items) > 0 or len(deleted_keys) > 0:
+        list_patch["old"] = _get_old_digests(old_items_by_key, [*set_items, *deleted_keys])
+
+    # Applying keeps the old order and adds the new items at the end, the order is only stored when that isn't enough.
+    # It is stored as the runs of the applied order that the new order is made of, unless the whole order is smaller
+    applied_keys = [key for key in old_keys if key in new_key_set] + [key for key in new_keys if key not in old_items_by_key]
+    if applied_keys != new_keys:
+        order_runs = _get_order_runs(applied_keys, new_keys)
+        if len(json.dumps(order_runs)) < len(json.dumps(new_keys, ensure_ascii = False)):
+            list_patch["order_runs"] = order_runs
+        else:
+            list_patch["order"] = new_keys
+
+    return list_patch if len(list_patch) > 0 else None
+
+def _get_order_runs(applied_keys: list[str], new_keys: list[str]) -> list[list[int]]:
+    """Returns the new order as the start and length of each run of consecutive items of the applied order that it is made of."""
+    applied_indexes = {key: index for index, key in enumerate(applied_keys)}
+
+    order_runs: list[list[int]] = []
+    for key in new_keys:
+        index = applied_indexes[key]
+        if len(order_runs) > 0 and sum(order_runs[-1]) == index:
+            order_runs[-1][1] += 1
+        else:
+            order_runs.append([index, 1])
+
+    return order_runs
+
+def _apply_list(old_items: list, list_patch: dict, list_keys: ListKeys) -> list:
+    """Returns the new list from the old list and the patch. Unchanged items are shared with the old list."""
+    if "replace" in list_patch:
+        if "old" in list_patch and _get_digest(old_items) != list_patch["old"]:
+            raise m_level_excs.LevelPatchMismatch("list to replace is different")
+        return list(list_patch["replace"])
+
+    old_keys = _get_item_keys(old_items, list_keys)
+    if old_keys is None:
+        raise m_level_excs.LevelPatchMismatch("the items of a list can't be told apart by their keys")
+
+    items_by_key = dict(zip(old_keys, old_items))
+    _check_old_digests(items_by_key, list_patch.get("old", {}))
+    for key in list_patch.get("delete", []):
+        if items_by_key.pop(key, _MISSING) is _MISSING:
+            raise m_level_excs.LevelPatchMismatch(f"missing item to delete: {key}")
+
+    items_by_key.update(list_patch.get("set", {}))
+
+    if "order_runs" in list_patch:
+        return _apply_order_runs(list(items_by_key.values()), list_patch["order_runs"])
+
+    order: list[str] | None = list_patch.get("order")
+    if order is None:
+        return list(items_by_key.values())
+
+    try:
+        return [items_by_key[key] for key in order]
+    except KeyError as exc:
+        raise m_level_excs.LevelPatchMismatch(f"missing item to order: {exc.args[0]}") from exc
+
+def _apply_order_runs(applied_items: list, order_runs: list[list[int]]) -> list:
+    """Returns the items in the order of the runs from `_get_order_runs`. Raises `LevelPatchMismatch` if the runs don't cover every item once."""
+    run_end = 0
+    for start, length in sorted(order_runs):
+        if start != run_end or length <= 0:
+            raise m_level_excs.LevelPatchMismatch("the runs to order don't match the items")
+        run_end = start + length
+    if run_end != len(applied_items):
+        raise m_level_excs.LevelPatchMismatch("the runs to order don't match the items")
+
+    return [item for start, length in order_runs for item in applied_items[start:start + length]]
+
+
+def _diff_dict(old_dict: dict, new_dict: dict, get_value_differ: typ.Callable[[str], typ.Callable[[typ.Any, typ.Any], dict | None] | None]) -> dict | None:
+    """
+    Returns the patch that turns the old dict into the new dict, or `None` if they are the same.
+    Values that `get_value_differ` gives a differ for are patched with it when both are of the same type, other values are replaced.
+    """
+    if old_dict is new_dict:
+        return None
+
+    set_values: dict[str, typ.Any] = {}
+    patched_values: dict[str, dict] = {}
+    for key, new_value in new_dict.items():
+        old_value = old_dict.get(key, _MISSING)
+        if old_value is new_value:
+            continue
+
+        value_differ = get_value_differ(key)
+        if value_differ is not None and type(old_value) is type(new_value):
+            value_patch = value_differ(old_value, new_value)
+            if value_patch is not None:
+                patched_values[key] = value_patch
+        elif old_value != new_value:
+            set_values[key] = new_value
+
+    deleted_keys = [key for key in old_dict if key not in new_dict]
+
+    dict_patch: dict[str, typ.Any] = {}
+    if len(set_values) > 0:
+        dict_patch["set"] = set_values
+    if len(patched_values) > 0:
+        dict_patch["patch"] = patched_values
+    if len(deleted_keys) > 0:
+        dict_patch["delete"] = deleted_keys
+    if len(set_values) > 0 or len(deleted_keys) > 0:
+        dict_patch["old"] = _get_old_digests(old_dict, [*set_values, *deleted_keys])
+
+    applied_keys = [key for key in old_dict if key in new_dict] + [key for key in new_dict if key not in old_dict]
+    if applied_keys != list(new_dict):
+        dict_patch["order"] = list(new_dict)
+
+    return dict_patch if len(dict_patch) > 0 else None
+
+def _apply_dict(old_dict: dict, dict_patch: dict, get_value_applier: typ.Callable[[str], typ.Callable[[typ.Any, dict], typ.Any]]) -> dict:
+    """Returns the new dict from the old dict and the patch. Unchanged values are shared with the old dict."""
+    _check_old_digests(old_dict, dict_patch.get("old", {}))
+
+    new_dict = dict(old_dict)
+    for key in dict_patch.get("delete", []):
+        if new_dict.pop(key, _MISSING) is _MISSING:
+            raise m_level_excs.LevelPatchMismatch(f"missing value to delete: {key}")
+
+    for key, value_patch in dict_patch.get("patch", {}).items():
+        if key not in new_dict:
+            raise m_level_excs.LevelPatchMismatch(f"missing value to patch: {key}")
+        new_dict[key] = get_value_applier(key)(new_dict[key], value_patch)
+
+    new_dict.update(dict_patch.get("set", {}))
+
+    order: list[str] | None = dict_patch.get("order")
+    if order is None:
+        return new_dict
+
+    try:
+        return {key: new_dict[key] for key in order}
+    except KeyError as exc:
+        raise m_level_excs.LevelPatchMismatch(f"missing value to order: {exc.args[0]}") from exc
+
+
+class LevelPatch(m_handlers.JSONFileHandler):
+    """
+    Represents the structural difference between two levels, which turns the older level into the newer one.
+    Level elements with IDs are matched by ID and event keyframes by channel and time, so the patch only holds what changed,
+    with the digests of the values it replaces or deletes. The changes are kept in a copy-on-write view, since they share their objects with the newer level.
+    """
+    def __init__(self, version: type[l_versions.PAVersion] = l_versions.DEFAULT_VERSION, changes: dict | None = None):
+        self.version = version
+        self.changes = m_cow.wrap(changes)
+
+
+    def is_empty(self):
+        """Returns `True` if the patch doesn't change anything, `False` otherwise."""
+        return self.changes is None
+
+
+    def to_json(self) -> dict | list:
+        return {
+            "version": self.version.to_json(),
+            "changes": m_cow.share(self.changes)
+        }
+
+    @classmethod
+    def _from_json_unwrap(cls, json_data: dict | list):
+        return cls(
+            version = l_versions.PAVersion.from_json(json_data["version"]),
+            changes = json_data["changes"]
+        )
+
+
+    @classmethod
+    def from_levels(cls, old_level: m_level_data.Level, new_level: m_level_data.Level, version: type[l_versions.PAVersion] = l_versions.DEFAULT_VERSION):
+        """Creates the patch that turns the old level into the new level."""
+        def get_keyframes_differ(keyframes_key: str):
+            """Returns the differ for a channel of keyframes."""
+            return lambda old_keyframes, new_keyframes: _diff_list(old_keyframes, new_keyframes, (version.keyframe_time_key, True))
+
+        def get_level_differ(section_name: str):
+            """Returns the differ for a level element, or `None` if it is replaced when changed."""
+            if section_name in version.diff_id_sections:
+                return lambda old_section, new_section: _diff_list(old_section, new_section, ("id", False))
+            if section_name in version.diff_keyframe_sections:
+                return lambda old_section, new_section: _diff_dict(old_section, new_section, get_keyframes_differ)
+
+            return None
+
+        return cls(
+            version = version,
+            changes = _diff_dict(m_cow.unwrap(old_level.view), m_cow.unwrap(new_level.view), get_level_differ)
+        )
+
+
+    def apply(self, level: m_level_data.Level):
+        """
+        Returns the newer level from the older level that the patch was made from. The older level isn't modified and shares its unchanged objects with the result.
+        Raises `LevelPatchMismatch` if the level isn't the one that the patch was made from, checked on the values that the patch changes.
+        """
+        if self.changes is None:
+            return level.copy()
+
+        version = self.version
+
+        def get_keyframes_applier(keyframes_key: str):
+            """Returns the applier for a channel of keyframes."""
+            return lambda old_keyframes, list_patch: _apply_list(old_keyframes, list_patch, (version.keyframe_time_key, True))
+
+        def get_level_applier(section_name: str):
+            """Returns the applier for a level element."""
+            if section_name in version.diff_id_sections:
+                return lambda old_section, list_patch: _apply_list(old_section, list_patch, ("id", False))
+            if section_name in version.diff_keyframe_sections:
+                return lambda old_section, dict_patch: _apply_dict(old_section, dict_patch, get_keyframes_applier)
+
+            raise m_level_excs.LevelPatchMismatch(f"level element can't be patched: {section_name}")
+
+        return m_level_data.Level.from_shared_data(_apply_dict(level.share_data(), m_cow.unwrap(self.changes), get_level_applier))
+
+
+class LevelHistory(m_handlers.JSONFileHandler):
+    """
+    Represents every revision of a level, stored as a chain of patches with a full snapshot every `snapshot_interval` revisions.
+    Getting a revision applies at most `snapshot_interval - 1` patches.
+    """
+    def __init__(
+            self,
+            version: type[l_versions.PAVersion] = l_versions.DEFAULT_VERSION,
+            snapshot_interval: int = 20,
+            revisions: list[m_level_data.Level | LevelPatch] | None = None
+        ):
+        if revisions is None:
+            revisions = []
+
+        self.version = version
+        self.snapshot_interval = snapshot_interval
+        self.revisions = revisions
+
+        self._head: tuple[int, m_level_data.Level] | None = None
+        """The number of revisions when the newest revision was last built, with the level at that revision."""
+
+
+    def __len__(self):
+        return len(self.revisions)
+
+
+    def _get_repr_variables(self):
+        # The newest revision is only cached
+        return {var_name: var_value for var_name, var_value in vars(self).items() if var_name != "_head"}
+
+
+    def to_json(self) -> dict | list:
+        return {
+            "version": self.version.to_json(),
+            "snapshot_interval": self.snapshot_interval,
+            "revisions": [
+                {"snapshot": revision.to_json()} if isinstance(revision, m_level_data.Level) else {"patch": revision.to_json()}
+                for revision in self.revisions
+            ]
+        }
+
+    @classmethod
+    def _from_json_unwrap(cls, json_data: dict | list):
+        return cls(
+            version = l_versions.PAVersion.from_json(json_data["version"]),
+            snapshot_interval = json_data["snapshot_interval"],
+            revisions = [
+                m_level_data.Level.from_json(revision_json["snapshot"]) if "snapshot" in revision_json else LevelPatch.from_json(revision_json["patch"])
+                for revision_json in json_data["revisions"]
+            ]
+        )
+
+
+    def add_revision(self, level: m_level_data.Level):
+        """Adds the level as the newest revision. Returns the index of the revision."""
+        if len(self.revisions) % self.snapshot_interval == 0:
+            self.revisions.append(level.copy())
+        else:
+            self.revisions.append(LevelPatch.from_levels(self._get_head(), level, self.version))
+
+        self._head = (len(self.revisions), level.copy())
+        return len(self.revisions) - 1
+
+    def _get_head(self) -> m_level_data.Level:
+        """Returns the level at the newest revision without copying it, building it again only if the number of revisions changed since it was cached."""
+        if self._head is None or self._head[0] != len(self.revisions):
+            self._head = (len(self.revisions), self._build_revision(len(self.revisions) - 1))
+
+        return self._head[1]
+
+    def get_revision(self, index: int) -> m_level_data.Level:
+        """Returns the level at the revision. Raises `IndexError` if the revision doesn't exist."""
+        if index < 0:
+            index += len(self.revisions)
+        if not 0 <= index < len(self.revisions):
+            raise IndexError(f"Revision doesn't exist: {index}")
+
+        if index == len(self.revisions) - 1:
+            return self._get_head().copy()
+
+        return self._build_revision(index)
+
+    def _build_revision(self, index: int) -> m_level_data.Level:
+        """Returns the level at the revision by applying the patches since the snapshot before it."""
+        snapshot_index = index
+        while not isinstance(self.revisions[snapshot_index], m_level_data.Level):
+            snapshot_index -= 1
+
+        level: m_level_data.Level = self.revisions[snapshot_index].copy()
+        for patch in self.revisions[snapshot_index + 1:index + 1]:
+            level = patch.apply(level)
+
+        return level
+
+    def diff_revisions(self, old_index: int, new_index: int):
+        """Returns the patch that turns the level at the old revision into the level at the new revision."""
+        return LevelPatch.from_levels(self.get_revision(old_index), self.get_revision(new_index), self.version)
@@ -15,7 +15,29 @@ class AudioImportException(LevelException):
         super().__init__(f"Cannot find audio for path: {incorrect_path}.")
 
 
+class InvalidAudio(LevelException):
+    """The audio isn't a valid Ogg/Vorbis stream."""
+    def __init__(self, audio_path: str, reason: str):
+        super().__init__(f"Invalid audio in {audio_path}: {reason}")
+        self.audio_path = audio_path
+        self.reason = reason
+
+
 class FromJSONException(LevelException):
     """An exception occurred while decoding the JSON and transforming it to an object."""
     def __init__(self, error_message: str):
         super().__init__(f"Exception raised when decoding to JSON: {error_message}")
+
+
+class CompressionNotSupported(LevelException):
+    """The compression codec doesn't exist or its optional package isn't installed."""
+    def __init__(self, codec_name: str):
+        super().__init__(f"Compression codec not supported or not installed: {codec_name}")
+        self.codec_name = codec_name
+
+
+class LevelPatchMismatch(LevelException):
+    """The level patch is applied to a level other than the one it was made from."""
+    def __init__(self, reason: str):
+        super().__init__(f"Level patch doesn't match the level: {reason}")
+        self.reason = reason
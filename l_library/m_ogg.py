@@ -0,0 +1,162 @@
+"""Contains a probe that reads the properties of Ogg/Vorbis audio from a few page headers, without loading the file."""
+
+
+from __future__ import annotations
+
+import typing as typ
+
+import os
+import struct
+import zlib
+
+from . import m_base, m_instrumentation, m_level_excs
+
+
+PAGE_CAPTURE = b"OggS"
+PAGE_HEADER_STRUCT = struct.Struct("<4sBBqIIIB")
+"""The fixed part of a page header: capture pattern, version, header type, granule position, serial number, sequence number, checksum and segment count."""
+MAX_PAGE_SIZE = PAGE_HEADER_STRUCT.size + 255 + 255 * 255
+
+VORBIS_ID_HEADER_STRUCT = struct.Struct("<B6sIBI")
+"""The start of the Vorbis identification header: packet type, `vorbis`, version, channel count and sample rate."""
+
+
+def _make_crc_table():
+    """Returns the lookup table of the Ogg checksum, a CRC-32 with the polynomial 0x04C11DB7 that isn't reflected."""
+    crc_table: list[int] = []
+    for index in range(256):
+        crc = index << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else (crc << 1)
+        crc_table.append(crc & 0xFFFFFFFF)
+
+    return crc_table
+
+_CRC_TABLE = _make_crc_table()
+
+def get_page_checksum(page: bytes):
+    """Returns the Ogg checksum of the page. The checksum field of the page must be zeroed."""
+    crc = 0
+    for byte in page:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ _CRC_TABLE[(crc >> 24) ^ byte]
+
+    return crc
+
+
+class OggPage(m_base.PAObject):
+    """Represents a page of an Ogg stream, with only the data that was read of it."""
+    def __init__(self, header_type: int, granule_position: int, serial_number: int, checksum: int, page: bytes):
+        self.header_type = header_type
+        self.granule_position = granule_position
+        self.serial_number = serial_number
+        self.checksum = checksum
+        self.page = page
+
+
+    @classmethod
+    def from_bytes(cls, data: bytes, offset: int = 0) -> OggPage | None:
+        """Returns the page that starts at the offset, or `None` if there isn't a whole page with a correct checksum there."""
+        if len(data) - offset < PAGE_HEADER_STRUCT.size:
+            return None
+
+        capture, version, header_type, granule_position, serial_number, _, checksum, segment_count = PAGE_HEADER_STRUCT.unpack_from(data, offset)
+        if capture != PAGE_CAPTURE or version != 0:
+            return None
+
+        segments_end = offset + PAGE_HEADER_STRUCT.size + segment_count
+        if len(data) < segments_end:
+            return None
+
+        page_end = segments_end + sum(data[offset + PAGE_HEADER_STRUCT.size:segments_end])
+        if len(data) < page_end:
+            return None
+
+        page = data[offset:page_end]
+        if get_page_checksum(page[:22] + b"\x00\x00\x00\x00" + page[26:]) != checksum:
+            return None
+
+        return cls(header_type, granule_position, serial_number, checksum, page)
+
+
+    def get_body(self):
+        """Returns the data of the page after its header."""
+        segment_count = self.page[PAGE_HEADER_STRUCT.size - 1]
+        return self.page[PAGE_HEADER_STRUCT.size + segment_count:]
+
+
+class AudioProbe(m_base.PAObject):
+    """Represents the properties of an Ogg/Vorbis file read by `probe_file`."""
+    def __init__(self, duration: float, sample_rate: int, channel_count: int, checksum: int, file_size: int):
+        self.duration = duration
+        self.sample_rate = sample_rate
+        self.channel_count = channel_count
+        self.checksum = checksum
+        """A fingerprint of the file made from the checksums of its first and last pages and its size. Any re-encode changes it."""
+        self.file_size = file_size
+
+
+def probe_file(file_path: str):
+    """
+    Returns the properties of the Ogg/Vorbis file, reading only its first page and the end of the file to find its last page.
+    Raises `InvalidAudio` if the file isn't a valid Ogg/Vorbis stream, and `FileNotFoundError` if it doesn't exist.
+    """
+    with m_instrumentation.measure("audio.probe") as measurement:
+        with open(file_path, "rb") as file:
+            file_size = os.fstat(file.fileno()).st_size
+
+            # The first page of a Vorbis stream only holds the small identification header, so a full page is rarely read
+            first_data = file.read(4096)
+            first_page = OggPage.from_bytes(first_data)
+            if first_page is None and len(first_data) == 4096:
+                first_data += file.read(MAX_PAGE_SIZE - len(first_data))
+                first_page = OggPage.from_bytes(first_data)
+
+            measurement.add_bytes(len(first_data))
+            if first_page is None:
+                raise m_level_excs.InvalidAudio(file_path, "the file doesn't start with an Ogg page")
+
+            body = first_page.get_body()
+            if len(body) < VORBIS_ID_HEADER_STRUCT.size:
+                raise m_level_excs.InvalidAudio(file_path, "the first Ogg page is too short for a Vorbis identification header")
+
+            packet_type, codec_name, vorbis_version, channel_count, sample_rate = VORBIS_ID_HEADER_STRUCT.unpack_from(body)
+            if packet_type != 1 or codec_name != b"vorbis" or vorbis_version != 0:
+                raise m_level_excs.InvalidAudio(file_path, "the stream isn't Vorbis")
+            if channel_count == 0 or sample_rate == 0:
+                raise m_level_excs.InvalidAudio(file_path, "the Vorbis identification header is invalid")
+
+            last_page = _find_last_page(file, file_size, first_page.serial_number, measurement)
+            if last_page is None:
+                raise m_level_excs.InvalidAudio(file_path, "the last Ogg page can't be found")
+
+    checksum = zlib.crc32(struct.pack("<IIQ", first_page.checksum, last_page.checksum, file_size))
+    return AudioProbe(
+        duration = max(last_page.granule_position, 0) / sample_rate,
+        sample_rate = sample_rate,
+        channel_count = channel_count,
+        checksum = checksum,
+        file_size = file_size
+    )
+
+def _find_last_page(file: typ.BinaryIO, file_size: int, serial_number: int, measurement: m_instrumentation.Measurement | m_instrumentation.NullMeasurement):
+    """Returns the last page of the stream in the file, searching backwards from the end of the file one block at a time."""
+    block_size = 16 * 1024
+    block_end = file_size
+    while block_end > 0:
+        # Overlap the blocks by a page, so a page that crosses a block boundary is still read whole
+        block_start = max(0, block_end - block_size)
+        file.seek(block_start)
+        block = file.read(min(file_size, block_end + MAX_PAGE_SIZE) - block_start)
+        measurement.add_bytes(len(block))
+
+        offset = block.rfind(PAGE_CAPTURE, 0, block_end - block_start)
+        while offset != -1:
+            page = OggPage.from_bytes(block, offset)
+            if page is not None and page.serial_number == serial_number and page.granule_position != -1:
+                return page
+            offset = block.rfind(PAGE_CAPTURE, 0, offset)
+
+        block_end = block_start
+        block_size = min(block_size * 4, 1024 * 1024)
+
+    return None
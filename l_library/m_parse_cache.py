@@ -0,0 +1,123 @@
+"""Contains the process-wide cache of parsed JSON files."""
+
+
+from __future__ import annotations
+
+import os
+import collections
+
+from . import m_base, m_disk_utils
+
+
+FileIdentity = tuple[str, int, int, int]
+
+
+class ParseCacheStats(m_base.PAObject):
+    """Represents the hit and miss statistics of a parse cache."""
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+
+class ParseCacheEntry(m_base.PAObject):
+    """Represents a parsed file inside a parse cache."""
+    def __init__(self, identity: FileIdentity, json_data: dict | list, interned: bool = False):
+        self.identity = identity
+        self.json_data = json_data
+        self.interned = interned
+
+        self.size = round(m_disk_utils.estimate_json_memory(json_data))
+        """
+        The number of bytes this entry counts for in the cache, which is the estimated memory of the parsed data (see `m_disk_utils.estimate_json_memory`).
+        That is several times the size of the JSON text, which itself can be several times the size of a compressed file.
+        """
+
+
+class ParseCache(m_base.PAObject):
+    """
+    A cache of parsed JSON files keyed by file identity, evicting the least recently used files past `max_bytes`.
+    `max_bytes` bounds the estimated memory of the parsed data, not the size of the files. Interned strings are counted every time they are used,
+    so interned files take less memory than they count for.
+    """
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.stats = ParseCacheStats()
+
+        self._entries: collections.OrderedDict[str, ParseCacheEntry] = collections.OrderedDict()
+        self._current_bytes = 0
+
+
+    @property
+    def current_bytes(self):
+        """The estimated number of bytes of parsed data currently held by the cache."""
+        return self._current_bytes
+
+
+    @staticmethod
+    def get_file_identity(file_path: str) -> FileIdentity:
+        """Returns the identity of a file. Raises `FileNotFoundError` if the file doesn't exist."""
+        stat = os.stat(file_path)
+        return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+    def get_json(self, file_path: str, intern_strings: bool = False):
+        """
+        Returns the parsed JSON of the file, parsing it only if the file changed since the last call.
+        The result is shared between callers and must not be modified. Wrap it in a copy-on-write view (`m_cow.wrap`), or give it to `JSONData.from_shared_data`, instead.
+        If `intern_strings` is `True`, a file that was parsed without interning is parsed again with it (see `m_disk_utils.decode_json`).
+        """
+        identity = self.get_file_identity(file_path)
+        cache_key = identity[0]
+
+        entry = self._entries.get(cache_key)
+        if entry is not None and entry.identity == identity and (entry.interned or not intern_strings):
+            self.stats.hits += 1
+            self._entries.move_to_end(cache_key)
+            return entry.json_data
+
+        self.stats.misses += 1
+        json_data = m_disk_utils.read_json_file(file_path, intern_strings)
+
+        self._remove_entry(cache_key)
+        entry = ParseCacheEntry(identity, json_data, intern_strings)
+        if entry.size <= self.max_bytes:
+            self._entries[cache_key] = entry
+            self._current_bytes += entry.size
+            self._evict()
+
+        return json_data
+
+
+    def invalidate(self, file_path: str | None = None):
+        """Removes the file from the cache. Removes every file if `file_path` is `None`."""
+        if file_path is None:
+            self.stats.invalidations += len(self._entries)
+            self._entries.clear()
+            self._current_bytes = 0
+            return
+
+        if self._remove_entry(os.path.abspath(file_path)):
+            self.stats.invalidations += 1
+
+
+    def _remove_entry(self, cache_key: str):
+        """Removes the entry if it exists. Returns `True` if an entry was removed."""
+        entry = self._entries.pop(cache_key, None)
+        if entry is None:
+            return False
+
+        self._current_bytes -= entry.size
+        return True
+
+    def _evict(self):
+        """Removes the least recently used entries until the cache fits in `max_bytes`."""
+        while self._current_bytes > self.max_bytes:
+            _, entry = self._entries.popitem(last = False)
+            self._current_bytes -= entry.size
+            self.stats.evictions += 1
+
+
+PARSE_CACHE = ParseCache()
+"""The process-wide parse cache."""
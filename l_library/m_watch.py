@@ -0,0 +1,316 @@
+"""Contains the watch mode that rebuilds a combined level folder whenever its parts change."""
+
+
+from __future__ import annotations
+
+import typing as typ
+
+import os
+import time
+import logging
+import threading
+
+from . import m_base, m_level_data, m_parse_cache, m_instrumentation, l_versions
+
+try:
+    import watchdog.observers
+    import watchdog.events
+except ImportError:
+    watchdog = None
+
+
+LEVEL_FOLDER_FILENAMES = ["level.lsb", "metadata.lsb", "level.ogg"]
+THEME_FILE_EXT = ".lst"
+
+LOGGER = logging.getLogger("pa_classes.watch")
+"""The logger that failed builds are logged to when the watch has no `on_error`."""
+
+
+class FileWatcher(m_base.PAObject):
+    """Parent class for watchers that report the files that changed in a set of folders."""
+    def start(self):
+        """Starts watching."""
+
+    def stop(self):
+        """Stops watching."""
+
+    def get_changed_paths(self) -> set[str]:
+        """Returns the paths of the files that changed since the last call."""
+        return set()
+
+
+class PollingWatcher(FileWatcher):
+    """Finds changed files by comparing the identity (size, mtime and inode) of every file in the folders with the last time."""
+    def __init__(self, folder_paths: list[str]):
+        self.folder_paths = folder_paths
+        self._identities: dict[str, m_parse_cache.FileIdentity] = {}
+
+
+    def start(self):
+        self._identities = self._get_identities()
+
+    def get_changed_paths(self):
+        identities = self._get_identities()
+        changed_paths = {
+            path for path in identities.keys() | self._identities.keys()
+            if identities.get(path) != self._identities.get(path)
+        }
+
+        self._identities = identities
+        return changed_paths
+
+
+    def _get_identities(self):
+        """Returns the identity of every file in the folders."""
+        identities: dict[str, m_parse_cache.FileIdentity] = {}
+        for folder_path in self.folder_paths:
+            try:
+                with os.scandir(folder_path) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            stat = entry.stat()
+                            identities[os.path.abspath(entry.path)] = (os.path.abspath(entry.path), stat.st_size, stat.st_mtime_ns, stat.st_ino)
+            except FileNotFoundError:
+                continue
+
+        return identities
+
+
+class NotifyWatcher(FileWatcher):
+    """Gets changed files from the file system notifications (inotify on Linux) through the optional `watchdog` package."""
+    def __init__(self, folder_paths: list[str]):
+        self.folder_paths = folder_paths
+        self._changed_paths: set[str] = set()
+        self._lock = threading.Lock()
+        self._observer = None
+
+
+    @classmethod
+    def is_available(cls):
+        """Returns `True` if the `watchdog` package is installed, `False` otherwise."""
+        return watchdog is not None
+
+
+    def start(self):
+        watcher = self
+
+        class EventHandler(watchdog.events.FileSystemEventHandler):
+            """Records the paths of every file event."""
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+
+                with watcher._lock:
+                    watcher._changed_paths.add(os.path.abspath(event.src_path))
+                    if getattr(event, "dest_path", ""):
+                        watcher._changed_paths.add(os.path.abspath(event.dest_path))
+
+        self._observer = watchdog.observers.Observer()
+        for folder_path in self.folder_paths:
+            self._observer.schedule(EventHandler(), folder_path, recursive = False)
+        self._observer.start()
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def get_changed_paths(self):
+        with self._lock:
+            changed_paths = self._changed_paths
+            self._changed_paths = set()
+
+        return changed_paths
+
+
+def create_watcher(folder_paths: list[str]) -> FileWatcher:
+    """Returns a watcher that uses file system notifications if `watchdog` is installed, otherwise one that polls."""
+    if NotifyWatcher.is_available():
+        return NotifyWatcher(folder_paths)
+
+    return PollingWatcher(folder_paths)
+
+
+class LevelFolderWatch(m_base.PAObject):
+    """
+    Keeps a combined level folder up to date with its parts.
+    When files change, only the changed level folders are imported again, themes are only looked up again if the themes or the theme IDs changed,
+    and the export only serializes what changed.
+    """
+    def __init__(
+            self,
+            level_folder_paths: list[str],
+            output_folder_path: str,
+            themes_folder_path: str | None = None,
+            primary_level_folder_path: str | None = None,
+            combine_settings: l_versions.CombineSettings = l_versions.CombineSettings(),
+            version: type[l_versions.PAVersion] = l_versions.DEFAULT_VERSION,
+            debounce: float = 0.2,
+            poll_interval: float = 0.1,
+            on_build: typ.Callable[[m_level_data.LevelFolderInfo], None] | None = None,
+            on_error: typ.Callable[[Exception], None] | None = None
+        ):
+        self.level_folder_paths = [os.path.abspath(path) for path in level_folder_paths]
+        self.output_folder_path = output_folder_path
+        self.themes_folder_path = os.path.abspath(themes_folder_path) if themes_folder_path is not None else None
+        self.primary_level_folder_path = os.path.abspath(primary_level_folder_path) if primary_level_folder_path is not None else None
+        self.combine_settings = combine_settings
+        self.version = version
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.on_build = on_build
+        self.on_error = on_error
+
+        self.level_folder_info: m_level_data.LevelFolderInfo | None = None
+
+        self._level_folders: dict[str, m_level_data.LevelFolder] = {}
+        self._theme_ids: list[int] | None = None
+        self._exported_audio: m_level_data.Audio | None = None
+
+
+    def _get_all_level_folder_paths(self):
+        """Returns the paths of every watched level folder, with the primary level folder first."""
+        if self.primary_level_folder_path is not None:
+            return [self.primary_level_folder_path] + self.level_folder_paths
+
+        return self.level_folder_paths
+
+    def _get_source_level_folder_path(self):
+        """Returns the path of the level folder whose metadata and audio are used for the combined level folder."""
+        return self._get_all_level_folder_paths()[0]
+
+
+    def build(self, changed_paths: set[str] | None = None):
+        """
+        Builds the combined level folder, then exports it and calls `on_build`.
+        If `changed_paths` is given, only what depends on the changed files is built again. Returns `False` if nothing needed building, `True` otherwise.
+        """
+        with m_instrumentation.measure("watch.build"):
+            if changed_paths is None:
+                changed_folder_paths = set(self._get_all_level_folder_paths())
+                themes_changed = True
+            else:
+                # Level folders that failed to import before are imported again too
+                changed_folder_paths = {
+                    os.path.dirname(path) for path in changed_paths
+                    if os.path.basename(path) in LEVEL_FOLDER_FILENAMES
+                } & set(self._get_all_level_folder_paths())
+                changed_folder_paths |= set(self._get_all_level_folder_paths()) - self._level_folders.keys()
+                themes_changed = self.themes_folder_path is not None and any(
+                    os.path.dirname(path) == self.themes_folder_path and os.path.splitext(path)[1] == THEME_FILE_EXT
+                    for path in changed_paths
+                )
+
+            if len(changed_folder_paths) == 0 and not themes_changed and self.level_folder_info is not None:
+                return False
+
+            # Only the audio of the source level folder ends up in the combined level folder
+            with m_instrumentation.measure("watch.import") as measurement:
+                for level_folder_path in changed_folder_paths:
+                    self._level_folders[level_folder_path] = self.version.import_level_folder(
+                        level_folder_path,
+                        load_audio = level_folder_path == self._get_source_level_folder_path()
+                    )
+                measurement.add_objects(len(changed_folder_paths))
+
+            if len(changed_folder_paths) > 0 or self.level_folder_info is None:
+                with m_instrumentation.measure("watch.combine"):
+                    primary_level_folder = (
+                        self._level_folders[self.primary_level_folder_path] if self.primary_level_folder_path is not None else None
+                    )
+                    level_folder = m_level_data.LevelFolder.combine_folders(
+                        [self._level_folders[path] for path in self.level_folder_paths],
+                        primary_level_folder,
+                        self.combine_settings
+                    )
+            else:
+                level_folder = self.level_folder_info.level_folder
+
+            with m_instrumentation.measure("watch.themes"):
+                themes = self.level_folder_info.themes if self.level_folder_info is not None else []
+                if self.themes_folder_path is not None:
+                    theme_ids = self.version.get_theme_ids_from_level(level_folder.level)
+                    if themes_changed or theme_ids != self._theme_ids:
+                        themes = self.version.get_custom_themes_from_level(level_folder.level, self.themes_folder_path)
+                        self._theme_ids = theme_ids
+
+            self.level_folder_info = m_level_data.LevelFolderInfo(level_folder, themes)
+
+            with m_instrumentation.measure("watch.export"):
+                if not os.path.exists(self.output_folder_path):
+                    os.mkdir(self.output_folder_path)
+
+                # The audio is only copied again if the source level folder was imported again
+                exported_level_folder = level_folder
+                if level_folder.audio is self._exported_audio and os.path.exists(os.path.join(self.output_folder_path, "level.ogg")):
+                    exported_level_folder = m_level_data.LevelFolder(
+                        version = level_folder.version,
+                        level = level_folder.level,
+                        metadata = level_folder.metadata
+                    )
+                self.version.export_level_folder(exported_level_folder, self.output_folder_path)
+                self._exported_audio = level_folder.audio
+
+        if self.on_build is not None:
+            self.on_build(self.level_folder_info)
+
+        return True
+
+
+    def run(self, stop_event: threading.Event | None = None, watcher: FileWatcher | None = None):
+        """
+        Builds the combined level folder, then builds it again every time files change until `stop_event` is set.
+        Bursts of changes are collected until no file changed for `debounce` seconds.
+        A build that fails because a file is invalid, half-written or can't be accessed is tried again on the next change.
+        The exception is passed to `on_error`, or logged to `LOGGER` as a warning if there is no `on_error`.
+        """
+        if stop_event is None:
+            stop_event = threading.Event()
+
+        watched_folder_paths = list(self._get_all_level_folder_paths())
+        if self.themes_folder_path is not None:
+            watched_folder_paths.append(self.themes_folder_path)
+        if watcher is None:
+            watcher = create_watcher(watched_folder_paths)
+
+        watcher.start()
+        try:
+            # Level folders that fail to import now are imported again on the next change
+            try:
+                self.build()
+            except (ValueError, OSError, m_base.PAException) as exc:
+                self._report_failed_build(exc)
+
+            pending_paths: set[str] = set()
+            while not stop_event.wait(self.poll_interval):
+                changed_paths = watcher.get_changed_paths()
+                if len(changed_paths) == 0:
+                    continue
+
+                # Wait for the burst of changes to end
+                last_change_time = time.monotonic()
+                while time.monotonic() - last_change_time < self.debounce and not stop_event.is_set():
+                    stop_event.wait(min(self.poll_interval, self.debounce))
+                    new_changed_paths = watcher.get_changed_paths()
+                    if len(new_changed_paths) > 0:
+                        changed_paths |= new_changed_paths
+                        last_change_time = time.monotonic()
+
+                # A file that is still being written fails to import, so its changes are kept for the next build
+                pending_paths |= changed_paths
+                try:
+                    self.build(pending_paths)
+                except (ValueError, OSError, m_base.PAException) as exc:
+                    self._report_failed_build(exc)
+                    continue
+                pending_paths = set()
+        finally:
+            watcher.stop()
+
+    def _report_failed_build(self, exc: Exception):
+        """Passes the exception of a failed build to `on_error`, or logs it if there is no `on_error`."""
+        if self.on_error is not None:
+            self.on_error(exc)
+        else:
+            LOGGER.warning("Building %s failed, trying again on the next change", self.output_folder_path, exc_info = exc)
@@ -0,0 +1,16 @@
+"""Makes the package importable as `pa_classes` for the tests, whatever the name of its folder."""
+
+
+import os
+import sys
+import importlib
+import tempfile
+
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The file browser path is only defined on Windows
+os.environ.setdefault("WINDIR", tempfile.gettempdir())
+
+sys.path.insert(0, os.path.dirname(REPO_PATH))
+sys.modules["pa_classes"] = importlib.import_module(os.path.basename(REPO_PATH))
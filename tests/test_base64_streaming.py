@@ -0,0 +1,90 @@
+import os
+import json
+import random
+
+import pytest
+
+import pa_classes as pa
+from test_combine import make_level_data
+
+m_cow = pa.l_library.m_cow
+m_disk_utils = pa.l_library.m_disk_utils
+m_level_data = pa.l_library.m_level_data
+
+
+@pytest.fixture(params = [m_disk_utils.READ_CHUNK_SIZE, 7])
+def read_chunk_size(request, monkeypatch):
+    monkeypatch.setattr(m_disk_utils, "READ_CHUNK_SIZE", request.param)
+    return request.param
+
+
+def make_level_folder_info(markers: list[dict] | None = None, audio_bytes: bytes = bytes(range(256)) * 5):
+    level_data = make_level_data("a")
+    if markers is not None:
+        level_data["ed"]["markers"] = markers
+
+    return m_level_data.LevelFolderInfo(m_level_data.LevelFolder(
+        level = pa.Level(level_data),
+        metadata = m_level_data.Metadata({"song": {"title": "t"}}),
+        audio = m_level_data.Audio(audio_bytes)
+    ))
+
+
+def test_level_folder_info_round_trips(tmp_path, read_chunk_size):
+    level_folder_info = make_level_folder_info()
+    level_folder_info.to_file(str(tmp_path), "info")
+
+    with open(tmp_path / "info.pcm", encoding = "UTF-8") as file:
+        assert file.read() == json.dumps(level_folder_info.to_json(), indent = "\t", ensure_ascii = False)
+
+    loaded_info = m_level_data.LevelFolderInfo.from_file(str(tmp_path / "info.pcm"))
+    assert loaded_info.level_folder.audio.audio_bytes == level_folder_info.level_folder.audio.audio_bytes
+    assert loaded_info.level_folder.level == level_folder_info.level_folder.level
+
+
+@pytest.mark.parametrize("marker_value", ["not base64!!", "AAAA", "QR==", "with \\\"escaped\\\" quotes\\\\"])
+def test_other_values_with_the_key_stay_strings(tmp_path, read_chunk_size, marker_value):
+    markers = [{"name": "a", "audio_bytes": marker_value}, {"name": "b", "audio_bytes": "QUJD"}]
+    level_folder_info = make_level_folder_info(markers)
+    level_folder_info.to_file(str(tmp_path), "info")
+
+    loaded_info = m_level_data.LevelFolderInfo.from_file(str(tmp_path / "info.pcm"))
+    loaded_markers = m_cow.unwrap(loaded_info.level_folder.level.data)["ed"]["markers"]
+    assert loaded_markers == markers
+    assert loaded_info.level_folder.audio.audio_bytes == level_folder_info.level_folder.audio.audio_bytes
+    json.dumps(loaded_info.to_json())
+
+
+@pytest.mark.parametrize("read_chunk_size", range(1, 10))
+def test_values_read_back_with_any_chunk_size(tmp_path, monkeypatch, read_chunk_size):
+    monkeypatch.setattr(m_disk_utils, "READ_CHUNK_SIZE", read_chunk_size)
+    random_values = random.Random(read_chunk_size)
+    other_values = ["", "QR==", "QUI=", "abc=audio_bytes//", "abcd==", "ab=c", "abcd\\\"ef", "not base64!!"]
+
+    for _ in range(20):
+        audio_bytes = random_values.randbytes(random_values.randrange(40))
+        values = [m_disk_utils.bytes_to_base64(random_values.randbytes(random_values.randrange(20))) for _ in range(3)] + other_values
+        json_data = {
+            "markers": [{"audio_bytes": random_values.choice(values)} for _ in range(4)],
+            "audio_bytes": m_disk_utils.bytes_to_base64(audio_bytes),
+            "song": {"audio_bytes": random_values.choice(values)}
+        }
+        (tmp_path / "info.pcm").write_text(json.dumps(json_data), encoding = "UTF-8")
+
+        loaded_data = m_disk_utils.read_json_file(str(tmp_path / "info.pcm"), base64_paths = (("audio_bytes",),))
+        assert loaded_data == dict(json_data, audio_bytes = audio_bytes)
+
+
+def test_decoded_audio_is_not_cached(tmp_path):
+    make_level_folder_info().to_file(str(tmp_path), "info")
+    lookup_count = pa.PARSE_CACHE.stats.hits + pa.PARSE_CACHE.stats.misses
+
+    m_level_data.LevelFolderInfo.from_file(str(tmp_path / "info.pcm"))
+    assert pa.PARSE_CACHE.stats.hits + pa.PARSE_CACHE.stats.misses == lookup_count
+
+
+def test_audio_file_round_trips(tmp_path):
+    audio = m_level_data.Audio(os.urandom(1000))
+    audio.to_file(str(tmp_path), "audio")
+
+    assert m_level_data.Audio.from_file(str(tmp_path / f"audio.{m_level_data.Audio.file_ext}")).audio_bytes == audio.audio_bytes
@@ -0,0 +1,205 @@
+import pytest
+
+import pa_classes as pa
+
+m_cow = pa.l_library.m_cow
+v20_4_4 = pa.l_library.l_versions.v20_4_4
+m_combine_plan = pa.l_library.l_versions.m_combine_plan
+
+
+EVENT_NAMES = ["pos", "zoom", "rot", "shake", "theme", "chroma", "bloom", "vignette", "lens", "grain"]
+
+
+def make_level_data(prefix: str, object_count: int = 5):
+    prefabs = [
+        {"id": f"{prefix}fab{index}", "name": f"fab{index % 2}", "type": "0", "offset": "0", "objects": [{"id": "x", "st": "0"}]}
+        for index in range(2)
+    ]
+    return {
+        "ed": {"timeline_pos": "0", "markers": [{"name": prefix, "t": "1"}]},
+        "level_data": {"level_version": "20.4.4", "background_color": "0"},
+        "prefabs": prefabs,
+        "prefab_objects": [{"id": f"{prefix}po{index}", "pid": prefabs[index % 2]["id"], "st": str(index)} for index in range(3)],
+        "themes": [],
+        "checkpoints": [
+            {"active": "False", "name": "Base", "t": "0", "pos": {"x": "0", "y": "0"}},
+            {"active": "False", "name": prefix, "t": "5", "pos": {"x": "0", "y": "0"}}
+        ],
+        "beatmap_objects": [
+            {"id": f"{prefix}o{index}", "p": f"{prefix}o{index - 1}" if index > 0 else "", "st": str(index), "name": "obj"}
+            for index in range(object_count)
+        ],
+        "bg_objects": [{"active": "True", "name": "bg", "pos": {"x": "0", "y": "0"}}],
+        "events": {event_name: [{"t": "0", "x": "0"}, {"t": "3", "x": "1"}] for event_name in EVENT_NAMES}
+    }
+
+def make_levels(count: int = 3):
+    return [pa.Level(make_level_data(f"l{index}")) for index in range(count)]
+
+
+def test_report_counts_deduplicated_prefabs():
+    levels = make_levels()
+    combine_report = pa.CombineReport()
+    combined_level = v20_4_4.combine_levels(levels, None, pa.CombineSettings(deduplicate_prefabs = True), combine_report)
+
+    combined_data = m_cow.unwrap(combined_level.data)
+    prefab_ids = {prefab["id"] for prefab in combined_data["prefabs"]}
+    assert len(prefab_ids) == 2
+    assert combine_report.removed_prefab_count == 4
+    assert combine_report.removed_prefab_bytes > 0
+    assert all(prefab_object["pid"] in prefab_ids for prefab_object in combined_data["prefab_objects"])
+
+
+def test_report_merge_adds_up():
+    report = pa.CombineReport()
+    other = pa.CombineReport()
+    other.removed_prefab_count = 2
+    other.remapped_ids = {"prefabs": [("a", "b")]}
+
+    report.merge(other)
+    report.merge(other)
+
+    assert report.removed_prefab_count == 4
+    assert report.remapped_ids == {"prefabs": [("a", "b"), ("a", "b")]}
+
+
+def test_colliding_ids_are_remapped_with_their_references():
+    levels = [pa.Level(make_level_data("same")) for _ in range(3)]
+    combine_report = pa.CombineReport()
+    combined_level = v20_4_4.combine_levels(levels, None, pa.CombineSettings(), combine_report)
+
+    combined_data = m_cow.unwrap(combined_level.data)
+    object_ids = [beatmap_object["id"] for beatmap_object in combined_data["beatmap_objects"]]
+    assert len(set(object_ids)) == len(object_ids) == 15
+    assert object_ids[:5] == [f"sameo{index}" for index in range(5)]
+    assert len(combine_report.remapped_ids["beatmap_objects"]) == 10
+
+    # Every parent still points to the object before it in the same level
+    for index, beatmap_object in enumerate(combined_data["beatmap_objects"]):
+        if index % 5 > 0:
+            assert beatmap_object["p"] == object_ids[index - 1]
+
+    prefab_ids = {prefab["id"] for prefab in combined_data["prefabs"]}
+    assert len(prefab_ids) == 6
+    assert all(prefab_object["pid"] in prefab_ids for prefab_object in combined_data["prefab_objects"])
+
+
+def test_ids_repeated_within_a_level_get_one_new_id():
+    level_data = make_level_data("a")
+    level_data["beatmap_objects"][1]["id"] = "ao0"
+    combined_level = v20_4_4.combine_levels([pa.Level(make_level_data("a")), pa.Level(level_data)])
+
+    object_ids = [beatmap_object["id"] for beatmap_object in m_cow.unwrap(combined_level.data)["beatmap_objects"]]
+    assert object_ids[5] == object_ids[6] != "ao0"
+
+
+def test_remapping_takes_linear_time():
+    levels = [pa.Level(make_level_data("same", 20000)) for _ in range(4)]
+    combine_report = pa.CombineReport()
+
+    # Checking every new ID against all the new IDs before it takes minutes here
+    combined_level = v20_4_4.combine_levels(levels, None, pa.CombineSettings(include_prefabs = False), combine_report)
+
+    assert len(combine_report.remapped_ids["beatmap_objects"]) == 60000
+    assert len({beatmap_object["id"] for beatmap_object in m_cow.unwrap(combined_level.data)["beatmap_objects"]}) == 80000
+
+
+def check_plan(levels: list, primary_level = None, combine_settings = pa.CombineSettings()):
+    """Checks the plan against the combine and returns it."""
+    combine_plan = v20_4_4.plan_combine(levels, primary_level, combine_settings)
+    combined_data = m_cow.unwrap(v20_4_4.combine_levels(levels, primary_level, combine_settings).data)
+
+    assert combine_plan.section_counts == {
+        "beatmap_objects": len(combined_data["beatmap_objects"]),
+        "prefabs": len(combined_data["prefabs"]),
+        "prefab_objects": len(combined_data["prefab_objects"]),
+        "markers": len(combined_data["ed"]["markers"]),
+        "checkpoints": len(combined_data["checkpoints"]),
+        "bg_objects": len(combined_data["bg_objects"])
+    }
+    assert combine_plan.event_keyframe_counts == {kf_name: len(kfs) for kf_name, kfs in combined_data["events"].items()}
+    assert abs(combine_plan.estimated_size / m_combine_plan.get_json_size(combined_data) - 1) < 0.02
+    return combine_plan
+
+
+def test_plan_matches_the_combine():
+    levels = make_levels()
+    for combine_settings in (pa.CombineSettings(), pa.CombineSettings(delete_first_checkpoint = False, delete_first_event_keyframes = False)):
+        check_plan(levels, None, combine_settings)
+        check_plan(levels[1:], levels[0], combine_settings)
+
+
+def test_plan_reports_dropped_firsts_of_repeated_levels(tmp_path):
+    level = pa.Level(make_level_data("a"))
+    other_level = pa.Level(make_level_data("b"))
+
+    # Remapped IDs are longer than these ones, which the plan doesn't estimate
+    combine_plan = check_plan([level, other_level, level], None, pa.CombineSettings(remap_colliding_ids = False))
+    assert [level_name for level_name, _ in combine_plan.dropped_checkpoints] == ["level #2", "level #3"]
+    assert len(combine_plan.dropped_event_keyframes) == 2 * len(v20_4_4.default_event_kfs)
+
+    level.to_file_raw(str(tmp_path), "level")
+    level_path = str(tmp_path / "level.lsb")
+    combine_plan = v20_4_4.plan_combine([level_path, level_path])
+    assert [level_name for level_name, _ in combine_plan.dropped_checkpoints] == [level_path]
+
+    combine_plan = check_plan([level], level, pa.CombineSettings(delete_first_checkpoint = False, remap_colliding_ids = False))
+    assert [level_name for level_name, _ in combine_plan.dropped_checkpoints] == ["level #1"]
+
+
+def test_combine_to_file_matches_the_combine(tmp_path):
+    levels = make_levels()
+    level_paths = []
+    for index, level in enumerate(levels):
+        level.to_file_raw(str(tmp_path), f"level{index}")
+        level_paths.append(str(tmp_path / f"level{index}.lsb"))
+
+    # A primary level with two prefabs of the same content, which are only removed once
+    duplicate_primary_data = make_level_data("p")
+    duplicate_primary_data["prefabs"][1]["name"] = duplicate_primary_data["prefabs"][0]["name"]
+    duplicate_primary = pa.Level(duplicate_primary_data)
+
+    for combine_settings in (
+        pa.CombineSettings(),
+        pa.CombineSettings(delete_first_checkpoint = False, delete_first_event_keyframes = False, deduplicate_prefabs = True),
+        pa.CombineSettings(include_beatmap_objects = False, include_event_keyframes = False, remap_colliding_ids = False)
+    ):
+        for primary_level, other_levels, other_paths in (
+            (None, levels, level_paths),
+            (levels[0], levels[1:], level_paths[1:]),
+            (duplicate_primary, levels[1:], level_paths[1:])
+        ):
+            combine_report = pa.CombineReport()
+            v20_4_4.combine_levels(other_levels, primary_level, combine_settings, combine_report).to_file_raw(str(tmp_path), "expected")
+            with open(tmp_path / "expected.lsb", encoding = "UTF-8") as file:
+                expected = file.read()
+
+            for inputs in (other_levels, other_paths):
+                file_report = pa.CombineReport()
+                file_path = v20_4_4.combine_levels_to_file(inputs, str(tmp_path), "combined", primary_level, combine_settings, file_report)
+
+                with open(file_path, encoding = "UTF-8") as file:
+                    assert file.read() == expected
+                assert file_report == combine_report
+
+                parallel_report = pa.CombineReport()
+                file_path = v20_4_4.combine_levels_parallel(inputs, str(tmp_path), "parallel", primary_level, combine_settings, 2, parallel_report)
+
+                with open(file_path, encoding = "UTF-8") as file:
+                    assert file.read() == expected
+                assert parallel_report == combine_report
+
+            if primary_level is duplicate_primary and combine_settings.deduplicate_prefabs:
+                assert combine_report.removed_prefab_count == 4
+
+
+def test_parallel_combine_reports_every_invalid_level(tmp_path):
+    levels = make_levels(4)
+    del levels[1].data["prefabs"]
+    del levels[3].data["events"]
+
+    with pytest.raises(pa.InvalidLevels) as exc_info:
+        v20_4_4.combine_levels_parallel(levels, str(tmp_path), max_workers = 2)
+
+    assert [invalid_level.level_name for invalid_level in exc_info.value.invalid_levels] == ["level #2", "level #4"]
+    assert not (tmp_path / "level.lsb").exists()
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+import pa_classes as pa
+
+m_compression = pa.l_library.m_compression
+
+
+LEVEL_JSON = {"beatmap_objects": [{"id": str(index), "name": "é" * index} for index in range(50)]}
+
+
+@pytest.mark.parametrize("codec", pa.get_available_codecs(), ids = lambda codec: codec.name)
+def test_compressed_file_reads_back(tmp_path, codec):
+    pa.write_json_file(str(tmp_path), "level.lsb", LEVEL_JSON, compression = codec.name)
+    path = str(tmp_path / "level.lsb")
+
+    with open(path, "rb") as file:
+        assert file.read(len(codec.magic)) == codec.magic
+    assert pa.get_file_codec(path) is codec
+    assert pa.read_json_file(path) == LEVEL_JSON
+
+
+def test_uncompressed_file_has_no_codec(tmp_path):
+    pa.write_json_file(str(tmp_path), "level.lsb", LEVEL_JSON)
+    path = str(tmp_path / "level.lsb")
+
+    assert pa.get_file_codec(path) is None
+    assert pa.read_json_file(path) == LEVEL_JSON
+
+
+def test_magic_bytes_are_detected():
+    for codec in m_compression.ALL_CODECS:
+        if codec.is_available():
+            assert m_compression.detect_codec(codec.magic + b"\x00" * 8) is codec
+
+    assert m_compression.detect_codec(b"{\"beatmap_objects\": []}") is None
+    assert m_compression.detect_codec(b"") is None
+
+
+def test_unknown_codec_is_not_supported(tmp_path):
+    with pytest.raises(pa.CompressionNotSupported):
+        pa.get_codec("brotli")
+    with pytest.raises(pa.CompressionNotSupported):
+        pa.write_json_file(str(tmp_path), "level.lsb", LEVEL_JSON, compression = "brotli")
+
+    assert not os.path.exists(tmp_path / "level.lsb")
+
+
+def test_unavailable_codec_is_detected_but_not_supported(monkeypatch):
+    monkeypatch.setattr(m_compression, "zstandard", None)
+
+    assert pa.ZstdCodec not in pa.get_available_codecs()
+    assert m_compression.get_default_codec() is pa.GzipCodec
+    with pytest.raises(pa.CompressionNotSupported):
+        m_compression.detect_codec(pa.ZstdCodec.magic)
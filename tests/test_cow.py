@@ -0,0 +1,155 @@
+import json
+import copy
+
+import pa_classes as pa
+
+m_cow = pa.l_library.m_cow
+
+
+def make_base():
+    return {"ed": {"markers": [{"name": "a"}]}, "beatmap_objects": [{"id": str(index), "events": {"pos": []}} for index in range(3)]}
+
+
+def test_writes_copy_only_the_written_path():
+    base = make_base()
+    view = m_cow.wrap(base)
+
+    view["beatmap_objects"][1]["id"] = "x"
+
+    assert base == make_base()
+    data = m_cow.unwrap(view)
+    assert data["beatmap_objects"][1]["id"] == "x"
+    assert data["ed"] is base["ed"]
+    assert data["beatmap_objects"][0] is base["beatmap_objects"][0]
+    assert data["beatmap_objects"][1]["events"] is base["beatmap_objects"][1]["events"]
+
+
+def test_shared_data_is_not_changed_by_later_writes():
+    view = m_cow.wrap(make_base())
+    view["ed"]["markers"].append({"name": "b"})
+
+    shared = m_cow.share(view)
+    view["ed"]["markers"][0]["name"] = "c"
+
+    assert shared["ed"]["markers"] == [{"name": "a"}, {"name": "b"}]
+    assert view["ed"]["markers"][0]["name"] == "c"
+
+
+def test_two_views_of_the_same_item_both_write_through():
+    view = m_cow.wrap(make_base())
+    first = view["beatmap_objects"][0]
+    second = view["beatmap_objects"][0]
+
+    first["a"] = 1
+    second["b"] = 2
+
+    assert m_cow.unwrap(view)["beatmap_objects"][0] == {"id": "0", "events": {"pos": []}, "a": 1, "b": 2}
+
+
+def test_reads_dont_keep_child_views():
+    view = m_cow.wrap({"items": [{"index": index} for index in range(1000)]})
+    items = view["items"]
+    total = sum(item["index"] for item in items)
+
+    assert total == 499500
+    assert items._children is None
+
+
+def test_views_put_back_are_stored_as_plain_data():
+    view = m_cow.wrap(make_base())
+    view["beatmap_objects"] = [beatmap_object for beatmap_object in view["beatmap_objects"] if beatmap_object["id"] != "1"]
+    view["ed"] = dict(view["ed"])
+
+    data = m_cow.unwrap(view)
+    assert json.loads(json.dumps(data)) == data
+    assert [beatmap_object["id"] for beatmap_object in data["beatmap_objects"]] == ["0", "2"]
+
+
+def test_json_encoding_of_views():
+    level = pa.Level(make_base())
+
+    assert json.loads(json.dumps(level.view, default = m_cow.json_default)) == make_base()
+    assert json.loads(json.dumps(dict(level.view), default = m_cow.json_default)) == make_base()
+    assert json.loads(pa.encode_json(level.view)) == make_base()
+
+
+def test_list_operations():
+    view = m_cow.wrap([{"t": "2"}, {"t": "1"}, {"t": "3"}])
+    base = m_cow.unwrap(view)
+
+    view.sort(key = lambda keyframe: keyframe["t"])
+    assert [keyframe["t"] for keyframe in view] == ["1", "2", "3"]
+    assert [keyframe["t"] for keyframe in base] == ["2", "1", "3"]
+
+    combined = view + [{"t": "4"}]
+    assert isinstance(combined, m_cow.CowList) and len(combined) == 4
+    combined[0]["t"] = "0"
+    assert view[0]["t"] == "1"
+
+    assert len([{"t": "0"}] + view) == 4
+    assert view.index({"t": "2"}) == 1
+    assert view.count({"t": "3"}) == 1
+
+    popped = view.pop()
+    popped["t"] = "9"
+    assert view == [{"t": "1"}, {"t": "2"}]
+
+    view.reverse()
+    assert view == [{"t": "2"}, {"t": "1"}]
+
+
+def test_dict_operations():
+    view = m_cow.wrap({"a": {"b": 1}})
+
+    view_copy = view.copy()
+    view_copy["a"]["b"] = 2
+    assert view["a"]["b"] == 1
+
+    merged = view | {"c": 3}
+    assert merged == {"a": {"b": 1}, "c": 3} and isinstance(merged, m_cow.CowDict)
+    assert ({"c": 3} | view) == {"c": 3, "a": {"b": 1}}
+
+    copy.deepcopy(view)["a"]["b"] = 5
+    assert view["a"]["b"] == 1
+
+    view |= {"d": 4}
+    assert set(view) == {"a", "d"}
+
+
+def test_level_copies_share_until_written():
+    level = pa.Level(make_base())
+    level_copy = level.copy()
+
+    level_copy.view["beatmap_objects"][0]["id"] = "changed"
+
+    assert level.view["beatmap_objects"][0]["id"] == "0"
+    assert m_cow.unwrap(level_copy.view)["ed"] is m_cow.unwrap(level.view)["ed"]
+    assert level_copy.data["beatmap_objects"][0]["id"] == "changed"
+
+
+def test_level_data_is_plain_json():
+    level = pa.Level(make_base())
+    level_copy = level.copy()
+
+    assert isinstance(level_copy.data, dict)
+    assert json.loads(json.dumps(level_copy.data)) == make_base()
+    assert repr(level_copy) == f"Level(data = {make_base()!r})"
+
+    # The shared data is copied when it is taken, so writes to it don't reach the level it was copied from
+    level_copy.data["beatmap_objects"][0]["id"] = "changed"
+    assert level.data["beatmap_objects"][0]["id"] == "0"
+
+    # The view is detached once the data is taken
+    view = level.view
+    level.data["ed"]["markers"].clear()
+    view["ed"]["markers"].append({"name": "b"})
+    assert level.data["ed"]["markers"] == []
+
+
+def test_reading_through_a_view_keeps_no_views():
+    view = m_cow.wrap({"items": [{"events": {"pos": [index]}} for index in range(1000)]})
+    items = view["items"]
+    items[10]["events"]["pos"].append("x")
+
+    assert sum(len(item["events"]["pos"]) for item in items) == 1001
+    assert list(items._children) == [10]
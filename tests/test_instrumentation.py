@@ -0,0 +1,57 @@
+import pa_classes as pa
+
+m_instrumentation = pa.l_library.m_instrumentation
+
+
+def measure_stages(function):
+    """Returns the aggregates of the stages measured while calling the function."""
+    aggregate_subscriber = pa.AggregateSubscriber()
+    pa.add_subscriber(aggregate_subscriber)
+    try:
+        function()
+    finally:
+        pa.remove_subscriber(aggregate_subscriber)
+
+    return aggregate_subscriber.aggregates
+
+
+def test_disabled_measure_is_shared_no_op():
+    assert not m_instrumentation.is_enabled()
+    assert m_instrumentation.measure("stage") is m_instrumentation.NULL_MEASUREMENT
+
+
+def test_text_stages_count_encoded_bytes(tmp_path):
+    text = "é" * 10
+
+    aggregates = measure_stages(lambda: pa.override_file(str(tmp_path), "file.txt", text))
+    assert aggregates["override_file"].byte_count == 20
+
+    aggregates = measure_stages(lambda: pa.read_file(str(tmp_path / "file.txt")))
+    assert aggregates["read_file"].byte_count == 20
+
+    aggregates = measure_stages(lambda: pa.decode_json(pa.encode_json(text, ensure_ascii = False)))
+    assert aggregates["json_encode"].byte_count == 22
+    assert aggregates["json_decode"].byte_count == 22
+
+
+def test_prometheus_label_values_are_escaped():
+    aggregate_subscriber = pa.AggregateSubscriber()
+    aggregate_subscriber.on_event(pa.StageEvent("a\"b\\c\nd", 0.5))
+
+    prometheus_text = aggregate_subscriber.to_prometheus_text()
+    assert 'pa_stage_calls_total{stage="a\\"b\\\\c\\nd"} 1' in prometheus_text.splitlines()
+
+
+def test_statsd_lines():
+    lines: list[str] = []
+    subscriber = pa.StatsDSubscriber(lines.append, "test")
+    subscriber.on_event(pa.StageEvent("read_file", 0.002, byte_count = 5))
+
+    assert lines == ["test.read_file.time:2.000|ms", "test.read_file.bytes:5|c"]
+
+
+def test_statsd_udp_socket_is_closed():
+    subscriber = pa.StatsDSubscriber.from_udp("127.0.0.1", 9)
+    udp_socket = subscriber._close.__self__
+    subscriber.close()
+    assert udp_socket.fileno() == -1
@@ -0,0 +1,51 @@
+import os
+import json
+import pickle
+
+import pa_classes as pa
+from test_combine import make_level_data
+from test_versions import write_level_folder
+
+m_cow = pa.l_library.m_cow
+m_level_data = pa.l_library.m_level_data
+
+
+def test_imported_data_equals_the_same_data_built_in_memory(tmp_path):
+    write_level_folder(str(tmp_path), make_level_data("a"))
+    level = m_level_data.Level.from_file_raw(str(tmp_path / "level.lsb"))
+    audio = m_level_data.Audio.from_file_raw(str(tmp_path / "level.ogg"))
+
+    built_level = m_level_data.Level(make_level_data("a"))
+    assert level.source is not None and built_level.source is None
+    assert level == built_level
+    assert repr(level) == repr(built_level)
+    assert audio == m_level_data.Audio(b"OggS")
+
+
+def test_unmodified_data_is_copied_from_its_source(tmp_path):
+    write_level_folder(str(tmp_path / "a"), make_level_data("a"))
+    level = m_level_data.Level.from_file_raw(str(tmp_path / "a" / "level.lsb"))
+    os.mkdir(tmp_path / "b")
+
+    assert not level.is_modified()
+    assert level.copy().is_modified() is False
+    assert level.to_file_raw_passthrough(str(tmp_path / "b"), "level")
+
+    # Taking the data copies it from the parse cache, which alone doesn't count as a change
+    assert level.data["beatmap_objects"][0]["name"] == "obj"
+    assert not level.is_modified()
+
+    level.data["beatmap_objects"][0]["name"] = "changed"
+    assert level.is_modified()
+    assert not level.to_file_raw_passthrough(str(tmp_path / "b"), "level")
+    with open(tmp_path / "b" / "level.lsb", encoding = "UTF-8") as file:
+        assert json.load(file)["beatmap_objects"][0]["name"] == "changed"
+
+
+def test_pickled_data_keeps_its_source(tmp_path):
+    write_level_folder(str(tmp_path), make_level_data("a"))
+    metadata = m_level_data.Metadata.from_file_raw(str(tmp_path / "metadata.lsb"))
+
+    unpickled_metadata = pickle.loads(pickle.dumps(metadata))
+    assert unpickled_metadata == metadata
+    assert unpickled_metadata.source == metadata.source
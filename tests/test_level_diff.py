@@ -0,0 +1,133 @@
+import copy
+import json
+import random
+
+import pytest
+
+import pa_classes as pa
+from test_combine import make_level_data
+
+m_cow = pa.l_library.m_cow
+m_level_diff = pa.l_library.m_level_diff
+
+
+def make_levels():
+    old_level = pa.Level(make_level_data("a"))
+    new_level = old_level.copy()
+    new_level.data["beatmap_objects"][1]["name"] = "changed"
+    del new_level.data["beatmap_objects"][3]
+    new_level.data["beatmap_objects"].append({"id": "new", "p": "", "st": "9", "name": "obj"})
+    new_level.data["events"]["pos"].append({"t": "7", "x": "2"})
+    new_level.data["ed"]["timeline_pos"] = "4"
+    return old_level, new_level
+
+
+def test_patch_turns_the_old_level_into_the_new_level():
+    old_level, new_level = make_levels()
+    old_data = copy.deepcopy(m_cow.unwrap(old_level.data))
+
+    patched_level = pa.LevelPatch.from_levels(old_level, new_level).apply(old_level)
+
+    assert m_cow.unwrap(patched_level.data) == m_cow.unwrap(new_level.data)
+    assert m_cow.unwrap(old_level.data) == old_data
+    assert pa.LevelPatch.from_levels(old_level, old_level.copy()).is_empty()
+
+
+def test_patch_round_trips_through_json():
+    old_level, new_level = make_levels()
+    level_patch = pa.LevelPatch.from_levels(old_level, new_level)
+
+    patch_json = level_patch.to_json()
+    loaded_patch = pa.LevelPatch.from_json(patch_json)
+    assert m_cow.unwrap(loaded_patch.apply(old_level).data) == m_cow.unwrap(new_level.data)
+
+    # Writes to the loaded changes don't reach the JSON they were loaded from
+    loaded_patch.changes["set"]["ed"] = "overwritten"
+    assert patch_json["changes"]["set"]["ed"] != "overwritten"
+
+
+def test_patch_rejects_a_level_with_different_values_to_change():
+    old_level, new_level = make_levels()
+    level_patch = pa.LevelPatch.from_levels(old_level, new_level)
+
+    other_level = old_level.copy()
+    other_level.data["beatmap_objects"][1]["name"] = "edited elsewhere"
+    with pytest.raises(pa.LevelPatchMismatch):
+        level_patch.apply(other_level)
+
+    other_level = old_level.copy()
+    other_level.data["ed"]["timeline_pos"] = "8"
+    with pytest.raises(pa.LevelPatchMismatch):
+        level_patch.apply(other_level)
+
+    other_level = old_level.copy()
+    other_level.data["beatmap_objects"].append({"id": "new", "p": "", "st": "1", "name": "obj"})
+    with pytest.raises(pa.LevelPatchMismatch):
+        level_patch.apply(other_level)
+
+
+def test_reordered_items_are_stored_as_runs():
+    old_level = pa.Level(make_level_data("a", 10000))
+    new_level = old_level.copy()
+    beatmap_objects = new_level.data["beatmap_objects"]
+    beatmap_objects[10], beatmap_objects[9000] = beatmap_objects[9000], beatmap_objects[10]
+
+    level_patch = pa.LevelPatch.from_levels(old_level, new_level)
+    assert len(json.dumps(level_patch.to_json())) < 500
+    assert pa.LevelPatch.from_json(level_patch.to_json()).apply(old_level) == new_level
+
+    # Shuffled items are stored as the whole order, which is smaller than runs of one item
+    random.Random(0).shuffle(beatmap_objects)
+    level_patch = pa.LevelPatch.from_levels(old_level, new_level)
+    assert "order" in m_cow.unwrap(level_patch.changes)["patch"]["beatmap_objects"]
+    assert level_patch.apply(old_level) == new_level
+
+
+def test_patch_rejects_runs_that_dont_match_the_items():
+    items = [{"id": str(index)} for index in range(4)]
+    for order_runs in ([[0, 2], [1, 2]], [[0, 3]], [[0, 2], [2, 3]]):
+        with pytest.raises(pa.LevelPatchMismatch):
+            m_level_diff._apply_list(items, {"order_runs": order_runs}, ("id", False))
+
+    assert m_level_diff._apply_list(items, {"order_runs": [[2, 2], [0, 2]]}, ("id", False)) == items[2:] + items[:2]
+
+
+def test_history_gives_back_every_revision():
+    level = pa.Level(make_level_data("a"))
+    history = pa.LevelHistory(snapshot_interval = 3)
+    expected_datas = []
+    for index in range(7):
+        level.data["beatmap_objects"][0]["st"] = str(index)
+        level.data["ed"]["markers"].append({"name": str(index), "t": "1"})
+        history.add_revision(level)
+        expected_datas.append(copy.deepcopy(m_cow.unwrap(level.data)))
+
+    assert [type(revision).__name__ for revision in history.revisions] == ["Level", "LevelPatch", "LevelPatch"] * 2 + ["Level"]
+    for index, expected_data in enumerate(expected_datas):
+        assert m_cow.unwrap(history.get_revision(index).data) == expected_data
+
+    loaded_history = pa.LevelHistory.from_json(history.to_json())
+    assert loaded_history == history
+    assert m_cow.unwrap(loaded_history.get_revision(-1).data) == expected_datas[-1]
+
+
+def test_history_builds_the_newest_revision_once(monkeypatch):
+    history = pa.LevelHistory(snapshot_interval = 100)
+    level = pa.Level(make_level_data("a"))
+    history.add_revision(level)
+
+    apply_count = 0
+    apply = m_level_diff.LevelPatch.apply
+    def counting_apply(self, level):
+        nonlocal apply_count
+        apply_count += 1
+        return apply(self, level)
+    monkeypatch.setattr(m_level_diff.LevelPatch, "apply", counting_apply)
+
+    for index in range(10):
+        level.data["beatmap_objects"][0]["st"] = str(index)
+        history.add_revision(level)
+
+    assert apply_count == 0
+    assert m_cow.unwrap(history.get_revision(-1).data) == m_cow.unwrap(level.data)
+    assert apply_count == 0
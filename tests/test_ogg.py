@@ -0,0 +1,115 @@
+import os
+import random
+import struct
+
+import pytest
+
+import pa_classes as pa
+from test_combine import make_level_data
+from test_instrumentation import measure_stages
+
+m_ogg = pa.l_library.m_ogg
+m_version_excs = pa.l_library.l_versions.m_version_excs
+v20_4_4 = pa.l_library.l_versions.v20_4_4
+
+
+SERIAL_NUMBER = 77
+
+
+def make_page(header_type: int, granule_position: int, sequence_number: int, body: bytes, serial_number: int = SERIAL_NUMBER):
+    """Returns an Ogg page holding the body, with a correct checksum."""
+    segments = [255] * (len(body) // 255) + [len(body) % 255]
+    header = m_ogg.PAGE_HEADER_STRUCT.pack(b"OggS", 0, header_type, granule_position, serial_number, sequence_number, 0, len(segments))
+    page = header + bytes(segments) + body
+    return page[:22] + struct.pack("<I", m_ogg.get_page_checksum(page)) + page[26:]
+
+def write_ogg(path: str, duration: float, sample_rate: int = 44100, channel_count: int = 2, page_count: int = 10, page_size: int = 4000):
+    """Writes an Ogg/Vorbis stream of the duration, with random data in place of the audio packets."""
+    random_bytes = random.Random(0)
+    id_header = struct.pack("<B6sIBIiiiBB", 1, b"vorbis", 0, channel_count, sample_rate, 0, 128000, 0, 0xb8, 1)
+    pages = [make_page(2, 0, 0, id_header)]
+
+    sample_count = round(duration * sample_rate)
+    for index in range(1, page_count + 1):
+        body = random_bytes.randbytes(page_size)
+        pages.append(make_page(4 if index == page_count else 0, sample_count * index // page_count, index, body))
+
+    with open(path, "wb") as file:
+        file.write(b"".join(pages))
+
+
+def test_checksum_is_ogg_crc():
+    # The check value of CRC-32 with the polynomial 0x04C11DB7, not reflected, with no initial or final XOR
+    assert m_ogg.get_page_checksum(b"123456789") == 0x89A1897F
+
+    page = make_page(0, 10, 1, b"body")
+    assert m_ogg.OggPage.from_bytes(page).get_body() == b"body"
+    assert m_ogg.OggPage.from_bytes(page[:-1] + b"x") is None
+    assert m_ogg.OggPage.from_bytes(page[:-1]) is None
+
+
+def test_probe_reads_properties_from_the_ends(tmp_path):
+    path = str(tmp_path / "level.ogg")
+    write_ogg(path, 123.5, sample_rate = 48000, channel_count = 1, page_count = 500)
+
+    aggregates = measure_stages(lambda: pa.Audio.probe(path))
+    audio_probe = pa.Audio.probe(path)
+
+    assert audio_probe.duration == 123.5
+    assert (audio_probe.sample_rate, audio_probe.channel_count) == (48000, 1)
+    assert audio_probe.file_size == os.path.getsize(path)
+    assert aggregates["audio.probe"].byte_count < os.path.getsize(path) // 10
+
+
+def test_probe_checksum_changes_with_the_stream(tmp_path):
+    write_ogg(str(tmp_path / "a.ogg"), 10.0)
+    write_ogg(str(tmp_path / "b.ogg"), 10.0)
+    write_ogg(str(tmp_path / "c.ogg"), 11.0)
+
+    assert pa.probe_file(str(tmp_path / "a.ogg")).checksum == pa.probe_file(str(tmp_path / "b.ogg")).checksum
+    assert pa.probe_file(str(tmp_path / "a.ogg")).checksum != pa.probe_file(str(tmp_path / "c.ogg")).checksum
+
+
+def test_probe_skips_a_truncated_last_page(tmp_path):
+    path = str(tmp_path / "level.ogg")
+    write_ogg(path, 10.0, page_count = 10)
+    with open(path, "rb") as file:
+        data = file.read()
+    with open(path, "wb") as file:
+        file.write(data[:-100])
+
+    assert pa.probe_file(path).duration == 9.0
+
+
+@pytest.mark.parametrize("data", [
+    b"junk",
+    b"OggS" + bytes(2000),
+    make_page(2, 0, 0, b"\x01vorbis"),
+    make_page(2, 0, 0, struct.pack("<B6sIBI", 1, b"theora", 0, 2, 44100)),
+    make_page(2, 0, 0, struct.pack("<B6sIBI", 1, b"vorbis", 0, 0, 44100))
+])
+def test_invalid_audio_is_rejected(tmp_path, data):
+    path = str(tmp_path / "level.ogg")
+    with open(path, "wb") as file:
+        file.write(data)
+
+    with pytest.raises(pa.InvalidAudio) as exc_info:
+        pa.Audio.probe(path)
+    assert exc_info.value.audio_path == path
+
+
+def test_missing_audio_is_not_imported(tmp_path):
+    with pytest.raises(pa.AudioImportException):
+        pa.Audio.probe(str(tmp_path / "level.ogg"))
+
+
+def test_audio_must_outlast_the_level(tmp_path):
+    level = pa.Level(make_level_data("a"))
+    path = str(tmp_path / "level.ogg")
+
+    write_ogg(path, 10.0)
+    assert v20_4_4.validate_level_audio(level, path).duration == 10.0
+
+    write_ogg(path, 1.0)
+    with pytest.raises(m_version_excs.AudioTooShort):
+        v20_4_4.validate_level_audio(level, path)
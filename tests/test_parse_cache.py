@@ -0,0 +1,101 @@
+import os
+import json
+
+import pa_classes as pa
+
+m_disk_utils = pa.l_library.m_disk_utils
+
+
+def write_json(path, json_data):
+    with open(path, "w", encoding = "UTF-8") as file:
+        json.dump(json_data, file)
+
+
+def test_unchanged_file_is_parsed_once(tmp_path):
+    path = str(tmp_path / "level.lsb")
+    write_json(path, {"a": [1, 2]})
+
+    parse_cache = pa.ParseCache()
+    first = parse_cache.get_json(path)
+    second = parse_cache.get_json(path)
+
+    assert first is second
+    assert (parse_cache.stats.hits, parse_cache.stats.misses) == (1, 1)
+
+
+def test_changed_file_is_parsed_again(tmp_path):
+    path = str(tmp_path / "level.lsb")
+    write_json(path, {"a": 1})
+
+    parse_cache = pa.ParseCache()
+    assert parse_cache.get_json(path) == {"a": 1}
+
+    # Same size, so only the modification time tells the versions apart
+    write_json(path, {"a": 2})
+    stat = os.stat(path)
+    os.utime(path, ns = (stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert parse_cache.get_json(path) == {"a": 2}
+    assert parse_cache.stats.misses == 2
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    paths = [str(tmp_path / f"{index}.lsb") for index in range(3)]
+    for path in paths:
+        write_json(path, {"data": "x" * 90})
+
+    entry_size = round(m_disk_utils.estimate_json_memory({"data": "x" * 90}))
+    parse_cache = pa.ParseCache(max_bytes = 2 * entry_size)
+    parse_cache.get_json(paths[0])
+    parse_cache.get_json(paths[1])
+    parse_cache.get_json(paths[0])
+    parse_cache.get_json(paths[2])
+
+    assert parse_cache.stats.evictions == 1
+    assert parse_cache.current_bytes == 2 * entry_size
+
+    # The second file was the least recently used
+    parse_cache.get_json(paths[0])
+    assert parse_cache.stats.hits == 2
+    parse_cache.get_json(paths[1])
+    assert parse_cache.stats.misses == 4
+
+
+def test_entries_count_the_memory_of_the_parsed_data(tmp_path):
+    path = str(tmp_path / "level.lsb")
+    json_data = {"beatmap_objects": [{"id": str(index), "st": "0", "p": ""} for index in range(1000)]}
+    write_json(path, json_data)
+
+    parse_cache = pa.ParseCache()
+    parse_cache.get_json(path)
+
+    # Small objects take several times the size of their JSON text
+    assert parse_cache.current_bytes > 3 * os.path.getsize(path)
+    assert abs(parse_cache.current_bytes / m_disk_utils.estimate_json_memory(json_data, 10000) - 1) < 0.05
+
+
+def test_invalidate(tmp_path):
+    path = str(tmp_path / "level.lsb")
+    write_json(path, [])
+
+    parse_cache = pa.ParseCache()
+    parse_cache.get_json(path)
+    parse_cache.invalidate(path)
+    parse_cache.get_json(path)
+    parse_cache.invalidate()
+
+    assert parse_cache.stats.misses == 2
+    assert parse_cache.stats.invalidations == 2
+    assert parse_cache.current_bytes == 0
+
+
+def test_interned_parse_replaces_plain_parse(tmp_path):
+    path = str(tmp_path / "level.lsb")
+    write_json(path, [{"id": "abc"}])
+
+    parse_cache = pa.ParseCache()
+    plain = parse_cache.get_json(path)
+    interned = parse_cache.get_json(path, intern_strings = True)
+
+    assert interned is not plain and interned == plain
+    assert parse_cache.get_json(path) is interned
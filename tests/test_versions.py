@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+import pa_classes as pa
+from test_combine import make_level_data
+
+m_level_data = pa.l_library.m_level_data
+m_version_excs = pa.l_library.l_versions.m_version_excs
+v20_4_4 = pa.l_library.l_versions.v20_4_4
+
+
+def write_level_folder(folder_path: str, level_data: dict):
+    os.makedirs(folder_path, exist_ok = True)
+    pa.Level(level_data).to_file_raw(folder_path, "level")
+    m_level_data.Metadata({"artist": {"name": "a"}, "song": {"title": "t"}}).to_file_raw(folder_path, "metadata")
+    m_level_data.Audio(b"OggS").to_file_raw(folder_path, "level")
+
+
+def test_combine_names_invalid_levels_by_path(tmp_path):
+    level_data = make_level_data("a")
+    del level_data["prefabs"]
+    write_level_folder(str(tmp_path / "a"), level_data)
+    level = m_level_data.Level.from_file_raw(str(tmp_path / "a" / "level.lsb"))
+
+    with pytest.raises(m_version_excs.InvalidLevels) as exc_info:
+        v20_4_4.combine_levels([pa.Level(make_level_data("b")), level])
+
+    [invalid_level] = exc_info.value.invalid_levels
+    assert invalid_level.level_name == str(tmp_path / "a" / "level.lsb")
+    assert invalid_level.problems[0].section_path == "prefabs"
+
+
+def test_levels_in_memory_are_named_by_position():
+    level_data = make_level_data("a")
+    del level_data["prefabs"]
+
+    with pytest.raises(m_version_excs.InvalidLevels) as exc_info:
+        v20_4_4.validate_levels([pa.Level(make_level_data("b")), pa.Level(level_data)])
+
+    assert [invalid_level.level_name for invalid_level in exc_info.value.invalid_levels] == ["level #2"]
+
+
+def test_theme_ids_must_hold_integers(tmp_path):
+    level_data = make_level_data("a")
+    level_data["events"]["theme"][1]["x"] = "dark"
+    write_level_folder(str(tmp_path / "a"), level_data)
+
+    with pytest.raises(m_version_excs.InvalidLevel) as exc_info:
+        v20_4_4.import_level_folder(str(tmp_path / "a"))
+
+    assert exc_info.value.problems[0].section_path == "events.theme[1].x"
+    assert v20_4_4.import_level_folder(str(tmp_path / "a"), validate = False).level.data["events"]["theme"][1]["x"] == "dark"
+
+
+def test_export_only_validates_when_asked(tmp_path):
+    level_folder = m_level_data.LevelFolder(audio = m_level_data.Audio(b"OggS"))
+
+    v20_4_4.export_level_folder(level_folder, str(tmp_path))
+    assert os.path.exists(tmp_path / "level.lsb")
+
+    with pytest.raises(m_version_excs.InvalidLevel) as exc_info:
+        v20_4_4.export_level_folder(level_folder, str(tmp_path), validate = True)
+    assert exc_info.value.level_name == str(tmp_path)
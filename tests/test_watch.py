@@ -0,0 +1,95 @@
+import os
+import time
+import logging
+import threading
+
+import pa_classes as pa
+from test_combine import make_level_data
+from test_versions import write_level_folder
+
+m_cow = pa.l_library.m_cow
+m_level_data = pa.l_library.m_level_data
+m_watch = pa.l_library.m_watch
+
+
+def make_watch(tmp_path, **kwargs):
+    for name in ("a", "b"):
+        write_level_folder(str(tmp_path / name), make_level_data(name))
+
+    return m_watch.LevelFolderWatch([str(tmp_path / "a"), str(tmp_path / "b")], str(tmp_path / "out"), **kwargs)
+
+def read_output_level(tmp_path):
+    return m_level_data.Level.from_file_raw(str(tmp_path / "out" / "level.lsb"))
+
+
+def test_polling_watcher_reports_changed_files(tmp_path):
+    watcher = m_watch.PollingWatcher([str(tmp_path)])
+    (tmp_path / "a.lsb").write_text("1")
+    watcher.start()
+    assert watcher.get_changed_paths() == set()
+
+    (tmp_path / "a.lsb").write_text("22")
+    (tmp_path / "b.lsb").write_text("1")
+    assert watcher.get_changed_paths() == {str(tmp_path / "a.lsb"), str(tmp_path / "b.lsb")}
+    assert watcher.get_changed_paths() == set()
+
+
+def test_build_only_redoes_what_changed(tmp_path):
+    watch = make_watch(tmp_path)
+    assert watch.build()
+    assert len(read_output_level(tmp_path).data["beatmap_objects"]) == 10
+
+    assert not watch.build({str(tmp_path / "a" / "notes.txt")})
+
+    level_data = make_level_data("b", 7)
+    pa.Level(level_data).to_file_raw(str(tmp_path / "b"), "level")
+    aggregate_subscriber = pa.AggregateSubscriber()
+    pa.add_subscriber(aggregate_subscriber)
+    try:
+        assert watch.build({str(tmp_path / "b" / "level.lsb")})
+    finally:
+        pa.remove_subscriber(aggregate_subscriber)
+
+    assert len(read_output_level(tmp_path).data["beatmap_objects"]) == 12
+    # Only the metadata is copied again, the audio of the source level folder didn't change
+    assert aggregate_subscriber.aggregates["copy_file"].count == 1
+
+
+def test_run_recovers_from_an_invalid_level(tmp_path):
+    builds = []
+    errors = []
+    watch = make_watch(tmp_path, debounce = 0.05, poll_interval = 0.01, on_build = builds.append, on_error = errors.append)
+    (tmp_path / "b" / "level.lsb").write_text("{")
+
+    stop_event = threading.Event()
+    thread = threading.Thread(target = watch.run, args = (stop_event, m_watch.PollingWatcher([str(tmp_path / "a"), str(tmp_path / "b")])))
+    thread.start()
+    try:
+        time.sleep(0.2)
+        assert builds == []
+        assert len(errors) == 1 and isinstance(errors[0], ValueError)
+
+        pa.Level(make_level_data("b")).to_file_raw(str(tmp_path / "b"), "level")
+        deadline = time.monotonic() + 5
+        while len(builds) == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        stop_event.set()
+        thread.join()
+
+    assert len(builds) == 1
+    assert len(read_output_level(tmp_path).data["beatmap_objects"]) == 10
+
+
+def test_failed_builds_are_logged_without_on_error(tmp_path, caplog):
+    watch = make_watch(tmp_path)
+    (tmp_path / "b" / "level.lsb").write_text("{")
+
+    # The first build still happens when the watch is already stopped
+    stop_event = threading.Event()
+    stop_event.set()
+    with caplog.at_level(logging.WARNING, m_watch.LOGGER.name):
+        watch.run(stop_event, m_watch.PollingWatcher([str(tmp_path / "a"), str(tmp_path / "b")]))
+
+    assert len(caplog.records) == 1
+    assert caplog.records[0].exc_info[0] is not None